@@ -1,13 +1,37 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, Blueprint, session
-from werkzeug.security import check_password_hash, generate_password_hash # Importamos generate_password_hash
+from flask import Flask, render_template, redirect, url_for, flash, request, Blueprint, session, jsonify, Response, abort, send_from_directory
+import os
 import re
 from functools import wraps
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Importa las funciones de conexión/lógica de la base de datos
-from config import get_user_by_email_or_username, register_user, init_db, get_user_by_id, update_user_password, update_user_profile_info # USAMOS update_user_profile_info
-
-# Inicialización de la base de datos (asegura que db.db exista con la tabla)
-init_db()
+from config import get_user_by_email_or_username, register_user, get_user_by_id, update_user_password, update_user_profile_info, release_db_connection # USAMOS update_user_profile_info
+from config import user_cache_stats, find_owners, get_login_user, get_password_hash, user_is_admin
+import metrics
+# El hashing de contraseñas corre en un pool acotado (ver hashing.py)
+import hashing
+from hashing import hash_password, verify_password, needs_rehash, rehash_in_background
+import throttle
+import migrations
+import assets
+import pwa
+from page_cache import cached_page
+import solicitudes
+import asignacion
+import bulk
+import sessions
+import busqueda
+import fotos
+import mensajes
+import asgi
+import plantillas
+import profiler
+import imagenes
+
+# Verificación del esquema de db.db: si ya está en la última versión es un solo PRAGMA.
+# En producción las migraciones se aplican antes del despliegue con `flask migrate`.
+migrations.ensure_schema()
 
 # =======================================================
 # CONFIGURACIÓN DE LA APLICACIÓN PRINCIPAL
@@ -15,6 +39,133 @@ init_db()
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'una_clave_secreta_super_segura_404' # Necesario para flash y session
 
+# Proxies inversos delante de la app que agregan X-Forwarded-For (PythonAnywhere, nginx).
+# Con N, request.remote_addr es la IP que vio el N-ésimo proxy contando desde la app; con 0,
+# la de la conexión. Debe coincidir con el despliegue: de más, un cliente puede falsear su
+# IP; de menos, todos comparten la del proxy (y el mismo cupo del limitador de login).
+# Por eso es 0 salvo que el despliegue lo indique: variable de entorno TRUSTED_PROXIES o
+# `app.config['TRUSTED_PROXIES'] = 1` en el archivo WSGI (se lee en cada petición).
+app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', '0'))
+
+def trusted_proxies(wsgi_app):
+    """Aplica ProxyFix con x_for = TRUSTED_PROXIES (sin tocar el environ si es 0)."""
+    fixed = {}
+    def middleware(environ, start_response):
+        count = app.config['TRUSTED_PROXIES']
+        if not count:
+            return wsgi_app(environ, start_response)
+        if count not in fixed:
+            fixed[count] = ProxyFix(wsgi_app, x_for=count)
+        return fixed[count](environ, start_response)
+    return middleware
+
+app.wsgi_app = trusted_proxies(app.wsgi_app)
+
+# Sesión en el servidor: la cookie solo lleva un id opaco y los datos viven en SQLite
+# (con una capa en memoria). 'memory' sirve para un solo proceso; 'cookie' vuelve a la
+# sesión firmada de Flask.
+app.config['SESSION_BACKEND'] = 'sqlite'
+app.config['SESSION_MEMORY_TTL'] = 30 # segundos que un proceso confía en su copia en memoria
+app.config['SESSION_SWEEP_INTERVAL'] = 300 # cada cuánto se borran las sesiones vencidas
+sessions.init_app(app)
+
+# Al final de cada petición la conexión SQLite del hilo vuelve a quedar libre (sin cerrarla)
+app.teardown_appcontext(release_db_connection)
+
+# Pool de hashing: hilos, tareas en espera antes de responder 503 y latencia objetivo
+# con la que se calibra el costo de scrypt al arrancar (HASH_METHOD fija uno concreto).
+app.config['HASH_WORKERS'] = None # None = número de CPUs
+app.config['HASH_MAX_QUEUE'] = None # None = 4 por hilo
+app.config['HASH_TARGET_MS'] = 250
+app.config['HASH_METHOD'] = None
+hashing.init_app(app)
+
+# Limitador de intentos de login (por IP y por identificador). Con el backend 'sqlite'
+# todos los procesos comparten los mismos contadores.
+app.config['LOGIN_THROTTLE_ENABLED'] = True
+app.config['LOGIN_THROTTLE_BACKEND'] = 'memory' # 'memory' o 'sqlite'
+app.config['LOGIN_IP_LIMIT'] = 30 # intentos por IP...
+app.config['LOGIN_IP_WINDOW'] = 60 # ...cada 60 segundos
+app.config['LOGIN_ID_LIMIT'] = 5 # intentos fallidos por email/usuario...
+app.config['LOGIN_ID_WINDOW'] = 300 # ...cada 5 minutos
+app.config['AVAILABILITY_LIMIT'] = 60 # consultas de disponibilidad (registro/perfil) por IP...
+app.config['AVAILABILITY_WINDOW'] = 60 # ...cada 60 segundos
+throttle.init_app(app)
+
+# Comando `flask migrate`
+migrations.init_app(app)
+
+# Métricas por ruta (latencia, SQLite, hashing, plantillas) expuestas en /metrics.
+# SERVER_TIMING agrega además la cabecera Server-Timing a cada respuesta.
+app.config['SERVER_TIMING'] = False
+# /metrics solo responde a las redes de METRICS_ALLOW o con `Authorization: Bearer <METRICS_TOKEN>`
+app.config['METRICS_ALLOW'] = ('127.0.0.1/32', '::1/128')
+app.config['METRICS_TOKEN'] = None
+
+def user_cache_gauges():
+    stats = user_cache_stats()
+    return (
+        ('transavi_user_cache_hits', 'Aciertos de la caché de usuarios.', stats['hits']),
+        ('transavi_user_cache_misses', 'Fallos de la caché de usuarios.', stats['misses']),
+        ('transavi_user_cache_size', 'Entradas en la caché de usuarios.', stats['size']),
+    ) + mensajes.broker_gauges() + application.gauges()
+
+metrics.init_app(app, extra_gauges=user_cache_gauges)
+
+# Perfilado por muestreo de auth/main: un admin lo pide con `X-Profile: 1` (o ?_profile=1) y
+# PROFILE_SAMPLE_RATE perfila además una fracción del tráfico. Capturas en /admin/perfiles.
+app.config['PROFILE_DIR'] = None # None = instance/perfiles
+app.config['PROFILE_SAMPLE_RATE'] = 0.0
+app.config['PROFILE_INTERVAL'] = 0.005 # segundos entre muestras
+app.config['PROFILE_KEEP'] = 200
+profiler.init_app(app)
+
+# Bundles estáticos con hash y precomprimidos (`flask build-assets`), servidos en /assets
+assets.init_app(app)
+
+# Variantes AVIF/WebP/PNG del logo e iconos y manifest de la PWA (`flask build-images`, requiere Pillow)
+imagenes.init_app(app)
+
+# Service worker generado (/service-worker.js) con precache calculado y versión automática
+pwa.init_app(app)
+
+# Comando `flask asignar FECHA` (vehículos para las solicitudes pendientes del día)
+asignacion.init_app(app)
+
+# Comandos `flask users import/export` (carga y descarga masiva de usuarios)
+bulk.init_app(app)
+
+# Comandos `flask admin grant/revoke/search/reindex` (administradores y búsqueda de usuarios)
+busqueda.init_app(app)
+
+# Fotos: subida en streaming a disco, almacenamiento por contenido y miniaturas en segundo plano.
+# FOTOS_ACCEL_PREFIX: ubicación interna de nginx para servir /fotos con X-Accel-Redirect (None = Flask)
+app.config['UPLOAD_DIR'] = fotos.UPLOAD_DIR
+app.config['UPLOAD_MAX_BYTES'] = 20 * 1024 * 1024 # por foto
+app.config['UPLOAD_MAX_FILES'] = 10 # por subida (el formulario permite elegir varias)
+app.config['THUMBNAIL_WORKERS'] = 2
+app.config['FOTOS_ACCEL_PREFIX'] = None
+fotos.init_app(app)
+
+# Modo asíncrono (ASGI): `uvicorn app:application` o `flask serve-async`. Las conexiones las
+# lleva un bucle de eventos y la app corre en ASGI_WORKERS hilos (más de ASGI_WORKERS +
+# ASGI_MAX_QUEUE peticiones en espera -> 503). ASGI_MAX_BODY: cuerpo máximo (una subida completa
+# de fotos y el formulario; el límite por foto lo aplica fotos.py mientras la escribe).
+app.config['ASGI_WORKERS'] = 16
+app.config['ASGI_MAX_QUEUE'] = None # None = 16 por hilo
+app.config['ASGI_MAX_BODY'] = app.config['UPLOAD_MAX_FILES'] * app.config['UPLOAD_MAX_BYTES'] + 1024 * 1024
+application = asgi.init_app(app)
+
+# Plantillas: bytecode compilado en disco (`flask build-templates`, por defecto en instance/jinja)
+# y cargado al arrancar; fragmentos estáticos del layout ({% cache %}) en memoria
+app.config['TEMPLATE_CACHE_DIR'] = None
+app.config['TEMPLATE_WARMUP'] = True
+app.config['FRAGMENT_CACHE_ENABLED'] = True
+plantillas.init_app(app)
+
+# Caché de páginas públicas para anónimos (ETag/Last-Modified -> 304 en visitas repetidas)
+app.config['PAGE_CACHE_ENABLED'] = True
+
 # =======================================================
 # UTILITY FUNCTIONS
 # =======================================================
@@ -30,6 +181,18 @@ def is_logged_in(f):
             return redirect(url_for('auth.login'))
     return wrap
 
+def is_admin(f):
+    """Decorator para rutas solo de administradores (incluye el chequeo de sesión)."""
+    @wraps(f)
+    @is_logged_in
+    def wrap(*args, **kwargs):
+        # El rol se lee de la BD, no de la sesión ni de la caché: quitarlo es inmediato
+        if user_is_admin(session.get('user_id')):
+            return f(*args, **kwargs)
+        flash('Acceso denegado. Esta sección es solo para administradores.', 'warning')
+        return redirect(url_for('main.profile'))
+    return wrap
+
 def format_title_case(text):
     """Aplica formato Title, eliminando espacios y caracteres no alfabéticos."""
     # Eliminar cualquier caracter que no sea letra (incluyendo espacios, números y puntuación)
@@ -52,11 +215,28 @@ def login():
         identifier = request.form['identifier']
         password = request.form['password']
         remember = 'remember_me' in request.form
+
+        # Se rechaza antes de tocar la BD o el hashing
+        throttle_enabled = app.config['LOGIN_THROTTLE_ENABLED']
+        if throttle_enabled:
+            retry_after = throttle.check_login(request.remote_addr, identifier)
+            if retry_after:
+                flash('Demasiados intentos de inicio de sesión. Espera unos minutos e inténtalo de nuevo.', 'danger')
+                return render_template('login.html'), 429, {'Retry-After': str(retry_after)}
         
-        user = get_user_by_email_or_username(identifier)
+        user = get_login_user(identifier)
 
-        if user and check_password_hash(user['password_hash'], password):
+        if user and verify_password(user['password_hash'], password):
+            if throttle_enabled:
+                throttle.record_success(identifier)
             # Login exitoso
+            # Si el hash usa parámetros anteriores (más débiles), se regenera en segundo plano
+            if needs_rehash(user['password_hash']):
+                user_id, old_hash = user['id'], user['password_hash']
+                # Condicional: si cambió la contraseña mientras tanto, el hash viejo no vuelve
+                rehash_in_background(password, lambda new_hash: update_user_password(user_id, new_hash, old_hash))
+            # Id de sesión nuevo al autenticarse (evita la fijación de sesión)
+            sessions.regenerate(session)
             session['logged_in'] = True
             session['user_id'] = user['id']
             session['username'] = user['usuario']
@@ -147,10 +327,43 @@ def register():
     return render_template('register.html', form_data=form_data)
 
 
+# Formatos que se verifican antes de consultar la BD (los mismos del registro/perfil)
+AVAILABILITY_FORMATS = {
+    'email': r'[^@\s]+@[^@\s]+\.[^@\s]+',
+    'usuario': r'[a-zA-Z0-9]{5,15}',
+    'telefono': r'\d{8}',
+}
+
+@auth_bp.route('/disponibilidad')
+def disponibilidad():
+    """JSON {campo: true (libre) | false (ocupado) | null (formato inválido)} para
+    ?email=...&usuario=...&telefono=... (uno o varios). Con sesión iniciada, los datos
+    propios cuentan como libres (formulario de perfil)."""
+    if app.config.get('LOGIN_THROTTLE_ENABLED', True):
+        retry_after = throttle.check_availability(request.remote_addr)
+        if retry_after:
+            return jsonify({'error': 'Demasiadas consultas'}), 429, {'Retry-After': str(retry_after)}
+
+    result, values = {}, {}
+    for field, pattern in AVAILABILITY_FORMATS.items():
+        value = request.args.get(field, '').strip()
+        if not value:
+            continue
+        if re.fullmatch(pattern, value):
+            values[field] = value
+        else:
+            result[field] = None
+    own_id = session.get('user_id') if session.get('logged_in') else None
+    for field, owner in find_owners(values).items():
+        result[field] = owner is None or owner == own_id
+    response = jsonify(result)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @auth_bp.route('/logout')
 def logout():
     """Ruta para cerrar la sesión del usuario."""
-    session.clear() # Limpia toda la información de la sesión
+    sessions.end(session) # Limpia toda la información de la sesión y cambia su id
     flash('Has cerrado sesión exitosamente.', 'info')
     return redirect(url_for('auth.login'))
 
@@ -162,6 +375,7 @@ main_bp = Blueprint('main', __name__, template_folder='templates')
 
 @main_bp.route('/index') 
 # @is_logged_in <--- ELIMINADO: Ahora es accesible públicamente
+@cached_page
 def index():
     """Ruta principal (Pública)."""
     return render_template('index.html')
@@ -186,14 +400,15 @@ def profile():
             'email': user_data['email'],
             'telefono': user_data['telefono'],
             'id': user_data['id'],
-            'apellido2': user_data['segundo_apellido'] # Pasamos el segundo apellido aquí
+            'apellido2': user_data['segundo_apellido'], # Pasamos el segundo apellido aquí
+            'es_admin': user_is_admin(user_id)
         }
         # IMPORTANTE: Ya NO pasamos page_title="Mi Perfil" para evitar la cabecera duplicada.
         return render_template('perfil.html', profile_data=profile_data)
     else:
         # En caso de que el user_id en la sesión no sea válido
+        sessions.end(session)
         flash('No se encontraron los datos del usuario. Por favor, inicia sesión de nuevo.', 'danger')
-        session.clear()
         return redirect(url_for('auth.login'))
 
 @main_bp.route('/change_password', methods=['POST'])
@@ -212,8 +427,9 @@ def change_password():
         flash('Error: Usuario no encontrado.', 'danger')
         return redirect(url_for('main.profile'))
 
-    # 2. Verificar la contraseña actual
-    if not check_password_hash(user['password_hash'], current_password):
+    # 2. Verificar la contraseña actual (el hash se lee de la BD, nunca de la caché)
+    password_hash = get_password_hash(user_id)
+    if not password_hash or not verify_password(password_hash, current_password):
         flash('La contraseña actual es incorrecta.', 'danger')
         return redirect(url_for('main.profile'))
 
@@ -228,12 +444,14 @@ def change_password():
         return redirect(url_for('main.profile'))
 
     # 5. Hashear y actualizar la contraseña
-    new_password_hash = generate_password_hash(new_password)
+    new_password_hash = hash_password(new_password)
     success = update_user_password(user_id, new_password_hash)
 
     if success:
+        # Cierra la sesión en todos los dispositivos, no solo en este
+        sessions.revoke_user_sessions(user_id)
+        sessions.end(session) # Forzar el cierre de sesión por seguridad
         flash('¡Contraseña actualizada exitosamente! Por favor, vuelve a iniciar sesión por seguridad.', 'success')
-        session.clear() # Forzar el cierre de sesión por seguridad
         return redirect(url_for('auth.login'))
     else:
         flash('Ocurrió un error al intentar actualizar la contraseña.', 'danger')
@@ -281,31 +499,193 @@ def update_profile_info():
 
     return redirect(url_for('main.profile'))
 
-# NUEVAS RUTAS DE NAVEGACIÓN (Públicas)
-@main_bp.route('/messages')
-# @is_logged_in <--- ELIMINADO
+# =======================================================
+# SOLICITUDES DE SERVICIO
+# =======================================================
+
+@main_bp.route('/solicitudes', methods=['GET', 'POST'])
+@is_logged_in
+def solicitudes_view():
+    """Formulario de solicitud de servicio + primera página del historial del usuario."""
+    user_id = session.get('user_id')
+    if request.method == 'POST':
+        datos, error = solicitudes.parse_form(request.form)
+        if error:
+            flash(error, 'danger')
+            return render_template('solicitudes.html', form_data=request.form, items=[], next_cursor=None,
+                                   tipos=solicitudes.TIPOS_SERVICIO, provincias=solicitudes.PROVINCIAS)
+        if solicitudes.create_solicitud(user_id, datos):
+            flash('¡Solicitud enviada! Te contactaremos para confirmarla.', 'success')
+        else:
+            flash('Ocurrió un error al guardar la solicitud.', 'danger')
+        return redirect(url_for('main.solicitudes_view'))
+
+    items, next_cursor = solicitudes.historial(user_id)
+    return render_template('solicitudes.html', form_data={}, items=items, next_cursor=next_cursor,
+                           tipos=solicitudes.TIPOS_SERVICIO, provincias=solicitudes.PROVINCIAS)
+
+@main_bp.route('/solicitudes/historial')
+@is_logged_in
+def solicitudes_historial():
+    """Siguiente página del historial en JSON (botón "ver más")."""
+    limit = request.args.get('limit', solicitudes.HISTORIAL_PAGE_SIZE, type=int)
+    try:
+        items, next_cursor = solicitudes.historial(session.get('user_id'), request.args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({'error': 'Cursor inválido'}), 400
+    return jsonify({'items': items, 'next_cursor': next_cursor})
+
+# =======================================================
+# MENSAJES (tiempo real por SSE)
+# =======================================================
+
+# Códigos de mensajes.publicar -> texto para el usuario
+MENSAJE_ERRORES = {
+    'empty': 'El mensaje está vacío.',
+    'too_long': f'El mensaje no puede exceder los {mensajes.MENSAJE_MAX_LENGTH} caracteres.',
+    'general_error': 'Ocurrió un error al enviar el mensaje. Intenta de nuevo.',
+}
+
+@main_bp.route('/messages', methods=['GET', 'POST'])
+@is_logged_in
 def messages():
-    """Vista de Mensajes (Pública)."""
-    return render_template('index.html', page_title="Mensajes")
+    """Vista de Mensajes: los del usuario y los generales, con los nuevos en vivo por SSE.
+    Los administradores (despacho) envían desde aquí a un usuario o a todos."""
+    user = get_user_by_id(session.get('user_id'))
+    es_admin = bool(user) and user_is_admin(user['id'])
+
+    if request.method == 'POST':
+        if not es_admin:
+            flash('Solo el despacho puede enviar mensajes.', 'warning')
+            return redirect(url_for('main.messages'))
+        destinatario = request.form.get('destinatario', '').strip()
+        canal = mensajes.CANAL_TODOS
+        if destinatario:
+            target = get_user_by_email_or_username(destinatario)
+            if target is None:
+                flash(f'No existe el usuario "{destinatario}".', 'danger')
+                return redirect(url_for('main.messages'))
+            canal = mensajes.canal_usuario(target['id'])
+        result = mensajes.publicar(user['id'], canal, request.form.get('cuerpo'))
+        if isinstance(result, str):
+            flash(MENSAJE_ERRORES[result], 'danger')
+        return redirect(url_for('main.messages'))
+
+    items = mensajes.recientes(session.get('user_id'))
+    return render_template('mensajes.html', items=items, es_admin=es_admin, ultimo=items[-1]['id'] if items else 0)
+
+@main_bp.route('/messages/stream')
+@is_logged_in
+def messages_stream():
+    """Stream SSE. La sesión se verifica solo aquí, al conectarse; después la conexión
+    ociosa solo espera al broker. Reanuda desde Last-Event-ID (o ?desde= la primera vez)."""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('desde')
+    try:
+        after_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return 'Last-Event-ID inválido', 400
+    # En modo ASGI el stream corre en el bucle de eventos y la conexión no ocupa un hilo
+    loop = asgi.event_loop()
+    stream = mensajes.open_stream(session.get('user_id'), after_id, loop=loop)
+    headers = {'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'}
+    if loop is not None:
+        return asgi.async_response(stream, mimetype='text/event-stream', headers=headers)
+    return Response(stream, mimetype='text/event-stream', headers=headers)
+
+# NUEVAS RUTAS DE NAVEGACIÓN (Públicas)
 
 @main_bp.route('/photos')
-# @is_logged_in <--- ELIMINADO
+@is_logged_in
 def photos():
-    """Vista de Fotos (Pública)."""
-    return render_template('index.html', page_title="Fotos")
+    """Vista de Fotos: subida desde el teléfono y las últimas fotos del usuario."""
+    return render_template('fotos.html', fotos_usuario=fotos.fotos_de_usuario(session.get('user_id')),
+                           max_bytes=fotos.UPLOAD_MAX_BYTES)
+
+@main_bp.route('/photos/subir', methods=['POST'])
+@is_logged_in
+def photos_subir():
+    """Recibe una o varias fotos (campo "fotos"). Responde en cuanto están guardadas en disco;
+    las miniaturas se generan después en segundo plano."""
+    guardadas, errores = [], []
+    # Los archivos se escriben a disco mientras llegan (no con el parser de request.files)
+    try:
+        _, archivos = fotos.parse_upload()
+    except RequestEntityTooLarge as e:
+        # Foto demasiado grande o demasiadas fotos: se descarta la subida entera
+        if request.accept_mimetypes.best == 'application/json':
+            return jsonify({'fotos': [], 'errores': [], 'error': e.description}), 413
+        flash(e.description, 'danger')
+        return redirect(url_for('main.photos'))
+    for storage in archivos.getlist('fotos'):
+        foto, error = fotos.store_upload(session.get('user_id'), storage)
+        if error:
+            errores.append({'nombre': storage.filename, 'error': error})
+        else:
+            guardadas.append(dict(foto, urls=fotos.foto_urls(foto)))
+
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({'fotos': guardadas, 'errores': errores}), 201 if guardadas else 400
+    # Formulario sin JavaScript
+    if guardadas:
+        flash(f'{len(guardadas)} foto(s) subida(s).', 'success')
+    for error in errores:
+        flash(f"{error['nombre'] or 'Archivo'}: {error['error']}.", 'danger')
+    return redirect(url_for('main.photos'))
 
 @main_bp.route('/settings')
 # @is_logged_in <--- ELIMINADO
+@cached_page
 def settings():
     """Vista de Ajustes (Pública)."""
     return render_template('index.html', page_title="Ajustes")
 
+# =======================================================
+# ADMINISTRACIÓN (admin_bp)
+# =======================================================
+
+admin_bp = Blueprint('admin', __name__, template_folder='templates')
+
+@admin_bp.route('/usuarios')
+@is_admin
+def usuarios():
+    """Buscador de usuarios. Sin JavaScript funciona igual con ?q= (resultados en el HTML)."""
+    query = request.args.get('q', '').strip()
+    result = busqueda.search_users(query, request.args.get('page', 1, type=int)) if query else None
+    return render_template('admin_usuarios.html', query=query, result=result)
+
+@admin_bp.route('/usuarios/buscar')
+@is_admin
+def usuarios_buscar():
+    """Búsqueda en JSON para el autocompletado: ?q=texto&page=N&per_page=M."""
+    result = busqueda.search_users(
+        request.args.get('q', ''),
+        request.args.get('page', 1, type=int),
+        request.args.get('per_page', busqueda.SEARCH_PAGE_SIZE, type=int),
+    )
+    return jsonify(result), 200, {'Cache-Control': 'no-store'}
+
+@admin_bp.route('/perfiles')
+@is_admin
+def perfiles():
+    """Capturas recientes del perfilador (ver profiler.py), la más nueva primero."""
+    return render_template('admin_perfiles.html', capturas=profiler.recent(),
+                           sample_rate=app.config['PROFILE_SAMPLE_RATE'], header=profiler.PROFILE_HEADER)
+
+@admin_bp.route('/perfiles/<filename>')
+@is_admin
+def perfil_archivo(filename):
+    """Descarga una captura: .folded (flamegraph), .prof (pstats) o .json."""
+    if not filename.endswith(('.folded', '.prof', '.json')):
+        abort(404)
+    return send_from_directory(profiler.profile_dir(), filename, as_attachment=True)
+
 # =======================================================
 # REGISTRO DE BLUEPRINTS Y RUTAS GLOBALES
 # =======================================================
 
 app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(main_bp, url_prefix='/')
+app.register_blueprint(admin_bp, url_prefix='/admin')
 
 # Redirección de la ruta raíz (solicitud inicial de "/" ) a la página de inicio de sesión
 @app.route('/')
@@ -320,6 +700,8 @@ def home():
 
 # PROHIBIDO TOCAR ESTA ÁREA NI LOS COMENTARIOS 
 if __name__ == '__main__':
+    # El servidor de desarrollo atiende directo a los clientes: X-Forwarded-For sería de ellos
+    app.config['TRUSTED_PROXIES'] = 0
     app.run(host='0.0.0.0', debug=True, port=3030)
 
 
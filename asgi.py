@@ -0,0 +1,331 @@
+# asgi.py
+"""Modo de servicio asíncrono (ASGI) para la app Flask.
+
+    uvicorn app:application --port 3030 --no-date-header
+    flask serve-async --port 3030
+
+Con el servidor WSGI multihilo cada conexión ocupa un hilo mientras dura: mientras un
+cliente móvil lento sube el cuerpo, mientras descarga la respuesta y durante toda la
+vida de un stream SSE. Aquí las conexiones las lleva un bucle de eventos (asyncio) y
+los hilos solo se usan para el trabajo de la app:
+
+- El cuerpo de la petición se recibe en el bucle y se guarda en un archivo temporal
+  (en memoria hasta ASGI_SPOOL_MEMORY); la app lo recibe ya completo.
+- La app (rutas, plantillas, sesión, SQLite y hashing, sin cambios) corre en un pool de
+  ASGI_WORKERS hilos; cada uno conserva su conexión del pool de SQLite (config.py).
+- La respuesta se envía desde el bucle al ritmo del cliente; las grandes se leen de la
+  app en tramos de ASGI_CHUNK_BYTES.
+- Una ruta puede responder con un generador asíncrono (`async_response`, p. ej. el
+  stream de /messages): la conexión queda esperando en el bucle sin ocupar ningún hilo.
+
+La cabecera Date la pone el adaptador si la app no la trae (Werkzeug la agrega en las
+respuestas condicionales); por eso uvicorn corre con --no-date-header, para no duplicarla.
+
+Con más de ASGI_WORKERS + ASGI_MAX_QUEUE peticiones esperando hilo se responde 503,
+igual que el pool de hashing.
+"""
+import asyncio
+import json
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import Response, request
+from werkzeug.http import http_date
+
+ASGI_WORKERS = 16 # Igual que DB_POOL_SIZE: cada hilo se queda con una conexión SQLite
+ASGI_MAX_QUEUE = None # None = 16 peticiones en espera por hilo
+ASGI_SPOOL_MEMORY = 1024 * 1024 # Cuerpos más grandes se pasan a disco
+ASGI_CHUNK_BYTES = 256 * 1024 # Respuesta que se lee de la app por cada salto al pool
+
+# Claves propias en el environ WSGI (solo existen en modo ASGI)
+LOOP_KEY = 'transavi.asgi.loop'
+ASYNC_BODY_KEY = 'transavi.asgi.body'
+
+
+def event_loop():
+    """Bucle de eventos que atiende la petición actual, o None si se sirve por WSGI."""
+    return request.environ.get(LOOP_KEY)
+
+
+def async_response(body, **kwargs):
+    """Respuesta cuyo cuerpo es un generador asíncrono que corre en el bucle (solo ASGI)."""
+    request.environ[ASYNC_BODY_KEY] = body
+    return Response(iter(()), **kwargs) # Iterable sin largo: no se fija Content-Length
+
+
+class RequestTooLarge(Exception):
+    """El cuerpo de la petición supera ASGI_MAX_BODY."""
+
+
+_date = (0, b'')
+
+
+def _date_header():
+    """Valor de Date para el segundo actual (se formatea una vez por segundo)."""
+    global _date
+    now = int(time.time())
+    if _date[0] != now:
+        _date = (now, http_date(now).encode('latin-1'))
+    return _date[1]
+
+
+def _close(app_iter):
+    close = getattr(app_iter, 'close', None)
+    if close is not None:
+        close()
+
+
+class ASGIAdapter:
+    """Aplicación ASGI que sirve una app WSGI sin dedicar un hilo a cada conexión."""
+
+    def __init__(self, wsgi_app, workers=ASGI_WORKERS, max_queue=ASGI_MAX_QUEUE, max_body=None,
+                 spool_memory=ASGI_SPOOL_MEMORY, chunk_bytes=ASGI_CHUNK_BYTES):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='asgi')
+        self.max_inflight = workers + (workers * 16 if max_queue is None else max_queue)
+        self.max_body = max_body
+        self.spool_memory = spool_memory
+        self.chunk_bytes = chunk_bytes
+        # Solo se tocan desde el bucle de eventos: no necesitan lock
+        self.inflight = 0 # Peticiones esperando o usando un hilo del pool
+        self.rejected = 0 # Respondidas con 503 por pool saturado
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self.handle(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        else:
+            raise RuntimeError(f"Tipo de conexión no soportado: {scope['type']}")
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle(self, scope, receive, send):
+        try:
+            body, length = await self.read_body(scope, receive)
+        except RequestTooLarge:
+            await self.reject(scope, send, 413, 'La petición es demasiado grande.')
+            return
+        if body is None:
+            return # El cliente se fue antes de terminar de enviar
+        if self.inflight >= self.max_inflight:
+            body.close()
+            self.rejected += 1
+            await self.reject(scope, send, 503, 'Servidor ocupado, intenta de nuevo.', [(b'retry-after', b'1')])
+            return
+
+        loop = asyncio.get_running_loop()
+        environ = self.build_environ(scope, body, length, loop)
+        self.inflight += 1
+        try:
+            status, headers, app_iter, iterator, chunk, done = await loop.run_in_executor(self.executor, self.start, environ)
+        finally:
+            self.inflight -= 1
+            body.close()
+
+        async_body = environ.get(ASYNC_BODY_KEY)
+        if async_body is not None:
+            # Se arranca ya, para que su `finally` (p. ej. anular la suscripción) quede
+            # armado aunque el cliente se vaya antes del primer envío
+            try:
+                chunk = await async_body.__anext__()
+            except StopAsyncIteration:
+                chunk, async_body = b'', None
+
+        response_headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        if not any(name == b'date' for name, _ in response_headers):
+            response_headers.append((b'date', _date_header()))
+        try:
+            await send({'type': 'http.response.start', 'status': int(status[:3]), 'headers': response_headers})
+            if async_body is not None:
+                await self.stream(async_body, chunk, receive, send)
+                return
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': not done})
+            while not done:
+                chunk, done = await loop.run_in_executor(self.executor, self.pull, app_iter, iterator)
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': not done})
+        finally:
+            if async_body is not None:
+                await async_body.aclose()
+            elif not done:
+                self.executor.submit(_close, app_iter) # Cliente desconectado a medio cuerpo
+
+    async def read_body(self, scope, receive):
+        """Recibe el cuerpo completo en el bucle. Retorna (archivo, largo), o (None, 0) si
+        el cliente se desconectó."""
+        if self.max_body is not None:
+            for name, value in scope['headers']:
+                if name == b'content-length' and value.isdigit() and int(value) > self.max_body:
+                    raise RequestTooLarge()
+        body = tempfile.SpooledTemporaryFile(max_size=self.spool_memory)
+        length = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None, 0
+            chunk = message.get('body', b'')
+            length += len(chunk)
+            if self.max_body is not None and length > self.max_body:
+                body.close()
+                raise RequestTooLarge()
+            if chunk:
+                body.write(chunk) # En disco va a la caché de páginas del SO: no bloquea el bucle
+            if not message.get('more_body', False):
+                break
+        body.seek(0)
+        return body, length
+
+    def build_environ(self, scope, body, length, loop):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        root_path = scope.get('root_path', '')
+        path = scope['path']
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            # WSGI pide los bytes de la ruta como latin-1
+            'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+            'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1] or 80),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'CONTENT_LENGTH': str(length), # El cuerpo ya está completo (aunque llegara por chunks)
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            LOOP_KEY: loop,
+        }
+        for name, value in scope['headers']:
+            name = name.decode('latin-1').upper().replace('-', '_')
+            value = value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+            elif name not in ('CONTENT_LENGTH', 'TRANSFER_ENCODING'):
+                key = f'HTTP_{name}'
+                if key in environ:
+                    value = environ[key] + ('; ' if name == 'COOKIE' else ',') + value
+                environ[key] = value
+        return environ
+
+    def start(self, environ):
+        """En un hilo del pool: llama a la app y lee el primer tramo de la respuesta."""
+        started = []
+        written = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+            return written.append # `write()` de WSGI: se envía antes que el cuerpo
+
+        app_iter = self.wsgi_app(environ, start_response)
+        if ASYNC_BODY_KEY in environ:
+            _close(app_iter)
+            return started[0], started[1], None, None, b'', True
+        iterator = iter(app_iter)
+        chunk, done = self.pull(app_iter, iterator)
+        status, headers = started # Algunas apps llaman a start_response al iterar
+        return status, headers, app_iter, iterator, b''.join(written) + chunk, done
+
+    def pull(self, app_iter, iterator):
+        """En un hilo del pool: lee hasta `chunk_bytes` de la respuesta; al terminar la cierra."""
+        chunks, size = [], 0
+        try:
+            for chunk in iterator:
+                if chunk:
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= self.chunk_bytes:
+                        return b''.join(chunks), False
+        except BaseException:
+            _close(app_iter)
+            raise
+        _close(app_iter)
+        return b''.join(chunks), True
+
+    async def stream(self, body, first, receive, send):
+        """Envía un cuerpo asíncrono hasta que se agota o el cliente se desconecta."""
+        async def produce():
+            await send({'type': 'http.response.body', 'body': first, 'more_body': True})
+            async for chunk in body:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+        async def disconnected():
+            # El cuerpo ya se leyó completo: lo único que puede llegar es la desconexión
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        tasks = [asyncio.ensure_future(produce()), asyncio.ensure_future(disconnected())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if tasks[0] in done:
+            tasks[0].result() # Propaga errores del generador
+
+    async def plain(self, send, status, text, headers=(), content_type=b'text/plain; charset=utf-8'):
+        body = text.encode('utf-8')
+        await send({'type': 'http.response.start', 'status': status, 'headers': [
+            (b'content-type', content_type), (b'content-length', str(len(body)).encode()),
+            (b'date', _date_header()), *headers,
+        ]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def reject(self, scope, send, status, text, headers=()):
+        """Error sin pasar por la app: JSON {"error": ...} si el cliente lo pide (fotos.js), si no texto."""
+        accept = b''.join(value for name, value in scope['headers'] if name == b'accept')
+        if b'application/json' in accept:
+            await self.plain(send, status, json.dumps({'error': text}, ensure_ascii=False), headers,
+                             content_type=b'application/json')
+        else:
+            await self.plain(send, status, text, headers)
+
+    def gauges(self):
+        return (
+            ('transavi_asgi_inflight', 'Peticiones ASGI esperando o usando un hilo del pool.', self.inflight),
+            ('transavi_asgi_rejected_total', 'Peticiones ASGI rechazadas con 503 por pool saturado.', self.rejected),
+        )
+
+
+def init_app(app):
+    """Crea la aplicación ASGI de `app` y registra `flask serve-async`. Retorna el adaptador."""
+    adapter = ASGIAdapter(
+        app,
+        workers=app.config.get('ASGI_WORKERS', ASGI_WORKERS),
+        max_queue=app.config.get('ASGI_MAX_QUEUE', ASGI_MAX_QUEUE),
+        max_body=app.config.get('ASGI_MAX_BODY'),
+    )
+
+    @app.cli.command('serve-async')
+    @click.option('--host', default='127.0.0.1', show_default=True)
+    @click.option('--port', default=3030, show_default=True)
+    def serve_async_command(host, port):
+        """Sirve la app en modo asíncrono (ASGI) con uvicorn."""
+        try:
+            import uvicorn
+        except ImportError: # Dependencia opcional: solo hace falta para este modo
+            raise click.ClickException('El modo asíncrono necesita uvicorn: pip install uvicorn')
+        uvicorn.run(adapter, host=host, port=port, lifespan='on', date_header=False)
+
+    return adapter
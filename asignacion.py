@@ -0,0 +1,283 @@
+# asignacion.py
+"""Asignación de vehículos de colaboradores a las solicitudes de servicio.
+
+Para saber qué vehículos están libres no se recorren las reservas en SQLite: cada
+proceso mantiene un índice en memoria con
+
+- por provincia, los vehículos ordenados por capacidad (bisect al primero que alcanza)
+- por vehículo, sus reservas ordenadas por inicio (bisect para ver si un rango choca)
+
+y lo sincroniza de forma incremental leyendo asignacion_log (tabla que llenan los
+triggers de la migración 4) desde el último `seq` visto. Las escrituras que asignan se
+hacen con BEGIN IMMEDIATE y el índice se sincroniza ya con el lock tomado, así que dos
+procesos nunca entregan el mismo vehículo para rangos que se cruzan.
+
+    flask --app app asignar 2026-11-05      (asigna las solicitudes pendientes del día)
+"""
+import bisect
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import click
+
+import config
+from config import get_db_connection
+
+# Entradas de asignacion_log más viejas que esto se borran al asignar en lote
+LOG_RETENTION_DAYS = 2
+
+DEFAULT_CANDIDATES = 5
+
+
+def rango_solicitud(fecha_inicio, fecha_fin=None):
+    """Rango [inicio, fin) que ocupa una solicitud: desde la hora de salida hasta el final
+    del último día (el de regreso si abarca varios días)."""
+    ultimo_dia = datetime.strptime((fecha_fin or fecha_inicio)[:10], '%Y-%m-%d')
+    fin = (ultimo_dia + timedelta(days=1)).strftime('%Y-%m-%d 00:00')
+    return fecha_inicio, fin
+
+
+# =======================================================
+# ÍNDICE EN MEMORIA
+# =======================================================
+
+class AssignmentIndex:
+    """Vehículos por provincia/capacidad y reservas por vehículo (listas ordenadas).
+
+    Las fechas son cadenas 'YYYY-MM-DD HH:MM', que se ordenan igual que las fechas.
+    Las reservas de un mismo vehículo nunca se cruzan (así se crean), por eso basta con
+    mirar la reserva anterior al punto de inserción para saber si un rango está libre.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.database = None
+        self.last_seq = 0
+        self.vehiculos = {} # id -> dict
+        self.por_provincia = {} # provincia -> [(capacidad, id)] ordenada
+        self.reservas = {} # vehiculo_id -> [(inicio, fin, reserva_id)] ordenada
+        self.reserva_de = {} # reserva_id -> (vehiculo_id, inicio, fin)
+
+    # --- carga y sincronización ---
+
+    def load(self, conn):
+        """Carga completa (al arrancar, al cambiar de base o si la bitácora ya se purgó)."""
+        self._reset()
+        self.database = config.DATABASE
+        self.last_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM asignacion_log').fetchone()[0]
+        for row in conn.execute('SELECT * FROM vehiculos WHERE activo = 1'):
+            self._put_vehiculo(dict(row))
+        rows = conn.execute('SELECT id, vehiculo_id, inicio, fin FROM reservas ORDER BY vehiculo_id, inicio').fetchall()
+        for reserva_id, vehiculo_id, inicio, fin in rows:
+            # Ya vienen ordenadas: append en vez de insort
+            self.reservas.setdefault(vehiculo_id, []).append((inicio, fin, reserva_id))
+            self.reserva_de[reserva_id] = (vehiculo_id, inicio, fin)
+
+    def sync(self, conn):
+        """Aplica los cambios anotados en asignacion_log desde la última sincronización."""
+        if self.database != config.DATABASE:
+            self.load(conn)
+            return
+        changes = conn.execute(
+            'SELECT seq, tabla, fila_id FROM asignacion_log WHERE seq > ? ORDER BY seq', (self.last_seq,)
+        ).fetchall()
+        if not changes:
+            return
+        if changes[0][0] != self.last_seq + 1:
+            # Los escritores van de a uno, así que los seq confirmados son consecutivos:
+            # un hueco significa que se purgaron cambios que este proceso no vio.
+            self.load(conn)
+            return
+        for tabla, fila_id in {(tabla, fila_id) for _, tabla, fila_id in changes}:
+            if tabla == 'vehiculos':
+                row = conn.execute('SELECT * FROM vehiculos WHERE id = ?', (fila_id,)).fetchone()
+                self._drop_vehiculo(fila_id)
+                if row is not None and row['activo']:
+                    self._put_vehiculo(dict(row))
+            else:
+                row = conn.execute('SELECT vehiculo_id, inicio, fin FROM reservas WHERE id = ?', (fila_id,)).fetchone()
+                self._drop_reserva(fila_id)
+                if row is not None:
+                    self._add_reserva(fila_id, *row)
+        self.last_seq = changes[-1][0]
+
+    def _put_vehiculo(self, vehiculo):
+        self.vehiculos[vehiculo['id']] = vehiculo
+        bisect.insort(self.por_provincia.setdefault(vehiculo['provincia'], []), (vehiculo['capacidad'], vehiculo['id']))
+
+    def _drop_vehiculo(self, vehiculo_id):
+        vehiculo = self.vehiculos.pop(vehiculo_id, None)
+        if vehiculo is not None:
+            self.por_provincia[vehiculo['provincia']].remove((vehiculo['capacidad'], vehiculo_id))
+
+    def _add_reserva(self, reserva_id, vehiculo_id, inicio, fin):
+        if reserva_id in self.reserva_de:
+            return
+        bisect.insort(self.reservas.setdefault(vehiculo_id, []), (inicio, fin, reserva_id))
+        self.reserva_de[reserva_id] = (vehiculo_id, inicio, fin)
+
+    def _drop_reserva(self, reserva_id):
+        previous = self.reserva_de.pop(reserva_id, None)
+        if previous is None:
+            return
+        vehiculo_id, inicio, fin = previous
+        intervals = self.reservas[vehiculo_id]
+        position = bisect.bisect_left(intervals, (inicio, fin, reserva_id))
+        if position < len(intervals) and intervals[position][2] == reserva_id:
+            intervals.pop(position)
+
+    # --- consultas ---
+
+    def libre(self, vehiculo_id, inicio, fin):
+        """True si el vehículo no tiene reservas que se crucen con [inicio, fin)."""
+        intervals = self.reservas.get(vehiculo_id)
+        if not intervals:
+            return True
+        # Primera reserva que empieza en o después de `fin`: esa y las siguientes no chocan
+        position = bisect.bisect_left(intervals, (fin,))
+        # Las anteriores no se cruzan entre sí: basta con que la última termine antes de `inicio`
+        return position == 0 or intervals[position - 1][1] <= inicio
+
+    def disponibles(self, provincia, pasajeros, inicio, fin, limit=DEFAULT_CANDIDATES):
+        """Vehículos libres de la provincia con capacidad suficiente, del más chico al más grande."""
+        candidates = self.por_provincia.get(provincia, [])
+        result = []
+        for position in range(bisect.bisect_left(candidates, (pasajeros,)), len(candidates)):
+            vehiculo_id = candidates[position][1]
+            if self.libre(vehiculo_id, inicio, fin):
+                result.append(self.vehiculos[vehiculo_id])
+                if len(result) >= limit:
+                    break
+        return result
+
+
+index = AssignmentIndex()
+
+
+# =======================================================
+# API
+# =======================================================
+
+def create_vehiculo(user_id, tipo_vehiculo, marca, capacidad, provincia):
+    """Registra el vehículo de un colaborador. Retorna su id o None si falla."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            'INSERT INTO vehiculos (user_id, tipo_vehiculo, marca, capacidad, provincia) VALUES (?, ?, ?, ?, ?)',
+            (user_id, tipo_vehiculo, marca, capacidad, provincia)
+        )
+        conn.commit()
+        return cursor.lastrowid
+    except sqlite3.Error as e:
+        print(f"Error al registrar el vehículo: {e}")
+        conn.rollback()
+        return None
+
+
+def vehiculos_disponibles(provincia, pasajeros, fecha_inicio, fecha_fin=None, limit=DEFAULT_CANDIDATES):
+    """Vehículos libres para una solicitud (fechas como en la tabla solicitudes)."""
+    inicio, fin = rango_solicitud(fecha_inicio, fecha_fin)
+    conn = get_db_connection()
+    with index.lock:
+        index.sync(conn)
+        return index.disponibles(provincia, pasajeros, inicio, fin, limit)
+
+
+def _asignar_en_transaccion(conn, solicitudes_pendientes):
+    """Reserva un vehículo para cada solicitud (ya con BEGIN IMMEDIATE y el índice al día).
+
+    Retorna {solicitud_id: vehiculo_id o None}.
+    """
+    result = {}
+    for solicitud in solicitudes_pendientes:
+        inicio, fin = rango_solicitud(solicitud['fecha_inicio'], solicitud['fecha_fin'])
+        candidates = index.disponibles(solicitud['provincia_origen'], solicitud['pasajeros'], inicio, fin, limit=1)
+        if not candidates:
+            result[solicitud['id']] = None
+            continue
+        vehiculo_id = candidates[0]['id']
+        cursor = conn.execute(
+            'INSERT INTO reservas (vehiculo_id, solicitud_id, inicio, fin) VALUES (?, ?, ?, ?)',
+            (vehiculo_id, solicitud['id'], inicio, fin)
+        )
+        conn.execute("UPDATE solicitudes SET estado = 'asignada' WHERE id = ?", (solicitud['id'],))
+        # Se agrega ya al índice para que la siguiente solicitud del lote lo vea ocupado
+        index._add_reserva(cursor.lastrowid, vehiculo_id, inicio, fin)
+        result[solicitud['id']] = vehiculo_id
+    return result
+
+
+def _asignar(query, params):
+    conn = get_db_connection()
+    with index.lock:
+        try:
+            conn.commit() # BEGIN IMMEDIATE no puede ir dentro de una transacción abierta
+            conn.execute('BEGIN IMMEDIATE')
+            index.sync(conn) # Con el lock de escritura tomado nadie más puede reservar
+            pendientes = [dict(row) for row in conn.execute(query, params)]
+            result = _asignar_en_transaccion(conn, pendientes)
+            conn.commit()
+            return result
+        except sqlite3.Error as e:
+            print(f"Error al asignar vehículos: {e}")
+            conn.rollback()
+            index.database = None # El índice pudo quedar con reservas que no se guardaron
+            return None
+
+
+def asignar(solicitud_id):
+    """Asigna un vehículo a una solicitud pendiente. Retorna el id del vehículo o None."""
+    result = _asignar(
+        "SELECT * FROM solicitudes WHERE id = ? AND estado = 'pendiente'", (solicitud_id,)
+    )
+    return (result or {}).get(solicitud_id)
+
+
+def asignar_pendientes(fecha):
+    """Asigna en una sola pasada todas las solicitudes pendientes que salen el día `fecha`.
+
+    Los grupos grandes van primero (tienen menos vehículos posibles). Retorna
+    {solicitud_id: vehiculo_id o None} o None si hubo un error.
+    """
+    result = _asignar(
+        '''SELECT * FROM solicitudes
+           WHERE estado = 'pendiente' AND fecha_inicio >= ? AND fecha_inicio < ?
+           ORDER BY pasajeros DESC, fecha_inicio, id''',
+        (fecha, f'{fecha}~') # '~' va después de cualquier hora: cubre todo el día
+    )
+    purge_log()
+    return result
+
+
+def purge_log(days=LOG_RETENTION_DAYS):
+    """Borra entradas viejas de la bitácora (un proceso atrasado hará una carga completa).
+
+    La última entrada se conserva siempre: es la que delata el hueco a quien quedó atrás.
+    """
+    conn = get_db_connection()
+    conn.execute(
+        "DELETE FROM asignacion_log WHERE creado < julianday('now') - ? AND seq < (SELECT MAX(seq) FROM asignacion_log)",
+        (days,)
+    )
+    conn.commit()
+
+
+def init_app(app):
+    """Registra el comando `flask asignar`."""
+
+    @app.cli.command('asignar')
+    @click.argument('fecha')
+    def asignar_command(fecha):
+        """Asigna vehículos a las solicitudes pendientes del día FECHA (YYYY-MM-DD)."""
+        result = asignar_pendientes(fecha)
+        if result is None:
+            raise click.ClickException('No se pudo completar la asignación.')
+        asignadas = sum(1 for vehiculo_id in result.values() if vehiculo_id is not None)
+        click.echo(f'{asignadas} de {len(result)} solicitudes asignadas.')
+        for solicitud_id, vehiculo_id in result.items():
+            if vehiculo_id is None:
+                click.echo(f'  Sin vehículo disponible: solicitud {solicitud_id}')
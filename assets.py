@@ -0,0 +1,207 @@
+# assets.py
+"""Pipeline de archivos estáticos: bundles por página, nombres con hash y precompresión.
+
+    flask --app app build-assets
+
+genera en static/dist/ un archivo por bundle (concatenado y minificado) con el hash de
+su contenido en el nombre, sus variantes .gz y .br (si está instalado `brotli`) y un
+manifest.json {nombre lógico -> archivo con hash}. Las plantillas piden las URLs con
+`asset_urls('js/login.js')`; si aún no se hizo el build se sirven los archivos fuente.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+import click
+from flask import abort, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError: # Dependencia opcional: sin ella solo se generan las variantes .gz
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# Nombre lógico del bundle -> archivos fuente (relativos a static/), en orden.
+BUNDLES = {
+    'css/app.css': ['css/main.css'], # main.css importa base, index, login, register, solicitudes, admin, fotos y mensajes
+    'js/base.js': ['js/base.js', 'js/register-sw.js'], # Todas las páginas
+    'js/index.js': ['js/index.js'], # Pestañas de la página de inicio
+    'js/login.js': ['js/login.js'],
+    'js/register.js': ['js/availability.js', 'js/register.js'],
+    'js/perfil.js': ['js/availability.js', 'js/perfil.js'], # Aviso de datos ya registrados al editar
+    'js/solicitudes.js': ['js/solicitudes.js'], # Formulario e historial de solicitudes
+    'js/admin.js': ['js/admin.js'], # Buscador de usuarios de administración
+    'js/fotos.js': ['js/fotos.js'], # Subida de fotos con progreso
+    'js/mensajes.js': ['js/mensajes.js'], # Mensajes en vivo (SSE)
+}
+
+# Los archivos con hash nunca cambian: el navegador puede guardarlos un año sin revalidar.
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+
+_IMPORT_RE = re.compile(r'''@import\s+(?:url\()?\s*['"]?([^'")\s]+)['"]?\s*\)?\s*;''')
+_URL_RE = re.compile(r'''url\(\s*['"]?([^'")]+)['"]?\s*\)''')
+
+_manifest = None
+_manifest_mtime = None
+
+
+# =======================================================
+# BUILD
+# =======================================================
+
+def _read_css(path, seen):
+    """Lee un CSS resolviendo sus @import locales y dejando las url() relativas absolutas."""
+    if path in seen:
+        return ''
+    seen.add(path)
+    base_dir = os.path.dirname(path)
+    with open(path, encoding='utf-8') as f:
+        css = f.read()
+
+    def absolute_url(match):
+        target = match.group(1)
+        if target.startswith(('data:', 'http:', 'https:', '/', '#')):
+            return match.group(0)
+        resolved = os.path.relpath(os.path.normpath(os.path.join(base_dir, target)), STATIC_DIR)
+        return f"url('/static/{resolved.replace(os.sep, '/')}')"
+
+    # Los @import van al inicio de un CSS: se insertan (ya resueltos) antes del cuerpo
+    imported = []
+    for target in _IMPORT_RE.findall(css):
+        resolved = os.path.normpath(os.path.join(base_dir, target))
+        if os.path.exists(resolved):
+            imported.append(_read_css(resolved, seen))
+        else:
+            click.echo(f'  aviso: @import a {target} no existe, se omite.', err=True)
+    body = _URL_RE.sub(absolute_url, _IMPORT_RE.sub('', css))
+    return ''.join(imported) + body
+
+
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(js):
+    """Minificación conservadora: sin líneas vacías, indentación ni comentarios de línea completa."""
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//')) + '\n'
+
+
+def build_bundle(name, sources):
+    if name.endswith('.css'):
+        seen = set()
+        return minify_css(''.join(_read_css(os.path.join(STATIC_DIR, src), seen) for src in sources))
+    parts = []
+    for src in sources:
+        with open(os.path.join(STATIC_DIR, src), encoding='utf-8') as f:
+            parts.append(f.read())
+    # El ';' evita que dos archivos se "peguen" en una misma expresión
+    return minify_js(';\n'.join(parts))
+
+
+def write_precompressed(path, data):
+    """Escribe el archivo y sus variantes .gz/.br (a máxima compresión: se hace una vez)."""
+    with open(path, 'wb') as f:
+        f.write(data)
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build(bundles=BUNDLES):
+    """Genera todos los bundles en static/dist y escribe el manifest. Retorna el manifest."""
+    manifest = {}
+    for name, sources in bundles.items():
+        data = build_bundle(name, sources).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = os.path.splitext(name)
+        hashed = f'{stem}.{digest}{ext}'
+        target = os.path.join(DIST_DIR, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        write_precompressed(target, data)
+        manifest[name] = hashed
+    write_manifest(manifest)
+    return manifest
+
+
+def write_manifest(entries):
+    """Mezcla `entries` en el manifest (otros pasos del build agregan sus propias claves)."""
+    manifest = dict(load_manifest())
+    manifest.update(entries)
+    os.makedirs(DIST_DIR, exist_ok=True)
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+# =======================================================
+# RUNTIME
+# =======================================================
+
+def load_manifest():
+    """Retorna el manifest (recargándolo solo si el archivo cambió)."""
+    global _manifest, _manifest_mtime
+    try:
+        mtime = os.path.getmtime(MANIFEST_PATH)
+    except OSError:
+        return {}
+    if mtime != _manifest_mtime:
+        with open(MANIFEST_PATH, encoding='utf-8') as f:
+            _manifest = json.load(f)
+        _manifest_mtime = mtime
+    return _manifest
+
+
+def asset_urls(name):
+    """URLs a incluir para un bundle: el archivo con hash, o las fuentes si no hay build."""
+    hashed = load_manifest().get(name)
+    if hashed:
+        return [url_for('asset', filename=hashed)]
+    return [url_for('static', filename=src) for src in BUNDLES.get(name, [name])]
+
+
+def serve_asset(filename):
+    """Sirve un archivo de static/dist, precomprimido según Accept-Encoding si se puede."""
+    path = os.path.join(DIST_DIR, filename)
+    if not os.path.isfile(path):
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    served, encoding = filename, None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[candidate] and os.path.isfile(path + suffix):
+            served, encoding = filename + suffix, candidate
+            break
+    response = send_from_directory(DIST_DIR, served, mimetype=mimetype, max_age=ASSET_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    """Registra /assets/<archivo>, el helper `asset_urls` y el comando `flask build-assets`."""
+    app.add_url_rule('/assets/<path:filename>', 'asset', serve_asset)
+    app.jinja_env.globals['asset_urls'] = asset_urls
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Genera los bundles con hash y sus variantes precomprimidas en static/dist."""
+        for name, hashed in build().items():
+            click.echo(f'{name} -> dist/{hashed}')
+
+
+if __name__ == '__main__':
+    for name, hashed in build().items():
+        print(f'{name} -> dist/{hashed}')
@@ -0,0 +1,22 @@
+# bench/__init__.py
+"""Benchmarks reproducibles de los flujos de autenticación y perfil.
+
+    python -m bench --users 10000 100000 --requests 300 --threads 8
+    python -m bench --users 100000 --save-baseline bench/baselines/100k.json
+    python -m bench --users 100000 --compare bench/baselines/100k.json
+
+Cada corrida siembra una base SQLite sintética (seed.py), importa la app apuntando a
+ella y recorre los escenarios con el test client de Flask y con un servidor WSGI real
+multihilo (runner.py).
+
+    python -m bench.asignacion --bookings 50000
+    python -m bench.busqueda --users 1000000
+    python -m bench.mensajes --connections 1000
+    python -m bench.conexiones --slow-clients 1000
+    python -m bench.plantillas --renders 2000
+
+miden por separado el motor de asignación de vehículos (asignacion.py), la búsqueda
+de usuarios de administración (busqueda.py), los mensajes por SSE (mensajes.py), las
+conexiones lentas con el servidor WSGI multihilo frente al modo ASGI (asgi.py) y el
+render de plantillas con bytecode precompilado y fragmentos en caché (plantillas.py).
+"""
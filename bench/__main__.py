@@ -0,0 +1,87 @@
+# bench/__main__.py
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import threading
+
+import config
+from bench.runner import SCENARIOS, ClientSession, HTTPSession, cleanup, compare, run_scenario, save_baseline
+from bench.seed import seed_users
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='Benchmarks de login, registro y perfil.')
+    parser.add_argument('--users', type=int, nargs='+', default=[10_000], help='Tamaños de la tabla users (p. ej. 10000 100000 1000000).')
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--modes', nargs='+', choices=('client', 'wsgi'), default=['client', 'wsgi'])
+    parser.add_argument('--requests', type=int, default=200, help='Iteraciones por escenario.')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--db-dir', default=os.path.join(tempfile.gettempdir(), 'transavi-bench'))
+    parser.add_argument('--save-baseline', metavar='JSON')
+    parser.add_argument('--compare', metavar='JSON')
+    parser.add_argument('--tolerance', type=float, default=0.20)
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.db_dir, exist_ok=True)
+    databases = {count: seed_users(os.path.join(args.db_dir, f'users_{count}.db'), count) for count in args.users}
+
+    # La app se importa ya apuntando a una base de benchmark (nunca a db.db)
+    config.DATABASE = databases[args.users[0]]
+    from app import app
+    import hashing
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app.config['LOGIN_THROTTLE_ENABLED'] = False # El benchmark repite logins desde una sola IP
+    hashing.configure(workers=app.config.get('HASH_WORKERS'), max_queue=args.threads * 2)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'sqlite': __import__('sqlite3').sqlite_version,
+            'hash_method': hashing.current_method(),
+            'threads': args.threads,
+            'requests': args.requests,
+        },
+        'results': {},
+    }
+    for count, database in databases.items():
+        config.DATABASE = database
+        config.user_cache.clear()
+        results = report['results'].setdefault(str(count), {})
+        for mode in args.modes:
+            server = None
+            if mode == 'wsgi':
+                from werkzeug.serving import make_server
+                server = make_server('127.0.0.1', 0, app, threaded=True)
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+            session_class = HTTPSession if mode == 'wsgi' else ClientSession
+            base_url = ('127.0.0.1', server.server_port) if server else None
+            for name in args.scenarios:
+                result = run_scenario(app, SCENARIOS[name], session_class, count, args.requests, args.threads, base_url)
+                results.setdefault(mode, {})[name] = result
+                print(f'{count:>8} {mode:<6} {name:<20} {result["throughput_rps"]:>9.1f} rps  '
+                      f'p50 {result["p50_ms"]:>8.2f}  p95 {result["p95_ms"]:>8.2f}  p99 {result["p99_ms"]:>8.2f} ms  '
+                      f'{result["queries_per_request"]:>5.2f} consultas  {result["errors"]} errores')
+            if server:
+                server.shutdown()
+            cleanup(database)
+
+    if args.save_baseline:
+        save_baseline(report, args.save_baseline)
+        print(f'Línea base guardada en {args.save_baseline}')
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f'REGRESIÓN {line}')
+        if regressions:
+            return 1
+        print('Sin regresiones respecto a la línea base.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,136 @@
+# bench/asignacion.py
+"""Benchmark del motor de asignación (asignacion.py) contra una base con muchas reservas.
+
+    python -m bench.asignacion --bookings 50000 --vehicles 2000 --queries 2000
+
+Mide la búsqueda de vehículos disponibles con el índice en memoria (incluida la
+sincronización con SQLite de cada consulta), la misma búsqueda resuelta solo con SQL
+como referencia, y la asignación en lote de un día completo.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import asignacion
+import config
+import migrations
+from bench.runner import percentile
+from solicitudes import PROVINCIAS
+
+CAPACIDADES = [4, 8, 15, 30, 45, 60]
+START = date(2026, 1, 1)
+
+_SQL_DISPONIBLES = '''
+    SELECT v.* FROM vehiculos v
+    WHERE v.provincia = ? AND v.capacidad >= ? AND v.activo = 1
+      AND NOT EXISTS (SELECT 1 FROM reservas r
+                      WHERE r.vehiculo_id = v.id AND r.inicio < ? AND r.fin > ?)
+    ORDER BY v.capacidad, v.id LIMIT ?
+'''
+
+
+def seed(path, vehicles, bookings, rng):
+    """Base nueva con `vehicles` vehículos y `bookings` reservas sin cruces por vehículo."""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    config.DATABASE = path
+    migrations.migrate(verbose=False)
+    conn = config.open_db_connection(path)
+    conn.execute('PRAGMA synchronous = OFF') # Solo para la siembra
+    conn.execute(
+        "INSERT INTO users (nombre, primer_apellido, telefono, email, usuario, password_hash) "
+        "VALUES ('Bench', 'Asignacion', '10000000', 'asignacion@bench.test', 'basignacion', '-')"
+    )
+    conn.executemany(
+        'INSERT INTO vehiculos (id, user_id, tipo_vehiculo, marca, capacidad, provincia) VALUES (?, 1, ?, ?, ?, ?)',
+        [(v, 'Buseta', 'Bench', rng.choice(CAPACIDADES), PROVINCIAS[v % len(PROVINCIAS)]) for v in range(1, vehicles + 1)]
+    )
+    # Cada vehículo recibe reservas consecutivas de 1 a 3 días con huecos aleatorios
+    rows, per_vehicle = [], bookings // vehicles
+    for v in range(1, vehicles + 1):
+        day = START + timedelta(days=rng.randint(0, 3))
+        for _ in range(per_vehicle):
+            length = rng.randint(1, 3)
+            inicio, fin = asignacion.rango_solicitud(f'{day} 07:00', str(day + timedelta(days=length - 1)))
+            rows.append((v, inicio, fin))
+            day += timedelta(days=length + rng.randint(0, 10))
+    conn.executemany('INSERT INTO reservas (vehiculo_id, inicio, fin) VALUES (?, ?, ?)', rows)
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    return len(rows), (day - START).days
+
+
+def summary(timings):
+    timings = sorted(timings)
+    return (f'p50 {percentile(timings, 50) * 1000:.3f}  p95 {percentile(timings, 95) * 1000:.3f}  '
+            f'p99 {percentile(timings, 99) * 1000:.3f}  media {statistics.fmean(timings) * 1000:.3f} ms')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.asignacion', description='Benchmark del motor de asignación.')
+    parser.add_argument('--bookings', type=int, default=50_000)
+    parser.add_argument('--vehicles', type=int, default=2_000)
+    parser.add_argument('--queries', type=int, default=2_000)
+    parser.add_argument('--batch', type=int, default=500, help='Solicitudes pendientes del día asignadas en lote.')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'transavi-bench', 'asignacion.db'))
+    parser.add_argument('--seed', type=int, default=1977)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    os.makedirs(os.path.dirname(args.db), exist_ok=True)
+    booked, days = seed(args.db, args.vehicles, args.bookings, rng)
+    print(f'{booked} reservas en {args.vehicles} vehículos ({days} días).')
+
+    conn = config.get_db_connection()
+    start = time.perf_counter()
+    with asignacion.index.lock:
+        asignacion.index.sync(conn)
+    print(f'Carga inicial del índice: {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    queries = []
+    for _ in range(args.queries):
+        day = START + timedelta(days=rng.randint(0, days))
+        last = day + timedelta(days=rng.choice([0, 0, 0, 1, 2]))
+        queries.append((rng.choice(PROVINCIAS), rng.choice([3, 10, 25, 40]), f'{day} 08:00', str(last)))
+
+    index_timings, sql_timings, mismatches = [], [], 0
+    for provincia, pasajeros, fecha_inicio, fecha_fin in queries:
+        t0 = time.perf_counter()
+        found = asignacion.vehiculos_disponibles(provincia, pasajeros, fecha_inicio, fecha_fin)
+        t1 = time.perf_counter()
+        inicio, fin = asignacion.rango_solicitud(fecha_inicio, fecha_fin)
+        expected = conn.execute(_SQL_DISPONIBLES, (provincia, pasajeros, fin, inicio, asignacion.DEFAULT_CANDIDATES)).fetchall()
+        t2 = time.perf_counter()
+        index_timings.append(t1 - t0)
+        sql_timings.append(t2 - t1)
+        mismatches += [v['id'] for v in found] != [row['id'] for row in expected]
+    print(f'Disponibles (índice):  {summary(index_timings)}')
+    print(f'Disponibles (solo SQL): {summary(sql_timings)}')
+    if mismatches:
+        print(f'ATENCIÓN: {mismatches} consultas con resultados distintos entre índice y SQL.')
+
+    fecha = str(START + timedelta(days=days // 2))
+    conn.executemany(
+        'INSERT INTO solicitudes (user_id, tipo_servicio, provincia_origen, provincia_destino, fecha_inicio, pasajeros) '
+        "VALUES (1, 'Turismo', ?, 'San José', ?, ?)",
+        [(rng.choice(PROVINCIAS), f'{fecha} {rng.randint(5, 18):02d}:00', rng.randint(1, 45)) for _ in range(args.batch)]
+    )
+    conn.commit()
+    start = time.perf_counter()
+    result = asignacion.asignar_pendientes(fecha)
+    elapsed = time.perf_counter() - start
+    asignadas = sum(1 for vehiculo_id in result.values() if vehiculo_id is not None)
+    print(f'Lote del {fecha}: {asignadas} de {len(result)} asignadas en {elapsed * 1000:.1f} ms')
+    config.close_db_connection()
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
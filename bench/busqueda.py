@@ -0,0 +1,126 @@
+# bench/busqueda.py
+"""Benchmark de la búsqueda de usuarios (busqueda.py) sobre una base grande.
+
+    python -m bench.busqueda --users 1000000 --queries 2000
+
+Siembra usuarios con nombres y apellidos variados (los triggers llenan users_fts igual
+que en producción) y simula el autocompletado: cada consulta es lo escrito hasta cierta
+tecla de un nombre, "nombre apellido", un usuario o un teléfono. Como referencia mide
+también unas pocas consultas con `LIKE '%texto%'`.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import busqueda
+import config
+import migrations
+from bench.runner import percentile
+
+NOMBRES = ['María', 'José', 'Ana', 'Luis', 'Carlos', 'Laura', 'Andrés', 'Sofía', 'Daniel', 'Valeria',
+           'Jorge', 'Gabriela', 'Fernando', 'Mariana', 'Ricardo', 'Paola', 'Esteban', 'Natalia', 'Álvaro',
+           'Karla', 'Mauricio', 'Adriana', 'Rodrigo', 'Melissa', 'Diego', 'Silvia', 'Pablo', 'Lucía',
+           'Sebastián', 'Tatiana', 'Óscar', 'Yesenia', 'Marco', 'Priscilla', 'Alejandro', 'Rebeca']
+APELLIDOS = ['Rodríguez', 'Jiménez', 'Mora', 'Rojas', 'Vargas', 'González', 'Hernández', 'Castro',
+             'Araya', 'Solano', 'Chaves', 'Ramírez', 'Alvarado', 'Sánchez', 'Quesada', 'Campos', 'Brenes',
+             'Calderón', 'Salazar', 'Villalobos', 'Fernández', 'Segura', 'Zúñiga', 'Madrigal', 'Cordero',
+             'Monge', 'Arias', 'Núñez', 'Ulate', 'Porras', 'Badilla', 'Umaña', 'Esquivel', 'Barquero']
+SEED_CHUNK = 20_000
+
+
+def seed(path, count, rng):
+    """Base nueva con `count` usuarios de nombres variados."""
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    config.DATABASE = path
+    migrations.migrate(verbose=False)
+    conn = config.open_db_connection(path)
+    conn.execute('PRAGMA synchronous = OFF') # Solo para la siembra
+    for offset in range(0, count, SEED_CHUNK):
+        rows = []
+        for i in range(offset, min(offset + SEED_CHUNK, count)):
+            nombre, apellido1, apellido2 = rng.choice(NOMBRES), rng.choice(APELLIDOS), rng.choice(APELLIDOS)
+            local = busqueda.normalize(f'{nombre}.{apellido1}')
+            rows.append((nombre, apellido1, apellido2, str(60_000_000 + i), f'{local}{i}@correo.test',
+                         f'{local.split(".")[0][:6]}{i}', '-'))
+        conn.executemany(
+            'INSERT INTO users (nombre, primer_apellido, segundo_apellido, telefono, email, usuario, password_hash) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+        )
+        conn.commit()
+    conn.execute("INSERT INTO users_fts (users_fts) VALUES ('optimize')")
+    conn.commit()
+    conn.close()
+
+
+def typeahead_queries(rng, count, users):
+    """Textos como quedan en el buscador tras cada tecla (desde 2 caracteres)."""
+    queries = []
+    while len(queries) < count:
+        kind = rng.random()
+        if kind < 0.5:
+            text = f'{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}'
+        elif kind < 0.7:
+            text = rng.choice(APELLIDOS)
+        elif kind < 0.85:
+            text = f'{busqueda.normalize(rng.choice(NOMBRES))[:6]}{rng.randrange(users)}'
+        else:
+            text = str(60_000_000 + rng.randrange(users))
+        cut = rng.randint(2, len(text))
+        queries.append(text[:cut])
+    return queries
+
+
+def summary(timings):
+    timings = sorted(timings)
+    return (f'p50 {percentile(timings, 50) * 1000:.2f}  p95 {percentile(timings, 95) * 1000:.2f}  '
+            f'p99 {percentile(timings, 99) * 1000:.2f}  media {statistics.fmean(timings) * 1000:.2f} ms')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.busqueda', description='Benchmark de la búsqueda de usuarios.')
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=2_000)
+    parser.add_argument('--like-queries', type=int, default=10, help='Consultas LIKE de referencia (0 para omitir).')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'transavi-bench', 'busqueda.db'))
+    parser.add_argument('--seed', type=int, default=1977)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    os.makedirs(os.path.dirname(args.db), exist_ok=True)
+    start = time.perf_counter()
+    seed(args.db, args.users, rng)
+    print(f'{args.users} usuarios sembrados e indexados en {time.perf_counter() - start:.1f} s.')
+
+    queries = typeahead_queries(rng, args.queries, args.users)
+    timings, truncated = [], 0
+    for query in queries:
+        t0 = time.perf_counter()
+        result = busqueda.search_users(query)
+        timings.append(time.perf_counter() - t0)
+        truncated += result['truncated']
+    print(f'Búsqueda (FTS5):      {summary(timings)}  ({truncated} con más de {busqueda.SEARCH_CANDIDATES} coincidencias)')
+
+    if args.like_queries:
+        conn = config.get_db_connection()
+        like_timings = []
+        for query in queries[:args.like_queries]:
+            pattern = f'%{query.split()[0]}%'
+            t0 = time.perf_counter()
+            conn.execute(
+                'SELECT COUNT(*) FROM users WHERE nombre LIKE ?1 OR primer_apellido LIKE ?1 OR segundo_apellido LIKE ?1 '
+                'OR email LIKE ?1 OR usuario LIKE ?1 OR telefono LIKE ?1', (pattern,)
+            ).fetchall()
+            like_timings.append(time.perf_counter() - t0)
+        print(f"Referencia LIKE '%%': {summary(like_timings)}")
+    config.close_db_connection()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
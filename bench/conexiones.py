@@ -0,0 +1,144 @@
+# bench/conexiones.py
+"""Benchmark de conexiones lentas: servidor WSGI multihilo contra el modo ASGI (asgi.py).
+
+    python -m bench.conexiones --slow-clients 1000 --duration 10
+
+Abre `--slow-clients` conexiones que envían el cuerpo de un POST de a un byte por segundo
+(como un móvil con mala señal) y, mientras tanto, mide la latencia de GET /index desde
+unos pocos clientes rápidos. Reporta hilos y memoria del proceso con las conexiones
+abiertas. `serve()` también lo usa bench.mensajes con --server.
+"""
+import argparse
+import logging
+import os
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import config
+from bench.runner import HTTPSession, percentile
+from bench.seed import seed_users
+
+SERVERS = ('asgi', 'wsgi')
+
+
+def rss_mb():
+    """Memoria residente del proceso (Linux); 0 si no se puede leer."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def serve(kind):
+    """Levanta la app en un hilo con el servidor `kind` ('wsgi' multihilo de Werkzeug o
+    'asgi' con uvicorn). Retorna (puerto, función para detenerlo)."""
+    from app import app, application
+    if kind == 'wsgi':
+        from werkzeug.serving import make_server
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        server.socket.listen(2048)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server.server_port, server.shutdown
+
+    import uvicorn # Dependencia opcional del modo ASGI
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    server = uvicorn.Server(uvicorn.Config(application, log_level='error', lifespan='off', date_header=False))
+    thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    def stop():
+        server.should_exit = True
+        thread.join(10)
+    return sock.getsockname()[1], stop
+
+
+def summary(timings):
+    timings = sorted(timings)
+    return (f'p50 {percentile(timings, 50) * 1000:.1f}  p95 {percentile(timings, 95) * 1000:.1f}  '
+            f'p99 {percentile(timings, 99) * 1000:.1f}  máx {timings[-1] * 1000:.1f} ms')
+
+
+def bench_server(kind, slow_clients, duration, fast_clients):
+    port, stop = serve(kind)
+    base_rss, base_threads = rss_mb(), threading.active_count()
+    body_length = 64
+    head = (f'POST /auth/login HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/x-www-form-urlencoded\r\n'
+            f'Content-Length: {body_length}\r\n\r\n').encode()
+    sockets = []
+    for i in range(slow_clients):
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.sendall(head)
+        sockets.append(sock)
+        if i % 100 == 99:
+            time.sleep(0.05) # No desbordar la cola de accept del servidor
+    time.sleep(1)
+
+    timings = []
+    stop_at = time.perf_counter() + duration
+
+    def fast_client():
+        session = HTTPSession(None, ('127.0.0.1', port))
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            session.get('/index')
+            timings.append(time.perf_counter() - start)
+
+    workers = [threading.Thread(target=fast_client) for _ in range(fast_clients)]
+    for worker in workers:
+        worker.start()
+    peak_threads, peak_rss, sent = 0, 0.0, 0
+    while time.perf_counter() < stop_at:
+        if sent < body_length - 1: # Nunca se completa: siguen lentos hasta el final
+            for sock in sockets:
+                sock.sendall(b'x')
+            sent += 1
+        peak_threads = max(peak_threads, threading.active_count())
+        peak_rss = max(peak_rss, rss_mb())
+        time.sleep(1)
+    for worker in workers:
+        worker.join()
+    for sock in sockets:
+        sock.close()
+    stop()
+    extra_threads = peak_threads - base_threads - fast_clients
+    print(f'{kind}: {slow_clients} clientes lentos; +{extra_threads} hilos, +{peak_rss - base_rss:.0f} MB de RSS; '
+          f'GET /index ({len(timings)} peticiones): {summary(timings) if timings else "sin respuestas"}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.conexiones', description='Benchmark de conexiones lentas.')
+    parser.add_argument('--slow-clients', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=10, help='Segundos de medición.')
+    parser.add_argument('--fast-clients', type=int, default=4, help='Clientes que piden /index sin pausa.')
+    parser.add_argument('--servers', nargs='+', choices=SERVERS, default=list(SERVERS))
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'transavi-bench', 'conexiones.db'))
+    args = parser.parse_args(argv)
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = args.slow_clients * 2 + 100 # Cliente y servidor están en el mismo proceso
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+    os.makedirs(os.path.dirname(args.db), exist_ok=True)
+    config.DATABASE = seed_users(args.db, 1)
+    from app import app # La app se importa ya apuntando a la base de benchmark
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app.config['LOGIN_THROTTLE_ENABLED'] = False
+    for kind in args.servers:
+        bench_server(kind, args.slow_clients, args.duration, args.fast_clients)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+# bench/mensajes.py
+"""Benchmark de los mensajes en tiempo real (mensajes.py): cuántos suscriptores SSE
+sostiene un proceso y con qué latencia les llega un mensaje.
+
+    python -m bench.mensajes --connections 1000 --messages 20
+    python -m bench.mensajes --connections 1000 --server asgi
+
+1. Solo el broker: N suscriptores en memoria, memoria por suscriptor y tiempo de
+   repartir un aviso general a todos.
+2. HTTP real: servidor WSGI multihilo (o el modo ASGI con --server asgi) con
+   `--connections` conexiones SSE abiertas (una sesión iniciada) que reciben `--messages` avisos generales; mide la latencia desde que
+   se publica hasta que llega a cada conexión, y la memoria del proceso.
+"""
+import argparse
+import logging
+import os
+import resource
+import selectors
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import config
+from bench.conexiones import SERVERS, rss_mb, serve
+from bench.runner import HTTPSession, login, percentile
+from bench.seed import seed_users
+
+
+def summary(timings):
+    timings = sorted(timings)
+    return (f'p50 {percentile(timings, 50) * 1000:.1f}  p95 {percentile(timings, 95) * 1000:.1f}  '
+            f'p99 {percentile(timings, 99) * 1000:.1f}  máx {timings[-1] * 1000:.1f} ms')
+
+
+def bench_broker(mensajes, subscribers):
+    broker = mensajes.Broker()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    subs = [broker.subscribe(mensajes.canales_de(i)) for i in range(subscribers)]
+    per_subscriber = (tracemalloc.get_traced_memory()[0] - before) / subscribers
+    tracemalloc.stop()
+    row = {'id': 1, 'canal': mensajes.CANAL_TODOS, 'autor': 'Bench', 'cuerpo': 'x' * 120, 'creado': '2026-01-01 00:00:00'}
+    start = time.perf_counter()
+    broker.deliver([row])
+    broadcast = time.perf_counter() - start
+    row = dict(row, canal=mensajes.canal_usuario(subscribers // 2))
+    start = time.perf_counter()
+    broker.deliver([row])
+    private = time.perf_counter() - start
+    assert sum(len(sub.queue) for sub in subs) == subscribers + 1
+    print(f'Broker: {subscribers} suscriptores, {per_subscriber:.0f} bytes c/u; aviso general a todos en '
+          f'{broadcast * 1000:.1f} ms, mensaje privado en {private * 1000:.3f} ms')
+
+
+def open_streams(port, cookie, count):
+    request = (f'GET /messages/stream HTTP/1.1\r\nHost: 127.0.0.1\r\nCookie: {cookie}\r\n'
+               'Accept: text/event-stream\r\n\r\n').encode()
+    sockets = []
+    for i in range(count):
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.sendall(request)
+        sock.setblocking(False)
+        sockets.append(sock)
+        if i % 100 == 99:
+            time.sleep(0.05) # No desbordar la cola de accept del servidor
+    return sockets
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.mensajes', description='Benchmark de mensajes SSE.')
+    parser.add_argument('--connections', type=int, default=1000, help='Conexiones SSE simultáneas (HTTP).')
+    parser.add_argument('--messages', type=int, default=20, help='Avisos generales publicados.')
+    parser.add_argument('--broker-subscribers', type=int, default=10_000)
+    parser.add_argument('--server', choices=SERVERS, default='wsgi')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'transavi-bench', 'mensajes.db'))
+    args = parser.parse_args(argv)
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = args.connections * 2 + 100 # Cliente y servidor están en el mismo proceso
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(wanted, hard), hard))
+
+    os.makedirs(os.path.dirname(args.db), exist_ok=True)
+    config.DATABASE = seed_users(args.db, 1)
+    from app import app # La app se importa ya apuntando a la base de benchmark
+    import mensajes
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app.config['LOGIN_THROTTLE_ENABLED'] = False
+
+    bench_broker(mensajes, args.broker_subscribers)
+
+    port, stop = serve(args.server)
+    session = HTTPSession(app, ('127.0.0.1', port))
+    login(session, 0)
+    cookie = '; '.join(f'{k}={v}' for k, v in session.cookies.items())
+
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    sockets = open_streams(port, cookie, args.connections)
+    while mensajes.broker.stats()['subscribers'] < args.connections:
+        if time.perf_counter() - start > 120:
+            print(f"Solo {mensajes.broker.stats()['subscribers']} conexiones suscritas tras 120 s.")
+            break
+        time.sleep(0.05)
+    subscribed = mensajes.broker.stats()['subscribers']
+    print(f'HTTP ({args.server}): {subscribed} conexiones SSE abiertas en {time.perf_counter() - start:.1f} s; '
+          f'{threading.active_count()} hilos, +{rss_mb() - base_rss:.0f} MB de RSS '
+          f'({(rss_mb() - base_rss) * 1024 / max(1, subscribed):.0f} KB por conexión)')
+
+    selector = selectors.DefaultSelector()
+    for sock in sockets:
+        selector.register(sock, selectors.EVENT_READ, bytearray())
+
+    def drain(until, marker=None, pending=None):
+        """Lee de todos los sockets hasta `until`; anota cuándo aparece `marker` en cada uno."""
+        while time.perf_counter() < until and (pending is None or pending):
+            for key, _ in selector.select(timeout=0.05):
+                try:
+                    data = key.fileobj.recv(65536)
+                except BlockingIOError:
+                    continue
+                key.data.extend(data)
+                if marker and key.fileobj in pending and marker in key.data:
+                    pending.pop(key.fileobj)
+                    arrivals.append(time.perf_counter() - published)
+                    key.data.clear()
+
+    arrivals = []
+    published = time.perf_counter()
+    drain(time.perf_counter() + 1) # Cabeceras y `retry:` iniciales
+    with app.app_context():
+        for k in range(args.messages):
+            pending = {sock: True for sock in sockets}
+            published = time.perf_counter()
+            message_id = mensajes.publicar(None, mensajes.CANAL_TODOS, f'Aviso de prueba {k}')
+            drain(time.perf_counter() + 10, f'id: {message_id}\n'.encode(), pending)
+            if pending:
+                print(f'  aviso {k}: {len(pending)} conexiones no lo recibieron en 10 s')
+    if arrivals:
+        print(f'Latencia de entrega ({len(arrivals)} entregas): {summary(arrivals)}')
+    print(f"Cortadas por lentas: {mensajes.broker.stats()['dropped']}")
+
+    for sock in sockets:
+        sock.close()
+    stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
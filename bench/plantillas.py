@@ -0,0 +1,117 @@
+# bench/plantillas.py
+"""Benchmark de plantillas (plantillas.py): primer request de un worker nuevo y costo de
+cada render con y sin fragmentos en caché.
+
+    python -m bench.plantillas --renders 2000
+
+1. Arranque en frío: en un proceso nuevo se mide el import de la app y el primer GET
+   de cada página, en tres casos: sin bytecode ni precarga (Jinja compila en el primer
+   request), con bytecode en disco pero sin precarga, y con ambos (lo normal tras
+   `flask build-templates`).
+2. Render en caliente: CPU por petición de las páginas con layout completo, con los
+   fragmentos {% cache %} activos y desactivados.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import config
+from bench.runner import ClientSession, login, percentile
+from bench.seed import seed_users
+
+PAGES = ['/auth/login', '/auth/register', '/profile', '/solicitudes', '/messages']
+
+# Se ejecuta en un proceso nuevo: argv = base, carpeta de bytecode, precarga (0/1)
+COLD_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import config, plantillas
+config.DATABASE = sys.argv[1]
+plantillas.TEMPLATE_CACHE_DIR = sys.argv[2]
+if sys.argv[3] == '0':
+    plantillas.warm = lambda app: 0
+from app import app
+imported = time.perf_counter() - start
+from bench.runner import ClientSession, login
+session = ClientSession(app)
+app.config['LOGIN_THROTTLE_ENABLED'] = False
+login(session, 0)
+firsts = {}
+for page in json.loads(sys.argv[4]):
+    t0 = time.perf_counter()
+    session.get(page)
+    firsts[page] = time.perf_counter() - t0
+print(json.dumps({'import': imported, 'firsts': firsts}))
+'''
+
+
+def cold_start(db, bytecode_dir, warmup):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, '-c', COLD_SCRIPT, db, bytecode_dir, '1' if warmup else '0', json.dumps(PAGES)],
+        cwd=root, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_cold(db):
+    bytecode_dir = tempfile.mkdtemp(prefix='transavi-jinja-')
+    cases = [
+        ('sin bytecode ni precarga', False, True),
+        ('bytecode, sin precarga', False, False),
+        ('bytecode y precarga', True, False),
+    ]
+    for label, warmup, wipe in cases:
+        if wipe:
+            for name in os.listdir(bytecode_dir):
+                os.remove(os.path.join(bytecode_dir, name))
+        else:
+            cold_start(db, bytecode_dir, True) # Deja el bytecode escrito, como `flask build-templates`
+        result = cold_start(db, bytecode_dir, warmup)
+        firsts = '  '.join(f'{page} {elapsed * 1000:.1f}' for page, elapsed in result['firsts'].items())
+        print(f"Frío, {label:<25} import {result['import'] * 1000:.0f} ms; primer GET (ms): {firsts}")
+
+
+def bench_warm(app, renders):
+    import plantillas
+    session = ClientSession(app)
+    login(session, 0)
+    for enabled in (False, True):
+        app.config['FRAGMENT_CACHE_ENABLED'] = enabled
+        plantillas.clear()
+        row = []
+        for page in PAGES:
+            session.get(page) # Llena la caché de fragmentos
+            timings = []
+            for _ in range(renders):
+                t0 = time.process_time()
+                session.get(page)
+                timings.append(time.process_time() - t0)
+            timings.sort()
+            row.append(f'{page} {percentile(timings, 50) * 1e6:.0f}')
+        label = 'con fragmentos' if enabled else 'sin fragmentos'
+        print(f"Caliente, {label}: CPU por petición p50 (µs): {'  '.join(row)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench.plantillas', description='Benchmark de plantillas.')
+    parser.add_argument('--renders', type=int, default=2000, help='Peticiones por página en caliente.')
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'transavi-bench', 'plantillas.db'))
+    args = parser.parse_args(argv)
+
+    os.makedirs(os.path.dirname(args.db), exist_ok=True)
+    config.DATABASE = seed_users(args.db, 1)
+    bench_cold(args.db)
+
+    from app import app # La app se importa ya apuntando a la base de benchmark
+    app.config['LOGIN_THROTTLE_ENABLED'] = False
+    bench_warm(app, args.renders)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
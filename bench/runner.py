@@ -0,0 +1,234 @@
+# bench/runner.py
+import http.client
+import json
+import random
+import statistics
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+import config
+import metrics
+from bench.seed import BENCH_PASSWORD, bench_user
+
+TEMP_PASSWORD = 'cambio5678'
+
+
+# =======================================================
+# SESIONES DE CLIENTE (test client de Flask / HTTP real)
+# =======================================================
+
+class ClientSession:
+    """Envuelve el test client de Flask (sin red, mide solo la app)."""
+
+    def __init__(self, app, base_url=None):
+        self.client = app.test_client()
+
+    def get(self, path):
+        return self.client.get(path).status_code
+
+    def post(self, path, data):
+        return self.client.post(path, data=data).status_code
+
+
+class HTTPSession:
+    """Cliente HTTP mínimo con cookies contra el servidor WSGI real."""
+
+    def __init__(self, app, base_url):
+        self.host, self.port = base_url
+        self.cookies = {}
+
+    def _request(self, method, path, body=None):
+        headers = {}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        if body is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            for header in response.headers.get_all('Set-Cookie') or ():
+                for name, morsel in SimpleCookie(header).items():
+                    if morsel['expires'] and morsel.value == '':
+                        self.cookies.pop(name, None)
+                    else:
+                        self.cookies[name] = morsel.value
+            return response.status
+        finally:
+            conn.close()
+
+    def get(self, path):
+        return self._request('GET', path)
+
+    def post(self, path, data):
+        return self._request('POST', path, urlencode(data))
+
+
+# =======================================================
+# ESCENARIOS
+# =======================================================
+
+def login(session, i, password=BENCH_PASSWORD):
+    return session.post('/auth/login', {'identifier': bench_user(i)['usuario'], 'password': password})
+
+
+class Scenario:
+    """Un flujo a medir: `prepare` no se cronometra, `action` sí (puede medir varias peticiones)."""
+
+    def __init__(self, name, endpoint, action, expected, prepare=None, per_iteration=None):
+        self.name = name
+        self.endpoint = endpoint
+        self.action = action
+        self.expected = expected
+        self.prepare = prepare
+        self.per_iteration = per_iteration
+
+
+def _register(session, i, worker, k):
+    n = 1_000_000 * (worker + 1) + k
+    return session.post('/auth/register', {
+        'nombre': 'Bench', 'apellido1': 'Registro', 'apellido2': '',
+        'telefono': str(90_000_000 + n % 10_000_000), 'email': f'reg{n}@bench.test', 'usuario': f'r{n}',
+        'password': BENCH_PASSWORD, 'password_confirm': BENCH_PASSWORD,
+    })
+
+
+def _update_profile(session, i, worker, k):
+    user = bench_user(i)
+    return session.post('/update_profile_info', {
+        'segundo_apellido': 'Mora' if k % 2 else 'Soto',
+        'usuario': user['usuario'], 'email': user['email'], 'telefono': user['telefono'],
+    })
+
+
+def _change_password(session, i, worker, k, timings):
+    # Ida y vuelta para dejar la contraseña sembrada intacta: dos muestras por iteración
+    statuses = []
+    for current, new in ((BENCH_PASSWORD, TEMP_PASSWORD), (TEMP_PASSWORD, BENCH_PASSWORD)):
+        login(session, i, current)
+        start = time.perf_counter()
+        statuses.append(session.post('/change_password', {
+            'current_password': current, 'new_password': new, 'new_password_confirm': new,
+        }))
+        timings.append(time.perf_counter() - start)
+    return statuses
+
+
+SCENARIOS = {
+    'login': Scenario('login', 'auth.login', lambda s, i, w, k: login(s, i), 302),
+    'register': Scenario('register', 'auth.register', _register, 302),
+    'profile': Scenario('profile', 'main.profile', lambda s, i, w, k: s.get('/profile'), 200,
+                        prepare=lambda s, i: login(s, i)),
+    'update_profile_info': Scenario('update_profile_info', 'main.update_profile_info', _update_profile, 302,
+                                    prepare=lambda s, i: login(s, i)),
+    'change_password': Scenario('change_password', 'main.change_password', None, 302,
+                                per_iteration=_change_password),
+}
+
+
+# =======================================================
+# EJECUCIÓN Y ESTADÍSTICAS
+# =======================================================
+
+def percentile(sorted_values, pct):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def run_scenario(app, scenario, session_class, user_count, requests, threads, base_url=None, seed=1977):
+    """Corre `requests` iteraciones repartidas en `threads` hilos y retorna el resumen."""
+    per_thread = max(1, requests // threads)
+    timings, errors = [], []
+    lock = threading.Lock()
+    # El reloj arranca cuando todos los hilos terminaron su `prepare` (p. ej. el login)
+    ready = threading.Barrier(threads + 1)
+    before = metrics.snapshot()
+
+    def worker(worker_index):
+        rng = random.Random(seed + worker_index)
+        # Cada hilo usa solo "sus" usuarios para no pisarse (p. ej. al cambiar contraseñas)
+        users = range(worker_index, user_count, threads)
+        session = session_class(app, base_url)
+        fixed_user = rng.choice(users)
+        if scenario.prepare:
+            scenario.prepare(session, fixed_user)
+        ready.wait()
+        local_timings, local_errors = [], 0
+        for k in range(per_thread):
+            i = fixed_user if scenario.prepare else rng.choice(users)
+            if scenario.per_iteration:
+                statuses = scenario.per_iteration(session, i, worker_index, k, local_timings)
+            else:
+                start = time.perf_counter()
+                statuses = [scenario.action(session, i, worker_index, k)]
+                local_timings.append(time.perf_counter() - start)
+            local_errors += sum(1 for status in statuses if status != scenario.expected)
+        with lock:
+            timings.extend(local_timings)
+            errors.append(local_errors)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for thread in workers:
+        thread.start()
+    ready.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    after = metrics.snapshot()
+    count, total = after.get(('queries', scenario.endpoint), (0, 0))
+    count_before, total_before = before.get(('queries', scenario.endpoint), (0, 0))
+    timings.sort()
+    return {
+        'requests': len(timings),
+        'errors': sum(errors),
+        'throughput_rps': round(len(timings) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3) if timings else 0.0,
+        'queries_per_request': round((total - total_before) / (count - count_before), 2) if count > count_before else 0.0,
+    }
+
+
+def cleanup(database):
+    """Deshace lo que los escenarios agregan, para poder reutilizar la base sembrada."""
+    conn = config.open_db_connection(database)
+    conn.execute("DELETE FROM users WHERE email LIKE 'reg%@bench.test'")
+    conn.commit()
+    conn.close()
+    config.user_cache.clear()
+
+
+# =======================================================
+# LÍNEAS BASE
+# =======================================================
+
+def save_baseline(report, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def compare(report, baseline, tolerance=0.20):
+    """Retorna la lista de regresiones (p95 más lento o throughput menor que la tolerancia)."""
+    regressions = []
+    for users, modes in report['results'].items():
+        for mode, scenarios in modes.items():
+            for name, result in scenarios.items():
+                base = baseline.get('results', {}).get(users, {}).get(mode, {}).get(name)
+                if not base:
+                    continue
+                if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+                    regressions.append(f'{users}/{mode}/{name}: p95 {base["p95_ms"]} -> {result["p95_ms"]} ms')
+                if result['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+                    regressions.append(f'{users}/{mode}/{name}: throughput {base["throughput_rps"]} -> {result["throughput_rps"]} rps')
+                if result['errors'] > base['errors']:
+                    regressions.append(f'{users}/{mode}/{name}: errores {base["errors"]} -> {result["errors"]}')
+    return regressions
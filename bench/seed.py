@@ -0,0 +1,69 @@
+# bench/seed.py
+import os
+import sqlite3
+import time
+
+from werkzeug.security import generate_password_hash
+
+import config
+import migrations
+
+BENCH_PASSWORD = 'bench1234'
+SEED_CHUNK = 10_000
+
+
+def bench_user(i):
+    """Datos del usuario sintético número i (respeta los UNIQUE de telefono/email/usuario)."""
+    return {
+        'nombre': 'Bench',
+        'primer_apellido': 'Usuario',
+        'segundo_apellido': '',
+        'telefono': str(10_000_000 + i), # 8 dígitos hasta i = 89.999.999
+        'email': f'bench{i}@bench.test',
+        'usuario': f'b{i:07d}', # 5-10 caracteres alfanuméricos, como exigen registro y perfil
+    }
+
+
+def seed_users(path, count, password=BENCH_PASSWORD):
+    """Crea (o reutiliza) una base con `count` usuarios sintéticos y retorna su ruta.
+
+    Todos comparten el mismo hash: calcular un millón de scrypt tomaría horas y no
+    cambia nada de lo que se mide.
+    """
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        existing = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+        conn.close()
+        if existing == count:
+            return path
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    previous, config.DATABASE = config.DATABASE, path
+    try:
+        migrations.migrate(verbose=False)
+    finally:
+        config.DATABASE = previous
+
+    password_hash = generate_password_hash(password)
+    conn = config.open_db_connection(path)
+    conn.execute('PRAGMA synchronous = OFF') # Solo para la siembra
+    start = time.perf_counter()
+    for offset in range(0, count, SEED_CHUNK):
+        rows = []
+        for i in range(offset, min(offset + SEED_CHUNK, count)):
+            user = bench_user(i)
+            rows.append((
+                user['nombre'], user['primer_apellido'], user['segundo_apellido'],
+                user['telefono'], user['email'], user['usuario'], password_hash,
+            ))
+        conn.executemany(
+            'INSERT INTO users (nombre, primer_apellido, segundo_apellido, telefono, email, usuario, password_hash) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            rows
+        )
+        conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+    print(f'Sembrados {count} usuarios en {path} ({time.perf_counter() - start:.1f} s).')
+    return path
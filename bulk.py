@@ -0,0 +1,294 @@
+# bulk.py
+"""Importación y exportación masiva de usuarios (CSV o JSONL).
+
+    flask --app app users import clientes.csv --report rechazados.csv
+    flask --app app users export usuarios.jsonl
+    flask --app app users export - --with-hashes > respaldo.csv
+
+La importación lee el archivo en streaming y trabaja por bloques: valida cada fila,
+descarta los duplicados (contra la base y dentro del mismo archivo) con una consulta
+por bloque, calcula los hashes en paralelo en un pool de procesos y guarda el bloque
+con un solo executemany dentro de una transacción. Una fila mala se reporta con su
+número de línea y el motivo; nunca aborta el resto.
+
+La exportación recorre la tabla con fetchmany y escribe a medida que lee: la memoria
+usada no depende de la cantidad de usuarios.
+"""
+import csv
+import io
+import json
+import os
+import re
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+import click
+from werkzeug.security import generate_password_hash
+
+import config
+import hashing
+
+IMPORT_CHUNK = 1000
+EXPORT_BATCH = 1000
+
+FIELDS = ['nombre', 'primer_apellido', 'segundo_apellido', 'telefono', 'email', 'usuario']
+# Nombres alternativos de columnas (los del formulario de registro)
+ALIASES = {'apellido1': 'primer_apellido', 'apellido2': 'segundo_apellido'}
+# Columnas únicas -> motivo que se reporta si ya existen
+UNIQUE_FIELDS = {'email': 'email duplicado', 'usuario': 'usuario duplicado', 'telefono': 'teléfono duplicado'}
+
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+
+def detect_format(filename, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+# =======================================================
+# IMPORTACIÓN
+# =======================================================
+
+def read_rows(stream, fmt):
+    """Genera (número de línea, dict) sin cargar el archivo completo."""
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+
+
+def validate_row(row):
+    """Normaliza una fila. Retorna (usuario, None) o (None, motivo del rechazo)."""
+    if row is None:
+        return None, 'fila ilegible'
+    row = {ALIASES.get(key.strip(), key.strip()): value for key, value in row.items() if key}
+    user = {field: str(row.get(field) or '').strip() for field in FIELDS}
+    if not user['nombre'] or not user['primer_apellido']:
+        return None, 'falta nombre o primer apellido'
+    if not re.fullmatch(r'\d{8}', user['telefono']):
+        return None, 'el teléfono debe tener 8 dígitos'
+    if not _EMAIL_RE.match(user['email']):
+        return None, 'email inválido'
+    if not re.fullmatch(r'[a-zA-Z0-9]{5,15}', user['usuario']):
+        return None, 'el usuario debe ser alfanumérico de 5 a 15 caracteres'
+    # Se acepta la contraseña en claro o un hash ya calculado (p. ej. de `users export --with-hashes`)
+    if row.get('password_hash'):
+        user['password_hash'] = str(row['password_hash']).strip()
+    elif row.get('password'):
+        password = str(row['password']) # Sin strip: los espacios son parte de la contraseña
+        if len(password) < 8:
+            return None, 'la contraseña debe tener al menos 8 caracteres'
+        user['password'] = password
+    else:
+        return None, 'falta la contraseña'
+    return user, None
+
+
+def _existing_values(conn, users):
+    """Valores de email/usuario/telefono del bloque que ya están en la base (una consulta).
+
+    Email y usuario se comparan sin distinguir mayúsculas, igual que el login (índices
+    NOCASE): un "Ana@x.com" importado junto a un "ana@x.com" existente dejaría el login
+    ambiguo. El teléfono son solo dígitos y usa su índice UNIQUE normal. Los valores se
+    retornan en minúsculas.
+    """
+    params, clauses = [], []
+    for field in UNIQUE_FIELDS:
+        values = [user[field] for user in users]
+        collate = '' if field == 'telefono' else ' COLLATE NOCASE'
+        clauses.append(f"{field}{collate} IN ({', '.join('?' * len(values))})")
+        params.extend(values)
+    found = {field: set() for field in UNIQUE_FIELDS}
+    for row in conn.execute(f"SELECT email, usuario, telefono FROM users WHERE {' OR '.join(clauses)}", params):
+        for field in UNIQUE_FIELDS:
+            found[field].add(row[field].lower())
+    return found
+
+
+def _insert_chunk(conn, users):
+    """Inserta el bloque en una transacción. Retorna la lista de (usuario, motivo) rechazados.
+
+    Los duplicados ya se filtraron antes; si aun así choca un UNIQUE (alguien se
+    registró entretanto) se reintenta fila por fila para reportar solo la culpable.
+    """
+    rows = [tuple(user[field] for field in FIELDS) + (user['password_hash'],) for user in users]
+    sql = ('INSERT INTO users (nombre, primer_apellido, segundo_apellido, telefono, email, usuario, password_hash) '
+           'VALUES (?, ?, ?, ?, ?, ?, ?)')
+    try:
+        conn.executemany(sql, rows)
+        conn.commit()
+        return []
+    except sqlite3.IntegrityError:
+        conn.rollback()
+    rejected = []
+    for user, row in zip(users, rows):
+        try:
+            conn.execute(sql, row)
+        except sqlite3.IntegrityError as e:
+            rejected.append((user, f'duplicado ({e})'))
+    conn.commit()
+    return rejected
+
+
+def import_users(stream, fmt='csv', chunk_size=IMPORT_CHUNK, workers=None, on_reject=None):
+    """Importa usuarios desde `stream`. Retorna (importados, rechazados).
+
+    `on_reject(línea, fila, motivo)` se llama por cada fila descartada.
+    """
+    on_reject = on_reject or (lambda line, row, reason: None)
+    conn = config.open_db_connection()
+    # Mismo método que usa la app para los hashes nuevos; cada proceso lo calcula por su cuenta
+    hash_fn = partial(generate_password_hash, method=hashing.current_method())
+    seen = {field: set() for field in UNIQUE_FIELDS}
+    imported = rejected = 0
+    rows = read_rows(stream, fmt)
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                valid = []
+                for line_number, row in chunk:
+                    user, reason = validate_row(row)
+                    if reason:
+                        on_reject(line_number, row, reason)
+                        rejected += 1
+                    else:
+                        valid.append((line_number, row, user))
+                if not valid:
+                    continue
+
+                existing = _existing_values(conn, [user for _, _, user in valid])
+                accepted = []
+                for line_number, row, user in valid:
+                    reason = next((message for field, message in UNIQUE_FIELDS.items()
+                                   if user[field].lower() in existing[field] or user[field].lower() in seen[field]), None)
+                    if reason:
+                        on_reject(line_number, row, reason)
+                        rejected += 1
+                        continue
+                    for field in UNIQUE_FIELDS:
+                        seen[field].add(user[field].lower())
+                    accepted.append((line_number, row, user))
+
+                # Solo se hashean las filas que de verdad se van a insertar
+                pending = [user for _, _, user in accepted if 'password_hash' not in user]
+                for user, password_hash in zip(pending, pool.map(hash_fn, [user.pop('password') for user in pending], chunksize=16)):
+                    user['password_hash'] = password_hash
+
+                failed = {id(user): reason for user, reason in _insert_chunk(conn, [user for _, _, user in accepted])}
+                for line_number, row, user in accepted:
+                    if id(user) in failed:
+                        on_reject(line_number, row, failed[id(user)])
+                        rejected += 1
+                    else:
+                        imported += 1
+    finally:
+        conn.close()
+        # Valores que la caché de disponibilidad de este proceso creía libres
+        config.availability_cache.clear()
+    return imported, rejected
+
+
+# =======================================================
+# EXPORTACIÓN
+# =======================================================
+
+def iter_users(with_hashes=False, batch=EXPORT_BATCH):
+    """Genera los usuarios como dicts, leyendo de a `batch` filas."""
+    columns = ['id'] + FIELDS + (['password_hash'] if with_hashes else [])
+    conn = config.open_db_connection()
+    try:
+        cursor = conn.execute(f"SELECT {', '.join(columns)} FROM users ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+    finally:
+        conn.close()
+
+
+def iter_export(fmt='csv', with_hashes=False):
+    """Genera el archivo de exportación como trozos de texto (para un archivo o una respuesta HTTP)."""
+    columns = ['id'] + FIELDS + (['password_hash'] if with_hashes else [])
+    if fmt == 'jsonl':
+        for user in iter_users(with_hashes):
+            yield json.dumps(user, ensure_ascii=False) + '\n'
+        return
+
+    # El writer escribe en un buffer que se vacía después de cada fila
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+
+    def flush():
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    writer.writeheader()
+    yield flush()
+    for user in iter_users(with_hashes):
+        writer.writerow(user)
+        yield flush()
+
+
+# =======================================================
+# COMANDOS
+# =======================================================
+
+def init_app(app):
+    """Registra `flask users import` y `flask users export`."""
+    users_cli = click.Group('users', help='Importación y exportación masiva de usuarios.')
+
+    @users_cli.command('import')
+    @click.argument('source', type=click.File('r', encoding='utf-8-sig'))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Por defecto según la extensión.')
+    @click.option('--chunk', default=IMPORT_CHUNK, show_default=True, help='Filas por transacción.')
+    @click.option('--workers', type=int, help='Procesos para el hashing (por defecto, uno por CPU).')
+    @click.option('--report', type=click.File('w', encoding='utf-8'), help='CSV con las filas rechazadas y el motivo.')
+    def import_command(source, fmt, chunk, workers, report):
+        """Importa usuarios desde un CSV o JSONL ('-' para la entrada estándar)."""
+        writer = None
+        if report:
+            writer = csv.writer(report)
+            writer.writerow(['linea', 'email', 'usuario', 'telefono', 'motivo'])
+
+        def on_reject(line_number, row, reason):
+            row = row or {}
+            if writer:
+                writer.writerow([line_number, row.get('email', ''), row.get('usuario', ''), row.get('telefono', ''), reason])
+            else:
+                click.echo(f'  línea {line_number}: {reason}', err=True)
+
+        imported, rejected = import_users(source, detect_format(source.name, fmt), chunk, workers, on_reject)
+        click.echo(f'{imported} usuarios importados, {rejected} filas rechazadas.')
+
+    @users_cli.command('export')
+    @click.argument('target', type=click.File('w', encoding='utf-8', lazy=True))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Por defecto según la extensión.')
+    @click.option('--with-hashes', is_flag=True, help='Incluye password_hash (para volver a importar sin resetear contraseñas).')
+    def export_command(target, fmt, with_hashes):
+        """Exporta todos los usuarios a un CSV o JSONL ('-' para la salida estándar)."""
+        count = -1 if detect_format(target.name, fmt) == 'csv' else 0 # La cabecera no cuenta
+        for text in iter_export(detect_format(target.name, fmt), with_hashes):
+            target.write(text)
+            count += 1
+        click.echo(f'{count} usuarios exportados.', err=True)
+
+    app.cli.add_command(users_cli)
@@ -0,0 +1,198 @@
+# busqueda.py
+"""Búsqueda de usuarios para la pantalla de administración.
+
+Un `LIKE '%texto%'` sobre `users` recorre la tabla entera en cada tecla. Aquí se usa el
+índice FTS5 `users_fts` (migración 6), que los triggers mantienen al día con cada
+registro o edición de perfil, con índices de prefijo de 2 a 8 caracteres: "mar rod"
+encuentra a "María Rodríguez" (sin distinguir mayúsculas ni tildes) sin recorrer nada.
+
+El orden lo decide Python sobre un máximo de SEARCH_CANDIDATES coincidencias: el
+`ORDER BY rank` de FTS5 tiene que puntuar TODAS las filas que coinciden, y con un
+prefijo corto sobre un millón de usuarios eso son cientos de milisegundos. Si la
+búsqueda tiene más coincidencias que el tope se avisa con `truncated` (hay que escribir
+más), como hace cualquier autocompletado. Los candidatos de FTS5 salen en orden de
+rowid, no de relevancia: por eso antes se buscan por sus índices los usuarios cuyo
+usuario, email o teléfono es exactamente lo buscado, que siempre entran y van primero.
+
+    flask --app app admin grant USUARIO      (o revoke)
+    flask --app app admin search "maria rod"
+    flask --app app admin reindex            (reconstruye users_fts)
+"""
+import re
+import sqlite3
+import time
+import unicodedata
+from functools import lru_cache
+
+import click
+
+import config
+from migrations import USERS_FTS_COLUMNS, users_fts_values
+
+SEARCH_CANDIDATES = 200 # Coincidencias que se ordenan como máximo
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+MIN_TOKEN_LENGTH = 2 # Los índices de prefijo empiezan en 2 caracteres
+TOKEN_CACHE_SIZE = 8192
+
+# Peso de cada campo al ordenar: un usuario, email o teléfono que coincide pesa más que
+# un nombre (hay miles de "María"). Una palabra completa vale el doble que un prefijo.
+FIELD_WEIGHTS = {
+    'usuario': 6,
+    'email': 5,
+    'telefono': 5,
+    'primer_apellido': 3,
+    'segundo_apellido': 2,
+    'nombre': 2,
+}
+
+RESULT_COLUMNS = ['id', 'nombre', 'primer_apellido', 'segundo_apellido', 'email', 'usuario', 'telefono', 'es_admin']
+
+_TOKEN_RE = re.compile(r'[^\W_]+') # Mismos separadores que el tokenizador unicode61
+
+
+def normalize(text):
+    """Minúsculas y sin tildes, igual que `remove_diacritics` del índice."""
+    text = (text or '').lower()
+    if text.isascii():
+        return text # Usuarios, emails y teléfonos casi siempre
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def tokenize(text):
+    # Los nombres y apellidos se repiten muchísimo entre los candidatos: se recuerdan
+    return tuple(_TOKEN_RE.findall(normalize(text)))
+
+
+def build_match(tokens):
+    """Consulta MATCH de FTS5: cada palabra como prefijo y todas obligatorias."""
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def score(user, tokens):
+    """Puntaje de un candidato: por cada palabra buscada, el mejor campo en que aparece."""
+    fields = {field: tokenize(user[field].split('@')[0] if field == 'email' else user[field])
+              for field in FIELD_WEIGHTS}
+    total = 0
+    for token in tokens:
+        best = 0
+        for field, words in fields.items():
+            for word in words:
+                if word == token:
+                    best = max(best, FIELD_WEIGHTS[field] * 2)
+                elif word.startswith(token):
+                    best = max(best, FIELD_WEIGHTS[field])
+        total += best
+    return total
+
+
+def find_exact(conn, query):
+    """Usuarios cuyo usuario, email o teléfono es exactamente la búsqueda (por los índices
+    únicos, NOCASE para usuario y email)."""
+    return conn.execute(
+        f'''
+        SELECT {', '.join(RESULT_COLUMNS)} FROM users
+        WHERE usuario = ? COLLATE NOCASE OR email = ? COLLATE NOCASE OR telefono = ?
+        ''',
+        (query,) * 3
+    ).fetchall()
+
+
+def search_users(query, page=1, per_page=SEARCH_PAGE_SIZE, candidates=SEARCH_CANDIDATES):
+    """Busca usuarios por nombre, apellidos, email, usuario o teléfono.
+
+    Retorna {'items', 'page', 'per_page', 'total', 'truncated'}; `total` es exacto
+    salvo que `truncated` sea True (hubo más de `candidates` coincidencias).
+    """
+    page = max(1, page)
+    per_page = max(1, min(per_page, SEARCH_MAX_PAGE_SIZE))
+    result = {'items': [], 'page': page, 'per_page': per_page, 'total': 0, 'truncated': False}
+    tokens = [token for token in tokenize(query) if len(token) >= MIN_TOKEN_LENGTH]
+    if not tokens:
+        return result
+
+    conn = config.get_db_connection()
+    try:
+        exact = find_exact(conn, query.strip())
+        rows = conn.execute(
+            f'''
+            SELECT {', '.join(RESULT_COLUMNS)} FROM users
+            WHERE id IN (SELECT rowid FROM users_fts WHERE users_fts MATCH ? LIMIT ?)
+            ''',
+            (build_match(tokens), candidates + 1) # Una de más para saber si hay otras
+        ).fetchall()
+    except sqlite3.Error as e:
+        print(f"Error al buscar usuarios '{query}': {e}")
+        return result
+
+    truncated = len(rows) > candidates
+    exact_ids = {row['id'] for row in exact}
+    users = [dict(row) for row in exact] + [dict(row) for row in rows[:candidates] if row['id'] not in exact_ids]
+    users.sort(key=lambda user: (user['id'] not in exact_ids, -score(user, tokens), user['id']))
+    start = (page - 1) * per_page
+    result.update(items=users[start:start + per_page], total=len(users), truncated=truncated)
+    return result
+
+
+def rebuild_index():
+    """Vacía y vuelve a llenar users_fts desde `users`. Retorna la cantidad indexada."""
+    conn = config.open_db_connection()
+    try:
+        with conn:
+            conn.execute("INSERT INTO users_fts (users_fts) VALUES ('delete-all')")
+            count = conn.execute(
+                f'INSERT INTO users_fts (rowid, {USERS_FTS_COLUMNS}) SELECT id, {users_fts_values("users.")} FROM users'
+            ).rowcount
+        conn.execute("INSERT INTO users_fts (users_fts) VALUES ('optimize')")
+        conn.commit()
+        return count
+    finally:
+        conn.close()
+
+
+# =======================================================
+# COMANDOS
+# =======================================================
+
+def init_app(app):
+    """Registra `flask admin grant|revoke|search|reindex`."""
+    admin_cli = click.Group('admin', help='Administradores y búsqueda de usuarios.')
+
+    @admin_cli.command('grant')
+    @click.argument('usuario')
+    def grant_command(usuario):
+        """Da permisos de administrador al usuario."""
+        if config.set_admin(usuario, True) is not True:
+            raise click.ClickException(f"No existe el usuario '{usuario}'.")
+        click.echo(f'{usuario} ahora es administrador.')
+
+    @admin_cli.command('revoke')
+    @click.argument('usuario')
+    def revoke_command(usuario):
+        """Quita los permisos de administrador al usuario."""
+        if config.set_admin(usuario, False) is not True:
+            raise click.ClickException(f"No existe el usuario '{usuario}'.")
+        click.echo(f'{usuario} ya no es administrador.')
+
+    @admin_cli.command('search')
+    @click.argument('query')
+    @click.option('--page', default=1, show_default=True)
+    def search_command(query, page):
+        """Prueba la búsqueda de usuarios desde la terminal."""
+        start = time.perf_counter()
+        result = search_users(query, page)
+        elapsed = (time.perf_counter() - start) * 1000
+        for user in result['items']:
+            click.echo(f"{user['id']:>8}  {user['usuario']:<15} {user['nombre']} {user['primer_apellido']} "
+                       f"{user['segundo_apellido'] or ''}  {user['email']}  {user['telefono']}")
+        more = '+' if result['truncated'] else ''
+        click.echo(f"{result['total']}{more} coincidencias en {elapsed:.1f} ms.", err=True)
+
+    @admin_cli.command('reindex')
+    def reindex_command():
+        """Reconstruye el índice de búsqueda de usuarios."""
+        click.echo(f'{rebuild_index()} usuarios indexados.')
+
+    app.cli.add_command(admin_cli)
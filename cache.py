@@ -0,0 +1,89 @@
+# cache.py
+import threading
+import time
+from collections import OrderedDict
+
+# Marcador interno para distinguir "no está en caché" de un valor None guardado.
+_MISSING = object()
+
+
+class LRUCache:
+    """Caché en memoria con límite de tamaño (LRU) y tiempo de vida (TTL) por entrada.
+
+    Es segura entre hilos y lleva contadores de aciertos/fallos para poder
+    observar su efectividad.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Se incrementa en cada invalidación; permite descartar un valor leído de la BD
+        # mientras otro hilo lo modificaba (ver `set(..., generation=...)`).
+        self.generation = 0
+        self._data = OrderedDict()  # key -> (expira_en, valor)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Retorna el valor guardado o `default` si no existe o ya expiró."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] < now:
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None, generation=None):
+        """Guarda un valor, desalojando la entrada menos usada si se excede el tamaño.
+
+        Si se indica `generation` y desde entonces hubo alguna invalidación, el valor
+        se considera potencialmente obsoleto y no se guarda.
+        """
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        """Elimina una entrada si existe."""
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+
+    def discard_where(self, predicate):
+        """Elimina todas las entradas para las que predicate(key, value) es verdadero."""
+        with self._lock:
+            self.generation += 1
+            stale = [key for key, (_, value) in self._data.items() if predicate(key, value)]
+            for key in stale:
+                del self._data[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Retorna un resumen de uso: tamaño, aciertos, fallos y tasa de aciertos."""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / total) if total else 0.0,
+        }
@@ -1,91 +1,374 @@
 # config.py
+import queue
 import sqlite3
-from werkzeug.security import generate_password_hash
+import string
+import threading
+import time
 from sqlite3 import IntegrityError
 
+from flask import g, has_app_context
+
+from cache import LRUCache
+from hashing import hash_password
+from metrics import record_db
+
 DATABASE = 'db.db'
-# Variable para controlar si ya se ha impreso el mensaje de éxito de inicialización.
-# Esto ayuda a mitigar la doble impresión del Flask reloader.
-DB_INIT_MESSAGE_SHOWN = False 
 
+# Parámetros de las conexiones SQLite.
+# WAL permite lectores concurrentes mientras un proceso escribe (adiós a la mayoría de
+# los 'database is locked'), NORMAL es seguro en WAL y evita un fsync por commit,
+# y busy_timeout hace que un escritor espere el lock en vez de fallar de inmediato.
+DB_JOURNAL_MODE = 'WAL'
+DB_SYNCHRONOUS = 'NORMAL'
+DB_BUSY_TIMEOUT_MS = 5000
+DB_STATEMENT_CACHE_SIZE = 256 # Sentencias preparadas que cada conexión mantiene compiladas
+DB_POOL_SIZE = 16 # Conexiones ociosas que se conservan entre peticiones
 
-def init_db():
-    """Inicializa la base de datos y crea la tabla de usuarios si no existe."""
-    global DB_INIT_MESSAGE_SHOWN
-    
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    
-    try:
-        # Comando para crear la tabla si no existe
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT NOT NULL,
-                primer_apellido TEXT NOT NULL,
-                segundo_apellido TEXT,
-                telefono TEXT UNIQUE NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                usuario TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL
-            )
-        ''')
-        conn.commit()
-        
-        # Este mensaje solo se imprimirá una vez por ejecución del script Python, 
-        # sin importar si la tabla ya existía o si Flask la llama dos veces.
-        if not DB_INIT_MESSAGE_SHOWN:
-            print("Base de datos 'db.db' verificada: La tabla 'users' está lista.")
-            DB_INIT_MESSAGE_SHOWN = True
-            
-    except Exception as e:
-        print(f"Error al inicializar la base de datos: {e}")
-    finally:
-        conn.close()
+# Caché de registros de usuario (por id, email y usuario) para /profile y el login.
+USER_CACHE_SIZE = 2048
+USER_CACHE_TTL = 300 # segundos
 
+# Caché de disponibilidad de email/usuario/telefono: (campo, valor) -> id del dueño o 0 si
+# está libre. Los "libres" caducan pronto: alguien puede registrarlo entretanto.
+AVAILABILITY_CACHE_SIZE = 8192
+AVAILABILITY_CACHE_TTL = 300 # segundos (valores ocupados)
+AVAILABILITY_FREE_TTL = 30 # segundos (valores libres)
 
-# --- Funciones CRUD y de Búsqueda ---
 
-def get_db_connection():
-    """Retorna una conexión a la base de datos."""
-    conn = sqlite3.connect(DATABASE)
+# --- Gestión de Conexiones ---
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor que reporta a metrics.py el tiempo y número de consultas de cada petición."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_db(time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_db(time.perf_counter() - start)
+
+
+class TimedConnection(sqlite3.Connection):
+    """Conexión cuyos cursores (incluidos los de conn.execute) son TimedCursor."""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# Durante una petición la conexión vive en `g` y al terminar vuelve a un pool de
+# conexiones ociosas, así cada petición reutiliza una ya abierta aunque el servidor cree
+# un hilo nuevo por petición. Fuera de una petición (CLI, hilos en segundo plano) cada
+# hilo conserva la suya.
+_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+_local = threading.local()
+
+
+def open_db_connection(database=None):
+    """Abre una conexión nueva con los PRAGMA de rendimiento aplicados."""
+    database = database or DATABASE
+    conn = sqlite3.connect(
+        database,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=DB_STATEMENT_CACHE_SIZE,
+        check_same_thread=False, # Pasa de un hilo a otro a través del pool (nunca en paralelo)
+        factory=TimedConnection,
+    )
+    conn.database = database
     conn.row_factory = sqlite3.Row  # Permite acceder a las columnas por nombre
+    conn.execute(f'PRAGMA journal_mode = {DB_JOURNAL_MODE}')
+    conn.execute(f'PRAGMA synchronous = {DB_SYNCHRONOUS}')
+    conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+    conn.execute('PRAGMA foreign_keys = ON')
     return conn
 
-def get_user_by_email_or_username(identifier):
-    """Busca un usuario por email o nombre de usuario."""
+
+def _checkout():
+    """Toma una conexión ociosa del pool (o abre una nueva)."""
+    while True:
+        try:
+            conn = _pool.get_nowait()
+        except queue.Empty:
+            return open_db_connection()
+        if conn.database == DATABASE:
+            return conn
+        conn.close() # Quedó de otra base (benchmarks, scripts)
+
+
+def get_db_connection():
+    """Retorna la conexión de la petición actual (o la del hilo, fuera de una petición).
+
+    La conexión NO debe cerrarse al terminar: la libera release_db_connection()
+    al final de cada petición.
+    """
+    if has_app_context():
+        conn = g.get('_db_conn')
+        if conn is None:
+            conn = g._db_conn = _checkout()
+        return conn
+
+    conn = getattr(_local, 'conn', None)
+    if conn is None or conn.database != DATABASE:
+        if conn is not None:
+            conn.close()
+        conn = _local.conn = open_db_connection()
+    return conn
+
+
+def release_db_connection(exception=None):
+    """Devuelve la conexión de la petición al pool, lista para la siguiente.
+
+    Si algo quedó a medias (una excepción antes del commit) se hace rollback para no
+    retener el lock de escritura de SQLite.
+    """
+    conn = g.pop('_db_conn', None)
+    if conn is None:
+        return
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+
+def close_db_connection():
+    """Cierra la conexión del hilo actual (útil en scripts y al apagar el proceso)."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+
+
+# --- Caché de Usuarios ---
+
+# Cada registro se guarda bajo tres claves: ('id', id), ('email', email) y ('usuario', usuario).
+# Solo se cachean usuarios existentes; una búsqueda fallida siempre vuelve a la BD.
+user_cache = LRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+# Campos que nunca se guardan en la caché: cada proceso tiene la suya y solo el que
+# escribe la invalida (ni los otros workers ni `flask admin`). El login, el cambio de
+# contraseña y los chequeos de rol los leen de la BD (get_login_user, get_password_hash,
+# user_is_admin).
+UNCACHED_FIELDS = ('password_hash', 'es_admin')
+
+
+def _public(user):
+    return {field: value for field, value in user.items() if field not in UNCACHED_FIELDS}
+
+
+def _cache_user(user, generation=None):
+    """Guarda el registro (sin UNCACHED_FIELDS) bajo todas sus claves."""
+    user = _public(user)
+    for key in (('id', user['id']), ('email', user['email']), ('usuario', user['usuario'])):
+        user_cache.set(key, user, generation=generation)
+
+
+def invalidate_user(user_id):
+    """Elimina de la caché cualquier entrada que apunte al usuario indicado.
+
+    Debe llamarse DESPUÉS del commit para que ninguna lectura concurrente vuelva a
+    cachear los datos anteriores.
+    """
+    user_cache.discard_where(lambda key, user: user['id'] == user_id)
+
+
+def user_cache_stats():
+    """Retorna los contadores de la caché de usuarios (aciertos, fallos, tamaño)."""
+    return user_cache.stats()
+
+
+# --- Disponibilidad de Email/Usuario/Teléfono ---
+
+# Campos únicos -> código de error que retornan register_user y update_user_profile_info
+UNIQUE_FIELDS = {'email': 'email_exists', 'usuario': 'username_exists', 'telefono': 'phone_exists'}
+
+availability_cache = LRUCache(maxsize=AVAILABILITY_CACHE_SIZE, ttl=AVAILABILITY_CACHE_TTL)
+
+
+# NOCASE de SQLite solo iguala mayúsculas y minúsculas ASCII ('Ñ' y 'ñ' son distintas)
+_NOCASE_FOLD = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def _fold(field, value):
+    """Forma con la que SQLite compara el valor: telefono exacto, email y usuario con NOCASE."""
+    return value if field == 'telefono' else value.translate(_NOCASE_FOLD)
+
+
+def _availability_key(field, value):
+    # `value` ya normalizado (sin espacios alrededor): el mismo que se consulta en la BD
+    return (field, _fold(field, value))
+
+
+def find_owners(values):
+    """Retorna {campo: id del usuario que ya lo usa, o None} para los campos pedidos.
+
+    `values` es {campo: valor} con campos de UNIQUE_FIELDS. Lo que no está en la caché
+    se resuelve con una sola consulta sobre los índices (NOCASE para email y usuario).
+    """
+    owners, missing = {}, {}
+    for field, value in values.items():
+        value = value.strip() # Una sola normalización para la clave de caché y la consulta
+        cached = availability_cache.get(_availability_key(field, value))
+        if cached is None:
+            missing[field] = value
+        else:
+            owners[field] = cached or None
+    if not missing:
+        return owners
+
+    generation = availability_cache.generation
+    clauses = [f'{field} = ?' + ('' if field == 'telefono' else ' COLLATE NOCASE') for field in missing]
+    rows = get_db_connection().execute(
+        f"SELECT id, email, usuario, telefono FROM users WHERE {' OR '.join(clauses)}",
+        list(missing.values())
+    ).fetchall()
+    for field, value in missing.items():
+        key = _availability_key(field, value)
+        owner = next((row['id'] for row in rows if _fold(field, row[field]) == key[1]), None)
+        availability_cache.set(key, owner or 0, ttl=None if owner else AVAILABILITY_FREE_TTL, generation=generation)
+        owners[field] = owner
+    return owners
+
+
+def find_conflict(email, usuario, telefono, exclude_user_id=None):
+    """Código de error del primer campo que ya usa otro usuario ('email_exists', ...) o None."""
+    owners = find_owners({'email': email, 'usuario': usuario, 'telefono': telefono})
+    for field, error_code in UNIQUE_FIELDS.items():
+        if owners[field] is not None and owners[field] != exclude_user_id:
+            return error_code
+    return None
+
+
+def _fresh_conflict(email, usuario, telefono, exclude_user_id=None):
+    """Como find_conflict pero yendo a la BD (y refrescando la caché con lo que encuentre)."""
+    for field, value in (('email', email), ('usuario', usuario), ('telefono', telefono)):
+        availability_cache.pop(_availability_key(field, value.strip()))
+    return find_conflict(email, usuario, telefono, exclude_user_id)
+
+
+def write_conflict(email, usuario, telefono, exclude_user_id=None):
+    """Conflicto para una escritura: la caché es orientativa (es de este proceso, y otro
+    pudo liberar el valor), así que un "ocupado" se confirma en la BD antes de rechazar."""
+    if find_conflict(email, usuario, telefono, exclude_user_id) is None:
+        return None
+    return _fresh_conflict(email, usuario, telefono, exclude_user_id)
+
+
+def _uncached_conflict(email, usuario, telefono, exclude_user_id=None):
+    """Conflicto tras un IntegrityError (la caché puede estar vieja)."""
+    return _fresh_conflict(email, usuario, telefono, exclude_user_id) or 'integrity_error'
+
+
+def invalidate_availability(user_id=None, values=()):
+    """Olvida los valores de un usuario (los viejos quedan libres) y los `values` (campo, valor)."""
+    if user_id is not None:
+        availability_cache.discard_where(lambda key, owner: owner == user_id)
+    for field, value in values:
+        availability_cache.pop(_availability_key(field, value.strip()))
+
+
+# --- Funciones CRUD y de Búsqueda ---
+
+def _select_by_identifier(identifier):
+    """Registro completo del usuario con ese email o nombre de usuario (o None), de la BD."""
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Intenta buscar por email
-    cursor.execute('SELECT * FROM users WHERE email = ?', (identifier,))
+    # Una sola consulta, sin distinguir mayúsculas, sobre los índices NOCASE de email y
+    # usuario (migración 1). Si hay varias coincidencias gana la exacta (primero el email,
+    # como antes) y después la cuenta más antigua.
+    cursor.execute(
+        '''
+        SELECT * FROM users
+        WHERE email = ? COLLATE NOCASE OR usuario = ? COLLATE NOCASE
+        ORDER BY email = ? DESC, usuario = ? DESC, email = ? COLLATE NOCASE DESC, id
+        LIMIT 1
+        ''',
+        (identifier,) * 5
+    )
     user = cursor.fetchone()
-    
+    return dict(user) if user is not None else None
+
+def get_user_by_email_or_username(identifier):
+    """Busca un usuario por email o nombre de usuario (sin UNCACHED_FIELDS)."""
+    user = user_cache.get(('email', identifier)) or user_cache.get(('usuario', identifier))
+    if user is not None:
+        return dict(user)
+
+    generation = user_cache.generation
+    user = _select_by_identifier(identifier)
     if user is None:
-        # Si no se encuentra por email, intenta buscar por nombre de usuario
-        cursor.execute('SELECT * FROM users WHERE usuario = ?', (identifier,))
-        user = cursor.fetchone()
-        
-    conn.close()
+        return None
+    _cache_user(user, generation)
+    return _public(user)
+
+def get_login_user(identifier):
+    """Como get_user_by_email_or_username pero de la BD y con password_hash y es_admin.
+    Aprovecha la lectura para refrescar la caché con el resto del registro."""
+    generation = user_cache.generation
+    user = _select_by_identifier(identifier)
+    if user is not None:
+        _cache_user(user, generation)
     return user
 
 def get_user_by_id(user_id):
-    """Busca un usuario por su ID (usado después del login para obtener detalles)."""
+    """Busca un usuario por su ID (usado después del login para obtener detalles).
+    No incluye UNCACHED_FIELDS: ver get_password_hash y user_is_admin."""
+    user = user_cache.get(('id', user_id))
+    if user is not None:
+        return dict(user)
+
+    generation = user_cache.generation
     conn = get_db_connection()
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
     user = cursor.fetchone()
-    conn.close()
-    # Retorna un diccionario con los datos o None
-    return dict(user) if user else None
+    if user is None:
+        return None
+
+    # Retorna un diccionario con los datos (una copia, la caché conserva el suyo)
+    user = dict(user)
+    _cache_user(user, generation)
+    return _public(user)
+
+def get_password_hash(user_id):
+    """password_hash actual del usuario (siempre de la BD), o None si no existe."""
+    row = get_db_connection().execute('SELECT password_hash FROM users WHERE id = ?', (user_id,)).fetchone()
+    return row['password_hash'] if row else None
+
+def user_is_admin(user_id):
+    """Si el usuario tiene el rol de administrador, leído de la BD (por clave primaria)."""
+    if not user_id:
+        return False
+    row = get_db_connection().execute('SELECT es_admin FROM users WHERE id = ?', (user_id,)).fetchone()
+    return bool(row and row['es_admin'])
 
 
 def register_user(nombre, apellido1, apellido2, telefono, email, usuario, password):
     """Registra un nuevo usuario, manejando colisiones de UNIQUE."""
+    # Los duplicados se detectan ANTES de pagar el hash (una consulta, o ninguna si está libre en caché)
+    conflict = write_conflict(email, usuario, telefono)
+    if conflict:
+        return conflict
+
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    password_hash = generate_password_hash(password)
+    # Se calcula en el pool de hashing (puede lanzar HashingBusy -> 503)
+    password_hash = hash_password(password)
     
     try:
         cursor.execute(
@@ -93,48 +376,63 @@ def register_user(nombre, apellido1, apellido2, telefono, email, usuario, passwo
             (nombre, apellido1, apellido2, telefono, email, usuario, password_hash)
         )
         conn.commit()
+        # Precargar la caché: lo normal tras registrarse es iniciar sesión enseguida
+        _cache_user({
+            'id': cursor.lastrowid,
+            'nombre': nombre,
+            'primer_apellido': apellido1,
+            'segundo_apellido': apellido2,
+            'telefono': telefono,
+            'email': email,
+            'usuario': usuario,
+            'password_hash': password_hash,
+        })
+        invalidate_availability(values=(('email', email), ('usuario', usuario), ('telefono', telefono)))
         return True
-    except IntegrityError as e:
-        conn.close()
-        # Analizar el error para dar un mensaje específico al usuario
-        error_message = str(e)
-        if 'email' in error_message:
-            return 'email_exists'
-        elif 'usuario' in error_message:
-            return 'username_exists'
-        elif 'telefono' in error_message:
-            return 'phone_exists'
-        else:
-            # En caso de otros errores de integridad
-            return 'integrity_error'
+    except IntegrityError:
+        conn.rollback()
+        # Alguien registró el mismo dato entre la verificación y el INSERT
+        return _uncached_conflict(email, usuario, telefono)
     except Exception as e:
+        conn.rollback()
         print(f"Error al registrar usuario: {e}")
-        conn.close()
         return 'general_error'
-    finally:
-        # Solo cerramos la conexión si no se cerró en el IntegrityError
-        if conn:
-             conn.close()
 
-def update_user_password(user_id, new_password_hash):
-    """Actualiza el password_hash de un usuario por su ID."""
+def update_user_password(user_id, new_password_hash, expected_hash=None):
+    """Actualiza el password_hash de un usuario por su ID.
+
+    Con `expected_hash` solo lo reemplaza si sigue siendo ese (el rehash en segundo
+    plano no debe pisar una contraseña cambiada mientras se calculaba).
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute(
-            'UPDATE users SET password_hash = ? WHERE id = ?',
-            (new_password_hash, user_id)
-        )
+        if expected_hash is None:
+            cursor.execute(
+                'UPDATE users SET password_hash = ? WHERE id = ?',
+                (new_password_hash, user_id)
+            )
+        else:
+            cursor.execute(
+                'UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+                (new_password_hash, user_id, expected_hash)
+            )
         conn.commit()
-        return cursor.rowcount > 0 # Retorna True si se actualizó una fila
+        updated = cursor.rowcount > 0
+        if updated:
+            invalidate_user(user_id)
+        return updated # Retorna True si se actualizó una fila
     except Exception as e:
+        conn.rollback()
         print(f"Error al actualizar la contraseña del usuario {user_id}: {e}")
         return False
-    finally:
-        conn.close()
 
 def update_user_profile_info(user_id, segundo_apellido, usuario, email, telefono):
     """Actualiza el segundo apellido, usuario, email y teléfono del usuario."""
+    conflict = write_conflict(email, usuario, telefono, exclude_user_id=user_id)
+    if conflict:
+        return conflict
+
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
@@ -150,20 +448,29 @@ def update_user_profile_info(user_id, segundo_apellido, usuario, email, telefono
             (segundo_apellido, usuario, email, telefono, user_id)
         )
         conn.commit()
+        invalidate_user(user_id)
+        invalidate_availability(user_id, (('email', email), ('usuario', usuario), ('telefono', telefono)))
         return True
-    except IntegrityError as e:
-        conn.close()
-        error_message = str(e)
-        if 'email' in error_message:
-            return 'email_exists'
-        elif 'usuario' in error_message:
-            return 'username_exists'
-        elif 'telefono' in error_message:
-            return 'phone_exists'
-        else:
-            return 'integrity_error'
+    except IntegrityError:
+        conn.rollback()
+        return _uncached_conflict(email, usuario, telefono, exclude_user_id=user_id)
     except Exception as e:
+        conn.rollback()
         print(f"Error al actualizar la información de perfil del usuario {user_id}: {e}")
         return 'general_error'
-    finally:
-        conn.close()
+
+def set_admin(usuario, es_admin):
+    """Da o quita el rol de administrador. Retorna True o 'not_found'."""
+    conn = get_db_connection()
+    try:
+        row = conn.execute('SELECT id FROM users WHERE usuario = ? COLLATE NOCASE', (usuario,)).fetchone()
+        if row is None:
+            return 'not_found'
+        conn.execute('UPDATE users SET es_admin = ? WHERE id = ?', (1 if es_admin else 0, row['id']))
+        conn.commit()
+        invalidate_user(row['id'])
+        return True
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Error al cambiar el rol de administrador de '{usuario}': {e}")
+        return 'general_error'
@@ -0,0 +1,403 @@
+# fotos.py
+"""Subida y entrega de fotos (vehículos y viajes) desde el teléfono de los choferes.
+
+- La subida se escribe a disco por trozos mientras llega (nunca entera en memoria) y el
+  sha256 se calcula en el mismo recorrido (HashingFile). Solo la vista de subida lee así
+  el cuerpo (parse_upload sobre request.stream); el resto de la app usa request.form.
+- Almacenamiento por contenido: el archivo se guarda como originales/ab/<sha256>.<ext>;
+  si dos choferes suben la misma foto se guarda una sola vez (tabla `archivos`) y cada
+  subida queda como una fila de `fotos` que apunta a ella.
+- La petición responde cuando los bytes ya están en disco (fsync + os.replace atómico);
+  las variantes reducidas (miniatura y tamaño medio) se generan después en un pool de
+  hilos propio, nunca en el hilo de la petición. Necesita Pillow (opcional): sin él se
+  sirve siempre el original.
+- /fotos/<archivo> sirve originales y variantes sin tocar la BD: el nombre ya dice qué
+  archivo es, nunca cambia (caché de un año, immutable) y admite Range. Detrás de nginx
+  se puede delegar el envío con X-Accel-Redirect (FOTOS_ACCEL_PREFIX).
+
+Si el proceso muere con variantes pendientes, el hilo de recuperación las vuelve a
+encolar (quedan con estado 'pendiente' en la BD).
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import abort, current_app, g, redirect, request, send_from_directory, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import FormDataParser
+
+import config
+
+try:
+    from PIL import Image, ImageOps
+except ImportError: # Dependencia opcional: sin ella no hay miniaturas
+    Image = ImageOps = None
+
+UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+UPLOAD_MAX_BYTES = 20 * 1024 * 1024 # Por foto (las de teléfono rondan 2-8 MB)
+UPLOAD_MAX_FILES = 10 # Por petición
+
+# Variantes: nombre -> lado mayor en píxeles. Se guardan como JPEG sin metadatos (EXIF/GPS).
+VARIANTS = {'mini': 320, 'media': 1280}
+VARIANT_QUALITY = 82
+
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_MAX_QUEUE = 64 # Las que no caben quedan 'pendiente' y las toma la recuperación
+THUMBNAIL_RETRY_INTERVAL = 60 # segundos entre barridos de variantes pendientes
+
+FOTOS_MAX_AGE = 365 * 24 * 60 * 60 # Los nombres son el hash del contenido: nunca cambian
+FOTOS_PAGE_SIZE = 30
+
+# Firmas de los formatos aceptados (los primeros bytes del archivo)
+_SIGNATURES = [(b'\xff\xd8\xff', 'jpg'), (b'\x89PNG\r\n\x1a\n', 'png')]
+MIMETYPES = {'jpg': 'image/jpeg', 'png': 'image/png', 'webp': 'image/webp', 'heic': 'image/heic'}
+
+_NAME_RE = re.compile(r'^(?P<sha>[0-9a-f]{64})(?:-(?P<variante>[a-z]+))?\.(?P<ext>jpg|png|webp|heic)$')
+
+
+def sniff(head):
+    """Retorna la extensión según el contenido (no según el nombre del archivo) o None."""
+    for signature, ext in _SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head[4:8] == b'ftyp' and head[8:12] in (b'heic', b'heix', b'mif1', b'msf1'):
+        return 'heic' # Las fotos de iPhone
+    return None
+
+
+def original_path(sha256, ext, base=None):
+    return os.path.join(base or UPLOAD_DIR, 'originales', sha256[:2], f'{sha256}.{ext}')
+
+
+def variant_path(sha256, variante, base=None):
+    return os.path.join(base or UPLOAD_DIR, 'variantes', sha256[:2], f'{sha256}-{variante}.jpg')
+
+
+def _fsync_dir(path):
+    """Hace durable la entrada de directorio (el rename) además del contenido."""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return # Windows: no se puede abrir un directorio
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+# =======================================================
+# SUBIDA EN STREAMING
+# =======================================================
+
+class HashingFile:
+    """Archivo temporal en disco que calcula el sha256 mientras Werkzeug le escribe la subida."""
+
+    def __init__(self, directory, max_bytes=UPLOAD_MAX_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix='subida-')
+        self.file = os.fdopen(fd, 'w+b')
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.head = b''
+        self.max_bytes = max_bytes
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise RequestEntityTooLarge(f'Alguna foto supera el tamaño máximo ({self.max_bytes // (1024 * 1024)} MB).')
+        if len(self.head) < 16:
+            self.head = (self.head + data)[:16]
+        self.sha256.update(data)
+        return self.file.write(data)
+
+    # Lo que FileStorage necesita para leerlo después (seek/read)
+    def seek(self, *args):
+        return self.file.seek(*args)
+
+    def tell(self):
+        return self.file.tell()
+
+    def read(self, *args):
+        return self.file.read(*args)
+
+    def readline(self, *args):
+        return self.file.readline(*args)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def persist(self, target):
+        """fsync del contenido y rename atómico a `target` (mismo sistema de archivos)."""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(self.path, target)
+        _fsync_dir(os.path.dirname(target))
+
+    def discard(self):
+        self.file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _upload_stream(total_content_length, content_type, filename=None, content_length=None):
+    """stream_factory del parser: cada archivo del multipart va directo a un HashingFile."""
+    upload_files = g.setdefault('upload_files', [])
+    if len(upload_files) >= UPLOAD_MAX_FILES:
+        raise RequestEntityTooLarge(f'Se pueden subir hasta {UPLOAD_MAX_FILES} fotos a la vez.')
+    stream = HashingFile(os.path.join(UPLOAD_DIR, 'tmp'), UPLOAD_MAX_BYTES)
+    upload_files.append(stream)
+    return stream
+
+
+def parse_upload():
+    """Lee el multipart de la petición actual desde request.stream, con los archivos en
+    HashingFile. Retorna (form, files); después request.form queda vacío."""
+    parser = FormDataParser(
+        stream_factory=_upload_stream,
+        max_form_memory_size=request.max_form_memory_size,
+        max_content_length=request.max_content_length,
+        max_form_parts=request.max_form_parts,
+    )
+    _, form, files = parser.parse(request.stream, request.mimetype, request.content_length, request.mimetype_params)
+    return form, files
+
+
+def store_upload(user_id, storage):
+    """Guarda un archivo subido (FileStorage de parse_upload, sobre un HashingFile).
+
+    Retorna (foto, None) con foto = {'id', 'sha256', 'ext', 'nuevo'} o (None, motivo).
+    """
+    stream = storage.stream
+    if not isinstance(stream, HashingFile):
+        return None, 'subida no soportada'
+    if stream.size == 0:
+        stream.discard()
+        return None, 'archivo vacío'
+    ext = sniff(stream.head)
+    if ext is None:
+        stream.discard()
+        return None, 'formato no soportado (JPEG, PNG, WebP o HEIC)'
+
+    sha256 = stream.sha256.hexdigest()
+    target = original_path(sha256, ext)
+    nuevo = not os.path.exists(target)
+    if nuevo:
+        stream.persist(target)
+    else:
+        stream.discard() # Mismo contenido ya guardado: no se escribe de nuevo
+
+    conn = config.get_db_connection()
+    try:
+        primera_vez = conn.execute(
+            'INSERT INTO archivos (sha256, ext, bytes, estado) VALUES (?, ?, ?, ?) ON CONFLICT (sha256) DO NOTHING',
+            (sha256, ext, stream.size, 'pendiente' if Image is not None else 'original')
+        ).rowcount == 1
+        cursor = conn.execute(
+            'INSERT INTO fotos (user_id, sha256, nombre) VALUES (?, ?, ?)',
+            (user_id, sha256, (storage.filename or '')[:200])
+        )
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Error al registrar la foto {sha256}: {e}")
+        return None, 'error al guardar'
+    if primera_vez:
+        queue_variants(sha256, ext)
+    return {'id': cursor.lastrowid, 'sha256': sha256, 'ext': ext, 'nuevo': nuevo}, None
+
+
+def discard_uploads(exc=None):
+    """Borra los temporales que no llegaron a guardarse (errores, subidas cortadas)."""
+    for stream in g.pop('upload_files', ()):
+        stream.discard()
+
+
+# =======================================================
+# VARIANTES EN SEGUNDO PLANO
+# =======================================================
+
+_executor = None
+_slots = None
+_accel_prefix = None
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def configure(workers=THUMBNAIL_WORKERS, max_queue=THUMBNAIL_MAX_QUEUE):
+    """(Re)crea el pool de variantes con `workers` hilos y `max_queue` tareas en espera."""
+    global _executor, _slots
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+    # Pillow libera el GIL al decodificar y redimensionar: los hilos trabajan en paralelo
+    _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fotos')
+    _slots = threading.BoundedSemaphore(workers + max_queue)
+
+
+def queue_variants(sha256, ext):
+    """Encola la generación de variantes. Si la cola está llena se deja para la recuperación."""
+    if Image is None or _executor is None:
+        return False
+    with _in_flight_lock:
+        if sha256 in _in_flight:
+            return True
+        if not _slots.acquire(blocking=False):
+            return False
+        _in_flight.add(sha256)
+
+    def done(_):
+        with _in_flight_lock:
+            _in_flight.discard(sha256)
+        _slots.release()
+
+    _executor.submit(_variants_task, sha256, ext).add_done_callback(done)
+    return True
+
+
+def generate_variants(sha256, ext, base=None):
+    """Genera las variantes JPEG de un original. Retorna (ancho, alto) del original."""
+    with Image.open(original_path(sha256, ext, base)) as image:
+        size = image.size
+        # Decodificar el JPEG ya reducido (mucho más rápido que a tamaño completo)
+        image.draft('RGB', (max(VARIANTS.values()),) * 2)
+        image = ImageOps.exif_transpose(image) # Las fotos del teléfono vienen rotadas por EXIF
+        if (image.width > image.height) != (size[0] > size[1]):
+            size = size[::-1]
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        for variante, lado in sorted(VARIANTS.items(), key=lambda item: -item[1]):
+            image.thumbnail((lado, lado), Image.LANCZOS)
+            target = variant_path(sha256, variante, base)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp = f'{target}.{os.getpid()}.tmp'
+            image.save(tmp, 'JPEG', quality=VARIANT_QUALITY, optimize=True, progressive=True)
+            os.replace(tmp, target)
+    return size
+
+
+def _variants_task(sha256, ext):
+    # Conexión propia: corre fuera de cualquier petición
+    conn = config.open_db_connection()
+    try:
+        try:
+            ancho, alto = generate_variants(sha256, ext)
+            conn.execute("UPDATE archivos SET estado = 'lista', ancho = ?, alto = ? WHERE sha256 = ?", (ancho, alto, sha256))
+        except Exception as e:
+            # Archivo que Pillow no sabe abrir (p. ej. HEIC sin plugin): se sirve el original
+            print(f"No se pudieron generar las variantes de {sha256}: {e}")
+            conn.execute("UPDATE archivos SET estado = 'original' WHERE sha256 = ?", (sha256,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _recover(interval):
+    """Vuelve a encolar las variantes pendientes (proceso reiniciado o cola llena)."""
+    while True:
+        try:
+            conn = config.open_db_connection()
+            try:
+                pending = conn.execute(
+                    "SELECT sha256, ext FROM archivos WHERE estado = 'pendiente' LIMIT ?", (THUMBNAIL_MAX_QUEUE,)
+                ).fetchall()
+            finally:
+                conn.close()
+            for row in pending:
+                if not queue_variants(row['sha256'], row['ext']):
+                    break
+        except Exception as e:
+            print(f"Error al recuperar variantes pendientes: {e}")
+        time.sleep(interval)
+
+
+# =======================================================
+# CONSULTAS Y ENTREGA
+# =======================================================
+
+def foto_urls(row):
+    """URLs de una foto (fila con sha256, ext y estado) para plantillas y JSON."""
+    original = url_for('foto_archivo', filename=f"{row['sha256']}.{row['ext']}")
+    urls = {'original': original}
+    for variante in VARIANTS:
+        # Mientras la variante no existe, su URL redirige al original
+        urls[variante] = url_for('foto_archivo', filename=f"{row['sha256']}-{variante}.jpg")
+    return urls
+
+
+def fotos_de_usuario(user_id, limit=FOTOS_PAGE_SIZE):
+    """Últimas fotos subidas por el usuario, con sus URLs."""
+    rows = config.get_db_connection().execute(
+        '''
+        SELECT f.id, f.nombre, f.creada_en, a.sha256, a.ext, a.estado, a.bytes
+        FROM fotos f JOIN archivos a ON a.sha256 = f.sha256
+        WHERE f.user_id = ? ORDER BY f.id DESC LIMIT ?
+        ''',
+        (user_id, limit)
+    ).fetchall()
+    return [dict(row, urls=foto_urls(row)) for row in rows]
+
+
+def serve_foto(filename):
+    """Sirve un original o una variante por su nombre con hash (caché de un año, Range)."""
+    match = _NAME_RE.match(filename)
+    if not match:
+        abort(404)
+    sha256, variante, ext = match['sha'], match['variante'], match['ext']
+    if variante:
+        if variante not in VARIANTS or ext != 'jpg':
+            abort(404)
+        relative = os.path.relpath(variant_path(sha256, variante), UPLOAD_DIR)
+    else:
+        relative = os.path.relpath(original_path(sha256, ext), UPLOAD_DIR)
+
+    if not os.path.exists(os.path.join(UPLOAD_DIR, relative)):
+        if not variante:
+            abort(404)
+        # Variante aún no generada (o sin Pillow): el original, sin cachear la redirección
+        row = config.get_db_connection().execute('SELECT ext FROM archivos WHERE sha256 = ?', (sha256,)).fetchone()
+        if row is None:
+            abort(404)
+        response = redirect(url_for('foto_archivo', filename=f"{sha256}.{row['ext']}"))
+        response.cache_control.no_store = True
+        return response
+
+    if _accel_prefix:
+        # nginx envía el archivo (sendfile, Range) y el hilo de Python queda libre
+        response = current_app.response_class('', mimetype=MIMETYPES[ext])
+        response.headers['X-Accel-Redirect'] = f"{_accel_prefix.rstrip('/')}/{relative.replace(os.sep, '/')}"
+    else:
+        response = send_from_directory(UPLOAD_DIR, relative, mimetype=MIMETYPES[ext], max_age=FOTOS_MAX_AGE,
+                                       conditional=True, etag=sha256 + (variante or ''))
+    response.cache_control.public = True
+    response.cache_control.max_age = FOTOS_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    """Registra la limpieza de subidas, la ruta /fotos/<archivo> y el pool de variantes."""
+    global UPLOAD_DIR, UPLOAD_MAX_BYTES, UPLOAD_MAX_FILES, _accel_prefix
+    UPLOAD_DIR = app.config.get('UPLOAD_DIR', UPLOAD_DIR)
+    UPLOAD_MAX_BYTES = app.config.get('UPLOAD_MAX_BYTES', UPLOAD_MAX_BYTES)
+    UPLOAD_MAX_FILES = app.config.get('UPLOAD_MAX_FILES', UPLOAD_MAX_FILES)
+    _accel_prefix = app.config.get('FOTOS_ACCEL_PREFIX')
+    app.teardown_request(discard_uploads)
+    app.add_url_rule('/fotos/<filename>', 'foto_archivo', serve_foto)
+
+    configure(app.config.get('THUMBNAIL_WORKERS', THUMBNAIL_WORKERS), THUMBNAIL_MAX_QUEUE)
+    if Image is None:
+        return
+    interval = app.config.get('THUMBNAIL_RETRY_INTERVAL', THUMBNAIL_RETRY_INTERVAL)
+    threading.Thread(target=_recover, args=(interval,), name='fotos-recuperacion', daemon=True).start()
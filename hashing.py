@@ -0,0 +1,150 @@
+# hashing.py
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from metrics import record_hash
+
+# scrypt (el método por defecto de Werkzeug) libera el GIL mientras calcula, así que
+# un pool de hilos basta para sacar el hashing de los hilos que atienden peticiones.
+HASH_ALGORITHM = 'scrypt'
+HASH_R = 8
+HASH_P = 1
+HASH_MIN_COST = 2**15 # Nunca bajamos del valor por defecto de Werkzeug
+HASH_MAX_COST = 2**16 # Cada hash reserva ~128 * N * r bytes de memoria
+
+
+class HashingBusy(Exception):
+    """El pool de hashing está saturado; la petición debe rechazarse con 503."""
+
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+_method = f'{HASH_ALGORITHM}:{HASH_MIN_COST}:{HASH_R}:{HASH_P}'
+
+
+def configure(workers=None, max_queue=None, method=None):
+    """(Re)crea el pool con `workers` hilos y como máximo `max_queue` tareas en espera."""
+    global _executor, _slots, _method
+    workers = workers or os.cpu_count() or 2
+    max_queue = workers * 4 if max_queue is None else max_queue
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hashing')
+        _slots = threading.BoundedSemaphore(workers + max_queue)
+        if method:
+            _method = method
+
+
+def current_method():
+    """Retorna los parámetros con los que se generan los hashes nuevos."""
+    return _method
+
+
+def calibrate(target_ms=250, min_cost=HASH_MIN_COST, max_cost=HASH_MAX_COST):
+    """Elige el costo de scrypt más alto cuyo hash tarde como máximo `target_ms`.
+
+    El tiempo de scrypt crece linealmente con N, así que basta medir el costo mínimo
+    y extrapolar a la potencia de dos más cercana.
+    """
+    global _method
+    probe = f'{HASH_ALGORITHM}:{min_cost}:{HASH_R}:{HASH_P}'
+    elapsed = min(_timed_hash(probe) for _ in range(2))
+    cost = min_cost
+    if elapsed > 0:
+        cost = min_cost * 2 ** max(0, int(math.log2(target_ms / 1000 / elapsed)))
+    cost = max(min_cost, min(cost, max_cost))
+    _method = f'{HASH_ALGORITHM}:{cost}:{HASH_R}:{HASH_P}'
+    return _method
+
+
+def _timed_hash(method):
+    start = time.perf_counter()
+    generate_password_hash('calibracion', method=method)
+    return time.perf_counter() - start
+
+
+def submit(fn, *args):
+    """Encola `fn(*args)` en el pool, o lanza HashingBusy si la cola está llena."""
+    if _executor is None:
+        configure()
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = _executor.submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def _run(fn, *args):
+    # El tiempo que cuenta para la petición es la espera completa (cola + cálculo)
+    start = time.perf_counter()
+    try:
+        return submit(fn, *args).result()
+    finally:
+        record_hash(time.perf_counter() - start)
+
+
+def hash_password(password):
+    """Genera el hash de la contraseña en el pool con los parámetros actuales."""
+    return _run(generate_password_hash, password, _method)
+
+
+def verify_password(pwhash, password):
+    """Verifica la contraseña contra su hash en el pool."""
+    return _run(check_password_hash, pwhash, password)
+
+
+def needs_rehash(pwhash):
+    """Indica si el hash se generó con parámetros más débiles que los actuales.
+
+    Solo se "sube" el costo: así dos procesos con calibraciones ligeramente distintas
+    no reescriben el mismo hash una y otra vez.
+    """
+    stored = pwhash.split('$', 1)[0].split(':')
+    current = _method.split(':')
+    if stored[0] != current[0] or len(stored) != len(current):
+        return True
+    try:
+        return any(int(s) < int(c) for s, c in zip(stored[1:], current[1:]))
+    except ValueError:
+        return True
+
+
+def rehash_in_background(password, on_done):
+    """Genera un hash nuevo sin bloquear la petición y lo entrega a `on_done(hash)`.
+
+    Si el pool está saturado simplemente se omite; se reintentará en el próximo login.
+    `on_done` corre más tarde en otro hilo: debe guardar el hash solo si el almacenado
+    sigue siendo el que se verificó.
+    """
+    def task():
+        on_done(generate_password_hash(password, _method))
+    try:
+        submit(task)
+    except HashingBusy:
+        pass
+
+
+def init_app(app):
+    """Configura el pool y la calibración a partir de app.config y registra el 503."""
+    configure(
+        workers=app.config.get('HASH_WORKERS'),
+        max_queue=app.config.get('HASH_MAX_QUEUE'),
+        method=app.config.get('HASH_METHOD'),
+    )
+    if not app.config.get('HASH_METHOD'):
+        calibrate(app.config.get('HASH_TARGET_MS', 250))
+
+    @app.errorhandler(HashingBusy)
+    def hashing_busy(e):
+        return 'El servidor está ocupado. Por favor, intenta de nuevo en unos segundos.', 503, {'Retry-After': '2'}
@@ -0,0 +1,205 @@
+# imagenes.py
+"""Variantes de las imágenes del layout (logo e iconos PWA): tamaños por densidad,
+formatos modernos y nombres con hash.
+
+    flask --app app build-images
+
+Las imágenes de static/img siguen siendo la fuente: el build genera en static/dist/img
+una variante por ancho y formato de cada una (AVIF y WebP donde sirven, y PNG
+optimizado como respaldo) y las registra en el manifest de assets.py con la clave
+'img/logo.png:100.webp'. También escribe un manifest.webmanifest con los iconos
+apuntando a sus variantes.
+
+En las plantillas:
+- `picture('img/logo.png', alt=...)` arma un <picture> con srcset/sizes por formato.
+- `image_url('img/icon-512.png', 180)` da la URL de una variante PNG.
+- `webmanifest_url()` da el manifest de la PWA.
+Sin build (o sin Pillow) todos caen a los archivos originales de static/.
+"""
+import hashlib
+import io
+import json
+import os
+
+import click
+from flask import url_for
+from markupsafe import Markup, escape
+
+import assets
+
+try:
+    from PIL import Image
+except ImportError: # Dependencia opcional: sin ella se sirven los originales
+    Image = None
+
+# Fuente (relativa a static/) -> anchos a generar (px reales), formatos y `sizes` del <img>.
+# El logo se ve a 50px CSS (70px menos el padding; 31px en pantallas de hasta 350px):
+# 50/100/150 cubren densidades 1x, 2x y 3x.
+IMAGES = {
+    'img/logo.png': {'widths': (50, 100, 150), 'formats': ('avif', 'webp', 'png'),
+                     'sizes': '(max-width: 350px) 31px, 50px'},
+    'img/icon-192.png': {'widths': (192,), 'formats': ('png',)},
+    'img/icon-512.png': {'widths': (180, 512), 'formats': ('png',)}, # 180: apple-touch-icon
+}
+
+# Del más liviano al de mayor compatibilidad: el navegador toma el primer <source> que soporta
+FORMAT_ORDER = ('avif', 'webp', 'png')
+MIMETYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'png': 'image/png'}
+SAVE_OPTIONS = {
+    'avif': {'quality': 60, 'speed': 4},
+    'webp': {'quality': 82, 'method': 6},
+    'png': {'optimize': True},
+}
+
+WEBMANIFEST_SOURCE = 'manifest.json'
+WEBMANIFEST_KEY = 'manifest.webmanifest'
+# Icono del manifest de la PWA -> variante PNG que lo reemplaza
+MANIFEST_ICONS = {'/static/img/icon-192.png': ('img/icon-192.png', 192),
+                  '/static/img/icon-512.png': ('img/icon-512.png', 512)}
+
+# Estático del precache de pwa.py -> variantes que lo reemplazan después del build
+PRECACHE_VARIANTS = {
+    'manifest.json': [WEBMANIFEST_KEY],
+    'img/icon-192.png': ['img/icon-192.png:192.png'],
+    'img/icon-512.png': ['img/icon-512.png:512.png', 'img/icon-512.png:180.png'],
+    'img/logo.png': [], # <picture>: el navegador elige formato y ancho, y se cachea al usarlo
+}
+
+
+def variant_key(src, width, fmt):
+    return f'{src}:{width}.{fmt}'
+
+
+def encode(image, fmt):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+    return buffer.getvalue()
+
+
+def write_hashed(name, data):
+    """Guarda `data` en dist/ con el hash en el nombre ('img/logo-100.webp' -> 'img/logo-100.<hash>.webp')."""
+    stem, ext = os.path.splitext(name)
+    hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+    target = os.path.join(assets.DIST_DIR, hashed)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, 'wb') as f:
+        f.write(data)
+    return hashed
+
+
+def build_variants(images=IMAGES):
+    """Genera todas las variantes. Retorna {clave: archivo con hash}."""
+    entries = {}
+    for src, spec in images.items():
+        with Image.open(os.path.join(assets.STATIC_DIR, src)) as source:
+            source.load()
+            original = source.convert('RGBA') if source.mode not in ('RGB', 'RGBA') else source.copy()
+        stem = os.path.splitext(src)[0]
+        for width in spec['widths']:
+            width = min(width, original.width) # Nunca se agranda
+            height = round(original.height * width / original.width)
+            resized = original if width == original.width else original.resize((width, height), Image.Resampling.LANCZOS)
+            for fmt in spec['formats']:
+                entries[variant_key(src, width, fmt)] = write_hashed(f'{stem}-{width}.{fmt}', encode(resized, fmt))
+    return entries
+
+
+def build_webmanifest(entries):
+    """manifest.json con los iconos apuntando a sus variantes. Las URLs son relativas al
+    propio manifest (que queda en /assets/), así no dependen de la raíz de la app."""
+    with open(os.path.join(assets.STATIC_DIR, WEBMANIFEST_SOURCE), encoding='utf-8') as f:
+        manifest = json.load(f)
+    for icon in manifest.get('icons', []):
+        replacement = MANIFEST_ICONS.get(icon.get('src'))
+        hashed = entries.get(variant_key(*replacement, 'png')) if replacement else None
+        if hashed:
+            icon['src'] = hashed
+            icon['type'] = MIMETYPES['png']
+    data = json.dumps(manifest, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    stem, ext = os.path.splitext(WEBMANIFEST_KEY)
+    hashed = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+    assets.write_precompressed(os.path.join(assets.DIST_DIR, hashed), data)
+    return hashed
+
+
+def build(images=IMAGES):
+    """Genera variantes y manifest de la PWA y los agrega al manifest de assets. Retorna las entradas."""
+    entries = build_variants(images)
+    entries[WEBMANIFEST_KEY] = build_webmanifest(entries)
+    assets.write_manifest(entries)
+    return entries
+
+
+# =======================================================
+# RUNTIME (helpers de plantillas)
+# =======================================================
+
+def _asset_url(key):
+    hashed = assets.load_manifest().get(key)
+    return url_for('asset', filename=hashed) if hashed else None
+
+
+def image_url(src, width=None, fmt='png'):
+    """URL de una variante (el ancho más grande si no se indica), o del original sin build."""
+    spec = IMAGES.get(src)
+    if spec is not None:
+        width = width or max(spec['widths'])
+        url = _asset_url(variant_key(src, width, fmt))
+        if url:
+            return url
+    return url_for('static', filename=src)
+
+
+def webmanifest_url():
+    return _asset_url(WEBMANIFEST_KEY) or url_for('static', filename=WEBMANIFEST_SOURCE)
+
+
+def picture(src, alt='', sizes=None, **attrs):
+    """<picture> con un <source> por formato moderno y un <img> PNG de respaldo.
+
+    Los atributos extra (class_, loading, ...) van al <img>; `class_` se escribe `class`.
+    """
+    spec = IMAGES.get(src, {'widths': (), 'formats': ()})
+    sizes = sizes or spec.get('sizes')
+    manifest = assets.load_manifest()
+    srcsets = {}
+    for fmt in FORMAT_ORDER:
+        if fmt not in spec['formats']:
+            continue
+        candidates = [(width, manifest.get(variant_key(src, width, fmt))) for width in spec['widths']]
+        if all(hashed for _, hashed in candidates):
+            srcsets[fmt] = ', '.join(f"{url_for('asset', filename=hashed)} {width}w" for width, hashed in candidates)
+
+    img_attrs = {'alt': alt, **{name.rstrip('_'): value for name, value in attrs.items()}}
+    if 'png' in srcsets:
+        img_attrs.update(src=image_url(src, min(spec['widths'])), srcset=srcsets.pop('png'), sizes=sizes)
+    else:
+        img_attrs['src'] = url_for('static', filename=src)
+    img = '<img {}>'.format(' '.join(f'{name}="{escape(value)}"' for name, value in img_attrs.items() if value is not None))
+    if not srcsets:
+        return Markup(img)
+    sizes_attr = f' sizes="{escape(sizes)}"' if sizes else ''
+    sources = ''.join(f'<source type="{MIMETYPES[fmt]}" srcset="{escape(srcset)}"{sizes_attr}>' for fmt, srcset in srcsets.items())
+    return Markup(f'<picture>{sources}{img}</picture>')
+
+
+def precache_urls(name):
+    """URLs con hash que reemplazan a un estático del precache (pwa.py), o None sin build."""
+    manifest = assets.load_manifest()
+    if WEBMANIFEST_KEY not in manifest or name not in PRECACHE_VARIANTS:
+        return None
+    return [url_for('asset', filename=manifest[key]) for key in PRECACHE_VARIANTS[name] if key in manifest]
+
+
+def init_app(app):
+    """Registra los helpers `picture`, `image_url` y `webmanifest_url` y `flask build-images`."""
+    app.jinja_env.globals.update(picture=picture, image_url=image_url, webmanifest_url=webmanifest_url)
+
+    @app.cli.command('build-images')
+    def build_images_command():
+        """Genera las variantes de imágenes y el manifest de la PWA en static/dist."""
+        if Image is None:
+            raise click.ClickException('Generar variantes de imágenes necesita Pillow: pip install Pillow')
+        for key, hashed in build().items():
+            size = os.path.getsize(os.path.join(assets.DIST_DIR, hashed))
+            click.echo(f'{key} -> dist/{hashed} ({size / 1024:.1f} KB)')
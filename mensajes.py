@@ -0,0 +1,341 @@
+# mensajes.py
+"""Mensajes en tiempo real (despacho -> clientes y colaboradores) con Server-Sent Events.
+
+Los mensajes se guardan en SQLite (tabla `mensajes`, migración 8) y se reparten por SSE
+desde un broker en el proceso: cada conexión abierta es un suscriptor con una cola
+acotada, y un solo hilo por proceso lee los mensajes nuevos de la BD y los copia a las
+colas de los suscriptores de cada canal. Así una conexión ociosa no cuesta consultas ni
+chequeos de sesión (solo al conectarse), y los mensajes publicados por OTRO proceso
+también llegan (el hilo los encuentra en la BD; en el mismo proceso se le avisa al
+publicar y no espera el intervalo).
+
+- Reanudación: el navegador reenvía `Last-Event-ID` al reconectarse y se reenvía desde
+  la BD lo que se perdió.
+- Envío en lotes: tras despertar se esperan SSE_BATCH_WINDOW segundos y se envía todo lo
+  acumulado en una sola escritura.
+- Modo ASGI (asgi.py): con un bucle de eventos el stream es un generador asíncrono y la
+  conexión ociosa no ocupa ningún hilo; el broker la despierta desde su hilo.
+- Contrapresión: si un cliente lento acumula más de SSE_MAX_PENDING mensajes se le cierra
+  la conexión; al reconectarse los recupera de la BD con su Last-Event-ID, sin que el
+  broker guarde memoria ilimitada por él.
+
+Canales: 'todos' (avisos generales) y 'u:<id>' (los de un usuario).
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+import config
+
+CANAL_TODOS = 'todos'
+MENSAJE_MAX_LENGTH = 2000
+MENSAJES_PAGE_SIZE = 50
+
+SSE_HEARTBEAT = 15 # segundos sin mensajes antes de enviar un comentario (detecta clientes caídos)
+SSE_BATCH_WINDOW = 0.02 # segundos que se espera para juntar una ráfaga en un solo envío
+SSE_MAX_PENDING = 256 # mensajes en cola por suscriptor antes de cortarlo
+SSE_MAX_LIFETIME = 30 * 60 # segundos; luego el cliente se reconecta solo (libera hilos viejos)
+SSE_RETRY_MS = 3000 # espera del navegador antes de reconectarse
+SSE_REPLAY_LIMIT = 500 # mensajes perdidos que se reenvían por conexión
+POLL_INTERVAL = 1.0 # segundos entre lecturas de mensajes publicados por otros procesos
+POLL_BATCH = 1000
+
+# Sin autor (NULL) el mensaje es del sistema
+_SELECT_MENSAJES = '''
+    SELECT m.id, m.canal, coalesce(u.nombre || ' ' || u.primer_apellido, 'TRANSAVI') AS autor, m.cuerpo, m.creado
+    FROM mensajes m LEFT JOIN users u ON u.id = m.autor_id
+'''
+
+
+def canal_usuario(user_id):
+    return f'u:{user_id}'
+
+
+def canales_de(user_id):
+    """Canales que recibe un usuario."""
+    return (CANAL_TODOS, canal_usuario(user_id))
+
+
+def encode_event(row):
+    """Evento SSE listo para enviar. Se arma una sola vez por mensaje, no por suscriptor."""
+    data = json.dumps({
+        'id': row['id'], 'canal': row['canal'], 'autor': row['autor'],
+        'cuerpo': row['cuerpo'], 'creado': row['creado'],
+    }, ensure_ascii=False)
+    return f"id: {row['id']}\nevent: mensaje\ndata: {data}\n\n".encode('utf-8')
+
+
+# =======================================================
+# BROKER
+# =======================================================
+
+class LoopEvent:
+    """Event de asyncio que el hilo del broker puede activar (modo ASGI)."""
+
+    __slots__ = ('loop', 'event')
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.event = asyncio.Event()
+
+    def set(self):
+        # Si ya está activo no hace falta otro salto al bucle (leerlo desde otro hilo
+        # a lo sumo agenda un set() de más)
+        if not self.event.is_set():
+            try:
+                self.loop.call_soon_threadsafe(self.event.set)
+            except RuntimeError:
+                pass # El bucle ya se cerró: la conexión no sigue esperando
+
+    def clear(self):
+        self.event.clear()
+
+    async def wait(self, timeout):
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except TimeoutError:
+            return False
+        return True
+
+
+class Subscriber:
+    """Una conexión SSE: cola acotada de (id, evento) y un Event para despertarla."""
+
+    __slots__ = ('channels', 'queue', 'ready', 'overflow', 'max_pending')
+
+    def __init__(self, channels, max_pending=SSE_MAX_PENDING, ready=None):
+        self.channels = tuple(channels)
+        self.queue = deque()
+        self.ready = ready or threading.Event()
+        self.overflow = False
+        self.max_pending = max_pending
+
+    def push(self, message_id, event):
+        if len(self.queue) >= self.max_pending:
+            self.overflow = True # El stream lo cierra; el cliente se pone al día desde la BD
+        else:
+            self.queue.append((message_id, event))
+        self.ready.set()
+
+    def drain(self):
+        items = []
+        while self.queue:
+            items.append(self.queue.popleft())
+        return items
+
+
+class Broker:
+    """Reparte los mensajes nuevos de la BD a los suscriptores de este proceso."""
+
+    def __init__(self, poll_interval=POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.channels = {} # canal -> set de Subscriber
+        self.subscribers = 0
+        self.last_id = None # Último mensaje repartido (None: el hilo está ocioso)
+        self.dropped = 0 # Suscriptores cortados por lentos
+        self.wakeup = threading.Event()
+        self._thread = None
+
+    def subscribe(self, channels, max_pending=SSE_MAX_PENDING, ready=None):
+        subscriber = Subscriber(channels, max_pending, ready)
+        with self.lock:
+            if self.last_id is None:
+                # Sin suscriptores no se consulta nada; se retoma desde el último mensaje actual
+                self.last_id = _max_id()
+            for channel in subscriber.channels:
+                self.channels.setdefault(channel, set()).add(subscriber)
+            self.subscribers += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='mensajes-broker', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            for channel in subscriber.channels:
+                members = self.channels.get(channel)
+                if members is not None:
+                    members.discard(subscriber)
+                    if not members:
+                        del self.channels[channel]
+            self.subscribers -= 1
+            if subscriber.overflow:
+                self.dropped += 1
+
+    def notify(self):
+        """Despierta al hilo de reparto (se llama al publicar en este proceso)."""
+        self.wakeup.set()
+
+    def deliver(self, rows):
+        """Copia cada mensaje a las colas de los suscriptores de su canal."""
+        for row in rows:
+            event = encode_event(row)
+            with self.lock:
+                members = list(self.channels.get(row['canal'], ()))
+            for subscriber in members:
+                subscriber.push(row['id'], event)
+
+    def poll(self, conn):
+        with self.lock:
+            if not self.subscribers:
+                self.last_id = None
+                return 0
+            last_id = self.last_id
+        rows = conn.execute(_SELECT_MENSAJES + ' WHERE m.id > ? ORDER BY m.id LIMIT ?', (last_id, POLL_BATCH)).fetchall()
+        if rows:
+            self.deliver(rows)
+            with self.lock:
+                self.last_id = max(self.last_id or 0, rows[-1]['id'])
+        return len(rows)
+
+    def _run(self):
+        conn = config.open_db_connection() # Conexión propia del hilo, fuera de cualquier petición
+        while True:
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+            try:
+                while self.poll(conn) == POLL_BATCH:
+                    pass
+            except sqlite3.Error as e:
+                print(f"Error al repartir mensajes: {e}")
+
+    def stats(self):
+        with self.lock:
+            return {'subscribers': self.subscribers, 'channels': len(self.channels), 'dropped': self.dropped}
+
+
+broker = Broker()
+
+
+def _max_id():
+    conn = config.open_db_connection()
+    try:
+        return conn.execute('SELECT coalesce(max(id), 0) FROM mensajes').fetchone()[0]
+    finally:
+        conn.close()
+
+
+# =======================================================
+# PERSISTENCIA
+# =======================================================
+
+def publicar(autor_id, canal, cuerpo):
+    """Guarda un mensaje y lo reparte. Retorna su id, o un código de error."""
+    cuerpo = (cuerpo or '').strip()
+    if not cuerpo:
+        return 'empty'
+    if len(cuerpo) > MENSAJE_MAX_LENGTH:
+        return 'too_long'
+    conn = config.get_db_connection()
+    try:
+        cursor = conn.execute('INSERT INTO mensajes (canal, autor_id, cuerpo) VALUES (?, ?, ?)', (canal, autor_id, cuerpo))
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Error al publicar mensaje en '{canal}': {e}")
+        return 'general_error'
+    broker.notify()
+    return cursor.lastrowid
+
+
+def recientes(user_id, limit=MENSAJES_PAGE_SIZE):
+    """Últimos mensajes del usuario, del más viejo al más nuevo."""
+    rows = config.get_db_connection().execute(
+        _SELECT_MENSAJES + ' WHERE m.canal IN (?, ?) ORDER BY m.id DESC LIMIT ?',
+        canales_de(user_id) + (limit,)
+    ).fetchall()
+    return [dict(row) for row in reversed(rows)]
+
+
+def perdidos(user_id, after_id, limit=SSE_REPLAY_LIMIT):
+    """Mensajes posteriores a `after_id` (reanudación con Last-Event-ID)."""
+    return config.get_db_connection().execute(
+        _SELECT_MENSAJES + ' WHERE m.canal IN (?, ?) AND m.id > ? ORDER BY m.id LIMIT ?',
+        canales_de(user_id) + (after_id, limit)
+    ).fetchall()
+
+
+# =======================================================
+# STREAM SSE
+# =======================================================
+
+def open_stream(user_id, after_id, heartbeat=None, lifetime=None, loop=None):
+    """Suscribe al usuario y retorna el generador del stream SSE.
+
+    Se llama dentro de la petición (consulta los mensajes perdidos); el generador ya no
+    toca la BD ni la sesión mientras la conexión está abierta. Con `loop` (modo ASGI)
+    retorna un generador asíncrono que espera en ese bucle de eventos.
+    """
+    # Primero la suscripción y después la consulta: lo publicado entremedio llega por
+    # las dos vías y se descarta el duplicado por id
+    subscriber = broker.subscribe(canales_de(user_id), ready=LoopEvent(loop) if loop is not None else None)
+    try:
+        replay = perdidos(user_id, after_id) if after_id is not None else []
+    except Exception:
+        broker.unsubscribe(subscriber)
+        raise
+    heartbeat = heartbeat or SSE_HEARTBEAT
+    lifetime = lifetime or SSE_MAX_LIFETIME
+    last_sent = replay[-1]['id'] if replay else (after_id or 0)
+    first = f'retry: {SSE_RETRY_MS}\n\n'.encode('utf-8') + b''.join(encode_event(row) for row in replay)
+    complete = len(replay) < SSE_REPLAY_LIMIT # Si no, el cliente se reconecta con el último id y sigue
+
+    def take():
+        """Lo acumulado en la cola, sin duplicados; None si hay que cortar al cliente lento."""
+        nonlocal last_sent
+        subscriber.ready.clear()
+        if subscriber.overflow:
+            return None # Que se reconecte y se ponga al día desde la BD
+        # Llegan en orden de id: basta comparar con el último enviado
+        items = [(message_id, event) for message_id, event in subscriber.drain() if message_id > last_sent]
+        if items:
+            last_sent = items[-1][0]
+        return b''.join(event for _, event in items)
+
+    def generate():
+        try:
+            yield first
+            deadline = time.monotonic() + lifetime
+            while complete and time.monotonic() < deadline:
+                if not subscriber.ready.wait(heartbeat):
+                    yield b': ping\n\n'
+                    continue
+                time.sleep(SSE_BATCH_WINDOW) # Juntar la ráfaga en una sola escritura
+                chunk = take()
+                if chunk is None:
+                    return
+                if chunk:
+                    yield chunk
+        finally:
+            broker.unsubscribe(subscriber)
+
+    async def generate_async():
+        try:
+            yield first
+            deadline = time.monotonic() + lifetime
+            while complete and time.monotonic() < deadline:
+                if not await subscriber.ready.wait(heartbeat):
+                    yield b': ping\n\n'
+                    continue
+                await asyncio.sleep(SSE_BATCH_WINDOW)
+                chunk = take()
+                if chunk is None:
+                    return
+                if chunk:
+                    yield chunk
+        finally:
+            broker.unsubscribe(subscriber)
+
+    return generate_async() if loop is not None else generate()
+
+
+def broker_gauges():
+    stats = broker.stats()
+    return (
+        ('transavi_sse_subscribers', 'Conexiones SSE abiertas en este proceso.', stats['subscribers']),
+        ('transavi_sse_dropped_total', 'Conexiones SSE cortadas por clientes lentos.', stats['dropped']),
+    )
@@ -0,0 +1,204 @@
+# metrics.py
+"""Instrumentación por petición y endpoint /metrics (formato de texto de Prometheus).
+
+Por cada ruta se mide la latencia total, el tiempo en SQLite y el número de consultas,
+el tiempo esperando el hashing de contraseñas y el tiempo de render de plantillas.
+Todo termina en histogramas de buckets fijos: observar un valor es un bisect y un
+incremento bajo un lock, sin listas que crezcan con el tráfico.
+
+/metrics no es público: responde 404 salvo a las redes de METRICS_ALLOW (por defecto
+solo localhost) o a quien envíe `Authorization: Bearer <METRICS_TOKEN>`. Con ProxyFix
+tanto el cliente como la conexión real deben estar en METRICS_ALLOW: un X-Forwarded-For
+inventado no basta.
+"""
+import bisect
+import hmac
+import ipaddress
+import threading
+import time
+
+from flask import Response, abort, before_render_template, request, template_rendered
+
+METRICS_ALLOW = ('127.0.0.1/32', '::1/128')
+
+# Buckets (en segundos) compartidos por todos los histogramas de tiempo.
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+METRICS = {
+    'request': ('transavi_request_duration_seconds', 'Latencia total de la petición.', TIME_BUCKETS),
+    'db': ('transavi_db_duration_seconds', 'Tiempo en SQLite por petición.', TIME_BUCKETS),
+    'queries': ('transavi_db_queries', 'Consultas SQLite por petición.', QUERY_BUCKETS),
+    'hash': ('transavi_password_hash_duration_seconds', 'Tiempo de hashing de contraseñas por petición.', TIME_BUCKETS),
+    'template': ('transavi_template_render_duration_seconds', 'Tiempo de render de plantillas por petición.', TIME_BUCKETS),
+}
+
+
+class Histogram:
+    """Histograma acumulativo de buckets fijos."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # el último es +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+_registry = {} # (métrica, endpoint) -> Histogram
+_status_counts = {} # (endpoint, método, status) -> total
+_registry_lock = threading.Lock()
+
+# Acumuladores de la petición en curso (uno por hilo que atiende peticiones).
+_current = threading.local()
+
+
+def _histogram(metric, endpoint):
+    key = (metric, endpoint)
+    histogram = _registry.get(key)
+    if histogram is None:
+        with _registry_lock:
+            histogram = _registry.setdefault(key, Histogram(METRICS[metric][2]))
+    return histogram
+
+
+def _add(name, seconds):
+    timings = getattr(_current, 'timings', None)
+    if timings is not None:
+        timings[name] += seconds
+        if name == 'db':
+            timings['queries'] += 1
+
+
+def record_db(seconds):
+    """Suma el tiempo de una consulta SQLite a la petición en curso (si la hay)."""
+    _add('db', seconds)
+
+
+def record_hash(seconds):
+    """Suma el tiempo esperando un hash/verificación de contraseña a la petición en curso."""
+    _add('hash', seconds)
+
+
+def snapshot():
+    """Retorna {(métrica, endpoint): (count, sum)} para comparar antes/después (benchmarks)."""
+    with _registry_lock:
+        items = list(_registry.items())
+    return {key: (histogram.count, histogram.sum) for key, histogram in items}
+
+
+def render_prometheus(extra_gauges=()):
+    """Serializa todo el registro en el formato de texto de Prometheus."""
+    lines = []
+    with _registry_lock:
+        items = sorted(_registry.items())
+        status_counts = sorted(_status_counts.items())
+    described = set()
+    for (metric, endpoint), histogram in items:
+        name, help_text, buckets = METRICS[metric]
+        if metric not in described:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            described.add(metric)
+        with histogram._lock:
+            counts, total, count = list(histogram.counts), histogram.sum, histogram.count
+        cumulative = 0
+        for bound, bucket_count in zip(buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="+Inf"}} {count}')
+        lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {total}')
+        lines.append(f'{name}_count{{endpoint="{endpoint}"}} {count}')
+    lines.append('# HELP transavi_requests_total Peticiones atendidas por endpoint, método y status.')
+    lines.append('# TYPE transavi_requests_total counter')
+    for (endpoint, method, status), total in status_counts:
+        lines.append(f'transavi_requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {total}')
+    for name, help_text, value in extra_gauges:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def _start_request():
+    _current.start = time.perf_counter()
+    _current.template_start = None
+    _current.timings = {'db': 0.0, 'queries': 0, 'hash': 0.0, 'template': 0.0}
+
+
+def _before_render(sender, template, context, **extra):
+    if getattr(_current, 'timings', None) is not None:
+        _current.template_start = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    started = getattr(_current, 'template_start', None)
+    if started is not None:
+        _current.timings['template'] += time.perf_counter() - started
+        _current.template_start = None
+
+
+def _finish_request(response, server_timing=False):
+    timings = getattr(_current, 'timings', None)
+    if timings is None:
+        return response
+    _current.timings = None
+    total = time.perf_counter() - _current.start
+    endpoint = request.endpoint or 'unmatched'
+
+    _histogram('request', endpoint).observe(total)
+    for metric in ('db', 'queries', 'hash', 'template'):
+        _histogram(metric, endpoint).observe(timings[metric])
+    key = (endpoint, request.method, response.status_code)
+    with _registry_lock:
+        _status_counts[key] = _status_counts.get(key, 0) + 1
+
+    if server_timing:
+        response.headers['Server-Timing'] = ', '.join((
+            f'db;dur={timings["db"] * 1000:.2f};desc="{timings["queries"]} consultas"',
+            f'hash;dur={timings["hash"] * 1000:.2f}',
+            f'tpl;dur={timings["template"] * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ))
+    return response
+
+
+def _authorized(networks, token):
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    # La IP de la conexión, antes de que ProxyFix la reemplace por la de X-Forwarded-For
+    peer = request.environ.get('werkzeug.proxy_fix.orig', {}).get('REMOTE_ADDR', request.remote_addr)
+    try:
+        addresses = {ipaddress.ip_address(request.remote_addr or ''), ipaddress.ip_address(peer or '')}
+    except ValueError:
+        return False
+    return all(any(address in network for network in networks) for address in addresses)
+
+
+def init_app(app, extra_gauges=None):
+    """Registra los hooks de medición y la ruta /metrics.
+
+    `extra_gauges` es una función opcional que retorna tuplas (nombre, ayuda, valor)
+    para exponer contadores propios (p. ej. la caché de usuarios).
+    """
+    app.before_request(_start_request)
+    app.after_request(lambda response: _finish_request(response, app.config.get('SERVER_TIMING', False)))
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    allowed_networks = [ipaddress.ip_network(net) for net in app.config.get('METRICS_ALLOW', METRICS_ALLOW)]
+
+    @app.route('/metrics')
+    def metrics():
+        if not _authorized(allowed_networks, app.config.get('METRICS_TOKEN')):
+            abort(404) # Sin pistas de que el endpoint existe
+        gauges = extra_gauges() if extra_gauges else ()
+        return Response(render_prometheus(gauges), mimetype='text/plain; version=0.0.4')
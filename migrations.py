@@ -0,0 +1,297 @@
+# migrations.py
+"""Migraciones versionadas del esquema SQLite.
+
+La versión aplicada se guarda en `PRAGMA user_version`; cada entrada de MIGRATIONS es
+una versión (la posición 0 es la versión 1). Para cambiar el esquema se AGREGA una
+migración al final: nunca se editan las que ya se desplegaron.
+
+Uso antes de un despliegue:
+    flask --app app migrate          (o bien: python migrations.py)
+    flask --app app migrate --status
+"""
+import sys
+
+import click
+
+import config
+
+# Columnas del índice de búsqueda de usuarios (migración 6) y los valores que se indexan
+USERS_FTS_COLUMNS = 'nombre, primer_apellido, segundo_apellido, email, usuario, telefono'
+
+
+def users_fts_values(row):
+    """Expresiones SQL de los valores indexados para una fila ('NEW.', 'OLD.' o 'users.')."""
+    return (f"{row}nombre, {row}primer_apellido, coalesce({row}segundo_apellido, ''), "
+            f"substr({row}email, 1, instr({row}email, '@') - 1), {row}usuario, {row}telefono")
+
+
+MIGRATIONS = [
+    # 1. Esquema base de usuarios + índices para las búsquedas del login sin distinguir
+    #    mayúsculas (los UNIQUE ya indexan email/usuario/telefono de forma exacta).
+    ('usuarios e índices NOCASE de email/usuario', [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre TEXT NOT NULL,
+            primer_apellido TEXT NOT NULL,
+            segundo_apellido TEXT,
+            telefono TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            usuario TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_users_email_nocase ON users (email COLLATE NOCASE)',
+        'CREATE INDEX IF NOT EXISTS idx_users_usuario_nocase ON users (usuario COLLATE NOCASE)',
+    ]),
+    # 2. Contadores compartidos del limitador de login (backend 'sqlite' de throttle.py)
+    ('contadores del limitador de login', [
+        '''
+        CREATE TABLE IF NOT EXISTS login_throttle (
+            clave TEXT NOT NULL,
+            ventana INTEGER NOT NULL,
+            hits INTEGER NOT NULL,
+            PRIMARY KEY (clave, ventana)
+        ) WITHOUT ROWID
+        ''',
+    ]),
+    # 3. Solicitudes de servicio. El índice por usuario cubre todas las columnas del
+    #    historial (paginación por cursor sin tocar la tabla); el de estado/fecha sirve
+    #    a los listados de despacho ("pendientes de tal fecha").
+    ('solicitudes de servicio e índices del historial', [
+        '''
+        CREATE TABLE IF NOT EXISTS solicitudes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            tipo_servicio TEXT NOT NULL,
+            tipo_otro TEXT,
+            provincia_origen TEXT NOT NULL,
+            detalle_origen TEXT,
+            punto_encuentro TEXT,
+            provincia_destino TEXT NOT NULL,
+            detalle_destino TEXT,
+            fecha_inicio TEXT NOT NULL,
+            fecha_fin TEXT,
+            pasajeros INTEGER NOT NULL DEFAULT 1,
+            estado TEXT NOT NULL DEFAULT 'pendiente',
+            creada_en TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_solicitudes_usuario_fecha
+        ON solicitudes (user_id, fecha_inicio, id, estado, tipo_servicio, provincia_origen, provincia_destino)
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_solicitudes_estado_fecha ON solicitudes (estado, fecha_inicio)',
+    ]),
+    # 4. Vehículos de colaboradores y sus reservas. Los triggers anotan cada cambio en
+    #    asignacion_log para que el índice en memoria de asignacion.py se sincronice
+    #    leyendo solo lo nuevo (seq > último visto) en vez de recargar todo.
+    ('vehículos, reservas y bitácora de cambios para la asignación', [
+        '''
+        CREATE TABLE IF NOT EXISTS vehiculos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER REFERENCES users (id) ON DELETE SET NULL,
+            tipo_vehiculo TEXT NOT NULL,
+            marca TEXT,
+            capacidad INTEGER NOT NULL,
+            provincia TEXT NOT NULL,
+            activo INTEGER NOT NULL DEFAULT 1
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS reservas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            vehiculo_id INTEGER NOT NULL REFERENCES vehiculos (id) ON DELETE CASCADE,
+            solicitud_id INTEGER UNIQUE REFERENCES solicitudes (id) ON DELETE CASCADE,
+            inicio TEXT NOT NULL,
+            fin TEXT NOT NULL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_reservas_vehiculo_inicio ON reservas (vehiculo_id, inicio)',
+        '''
+        CREATE TABLE IF NOT EXISTS asignacion_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            tabla TEXT NOT NULL,
+            fila_id INTEGER NOT NULL,
+            creado REAL NOT NULL DEFAULT (julianday('now'))
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_asignacion_log_creado ON asignacion_log (creado)',
+    ] + [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_{tabla}_{evento.lower()} AFTER {evento} ON {tabla}
+        BEGIN
+            INSERT INTO asignacion_log (tabla, fila_id) VALUES ('{tabla}', {fila}.id);
+        END
+        '''
+        for tabla in ('vehiculos', 'reservas')
+        for evento, fila in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD'))
+    ]),
+    # 5. Sesiones en el servidor (sessions.py): la cookie solo lleva el id. Los índices
+    #    sirven a "cerrar todas las sesiones del usuario" y a la limpieza de vencidas.
+    ('sesiones en el servidor', [
+        '''
+        CREATE TABLE IF NOT EXISTS sesiones (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            datos TEXT NOT NULL,
+            expira REAL NOT NULL
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_sesiones_user_id ON sesiones (user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_sesiones_expira ON sesiones (expira)',
+    ]),
+    # 6. Búsqueda de usuarios para administradores (busqueda.py). users_fts es un índice
+    #    FTS5 "contentless" (no duplica los datos, solo guarda los términos) con índices de
+    #    prefijo de 2 a 8 caracteres para el autocompletado: sin ellos, un prefijo como
+    #    "rodr" obliga a FTS5 a fusionar las listas de todos los términos que empiezan así
+    #    (decenas de ms con un millón de usuarios; con ellos, menos de 1 ms, a cambio de
+    #    unos 250 bytes por usuario). Del email solo se indexa la parte antes de la '@': el
+    #    dominio lo comparten casi todos. Los triggers lo mantienen al día con cada
+    #    INSERT/UPDATE/DELETE de users (cambiar solo la contraseña no lo toca).
+    ('rol de administrador e índice de búsqueda de usuarios', [
+        'ALTER TABLE users ADD COLUMN es_admin INTEGER NOT NULL DEFAULT 0',
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5 (
+            nombre, primer_apellido, segundo_apellido, email, usuario, telefono,
+            content = '', tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4 5 6 7 8'
+        )
+        ''',
+        f'''
+        INSERT INTO users_fts (rowid, {USERS_FTS_COLUMNS})
+        SELECT id, {users_fts_values('users.')} FROM users
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_insert AFTER INSERT ON users
+        BEGIN
+            INSERT INTO users_fts (rowid, {USERS_FTS_COLUMNS}) VALUES (NEW.id, {users_fts_values('NEW.')});
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_delete AFTER DELETE ON users
+        BEGIN
+            INSERT INTO users_fts (users_fts, rowid, {USERS_FTS_COLUMNS}) VALUES ('delete', OLD.id, {users_fts_values('OLD.')});
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_users_fts_update
+        AFTER UPDATE OF nombre, primer_apellido, segundo_apellido, email, usuario, telefono ON users
+        BEGIN
+            INSERT INTO users_fts (users_fts, rowid, {USERS_FTS_COLUMNS}) VALUES ('delete', OLD.id, {users_fts_values('OLD.')});
+            INSERT INTO users_fts (rowid, {USERS_FTS_COLUMNS}) VALUES (NEW.id, {users_fts_values('NEW.')});
+        END
+        ''',
+    ]),
+    # 7. Fotos subidas (fotos.py). `archivos` tiene una fila por contenido distinto (la
+    #    clave es el sha256, igual que el nombre en disco) y `fotos` una por subida; el
+    #    índice del estado sirve a la recuperación de variantes pendientes.
+    ('fotos subidas y archivos por contenido', [
+        '''
+        CREATE TABLE IF NOT EXISTS archivos (
+            sha256 TEXT PRIMARY KEY,
+            ext TEXT NOT NULL,
+            bytes INTEGER NOT NULL,
+            ancho INTEGER,
+            alto INTEGER,
+            estado TEXT NOT NULL DEFAULT 'pendiente',
+            creado_en TEXT NOT NULL DEFAULT (datetime('now'))
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_archivos_estado ON archivos (estado)',
+        '''
+        CREATE TABLE IF NOT EXISTS fotos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            sha256 TEXT NOT NULL REFERENCES archivos (sha256),
+            nombre TEXT,
+            creada_en TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_fotos_usuario ON fotos (user_id, id)',
+        'CREATE INDEX IF NOT EXISTS idx_fotos_sha256 ON fotos (sha256)',
+    ]),
+    # 8. Mensajes en tiempo real (mensajes.py). El índice por canal sirve al historial y
+    #    a la reanudación con Last-Event-ID (canal IN (...) AND id > ?).
+    ('mensajes', [
+        '''
+        CREATE TABLE IF NOT EXISTS mensajes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            canal TEXT NOT NULL,
+            autor_id INTEGER REFERENCES users (id) ON DELETE SET NULL,
+            cuerpo TEXT NOT NULL,
+            creado TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_mensajes_canal_id ON mensajes (canal, id)',
+    ]),
+]
+
+LATEST_VERSION = len(MIGRATIONS)
+
+# Mientras un proceso migra, los demás esperan el lock en vez de fallar a los 5 s.
+MIGRATION_LOCK_TIMEOUT_MS = 10 * 60 * 1000
+
+
+def current_version(conn=None):
+    conn = conn or config.get_db_connection()
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(verbose=True):
+    """Aplica las migraciones pendientes y retorna la versión final.
+
+    Todo corre en una única transacción con BEGIN IMMEDIATE: un solo proceso escribe
+    a la vez y los demás, al obtener el lock, vuelven a leer la versión y no repiten nada.
+    """
+    conn = config.open_db_connection()
+    conn.isolation_level = None # Transacciones manuales
+    try:
+        conn.execute(f'PRAGMA busy_timeout = {MIGRATION_LOCK_TIMEOUT_MS}')
+        conn.execute('BEGIN IMMEDIATE')
+        version = current_version(conn)
+        try:
+            for number, (description, statements) in enumerate(MIGRATIONS[version:], start=version + 1):
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {number}')
+                if verbose:
+                    print(f"Migración {number} aplicada: {description}.")
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return max(version, LATEST_VERSION)
+    finally:
+        conn.close()
+
+
+def ensure_schema():
+    """Chequeo rápido para el arranque: un solo PRAGMA si el esquema ya está al día."""
+    if current_version() >= LATEST_VERSION:
+        return LATEST_VERSION
+    version = migrate()
+    print(f"Base de datos '{config.DATABASE}' migrada a la versión {version}.")
+    return version
+
+
+def init_app(app):
+    """Registra el comando `flask migrate`."""
+
+    @app.cli.command('migrate')
+    @click.option('--status', is_flag=True, help='Solo muestra la versión actual del esquema.')
+    def migrate_command(status):
+        """Aplica las migraciones pendientes de la base de datos."""
+        version = current_version()
+        if status:
+            click.echo(f'Esquema en la versión {version} de {LATEST_VERSION}.')
+            return
+        if version >= LATEST_VERSION:
+            click.echo(f'Nada que migrar (versión {version}).')
+            return
+        click.echo(f'Esquema migrado a la versión {migrate()}.')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        config.DATABASE = sys.argv[1]
+    print(f'Esquema en la versión {migrate()} de {LATEST_VERSION}.')
@@ -0,0 +1,113 @@
+# page_cache.py
+"""Caché de páginas públicas para visitantes anónimos + GET condicional (ETag / 304).
+
+Para un visitante sin sesión (y sin mensajes flash pendientes) las páginas públicas
+son idénticas, así que el HTML se renderiza una vez y se reutiliza. La clave incluye
+una "versión de contenido" (mtimes de las plantillas y del manifest de assets): si un
+despliegue cambia una plantilla, las entradas anteriores dejan de coincidir solas.
+
+Las respuestas con sesión o flashes van con `Cache-Control: private, no-store`: ni el
+navegador ni el service worker (service-worker.js) deben guardarlas como la página pública.
+"""
+import hashlib
+import os
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+
+import assets
+from cache import LRUCache
+
+PAGE_CACHE_SIZE = 256 # páginas (cada una pesa unos pocos KB)
+PAGE_CACHE_TTL = 600 # segundos
+CONTENT_VERSION_TTL = 1 # segundos entre chequeos de la versión de contenido (stat de plantillas)
+
+page_cache = LRUCache(maxsize=PAGE_CACHE_SIZE, ttl=PAGE_CACHE_TTL)
+_version = {'value': None, 'expires': 0.0}
+
+
+def content_version(app=None):
+    """Huella de las plantillas y del build de assets (cambia en cada despliegue que los toque)."""
+    app = app or current_app
+    folder = os.path.join(app.root_path, app.template_folder)
+    digest = hashlib.sha1()
+    with os.scandir(folder) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            if entry.is_file():
+                stat = entry.stat()
+                digest.update(f'{entry.name}:{stat.st_mtime_ns}:{stat.st_size};'.encode())
+    if os.path.exists(assets.MANIFEST_PATH):
+        digest.update(str(os.path.getmtime(assets.MANIFEST_PATH)).encode())
+    return digest.hexdigest()[:16]
+
+
+def current_version():
+    """content_version(), recalculada como mucho una vez por CONTENT_VERSION_TTL: va en la
+    clave de cada página y fragmento en caché y no se puede pagar un scandir por petición."""
+    now = time.monotonic()
+    if now >= _version['expires']:
+        _version['value'] = content_version()
+        _version['expires'] = now + CONTENT_VERSION_TTL
+    return _version['value']
+
+
+def expire_version():
+    """Fuerza a recalcular la versión en la próxima petición."""
+    _version['expires'] = 0.0
+
+
+def is_anonymous():
+    """Sin login y sin mensajes flash pendientes (que harían distinta la página)."""
+    return not session.get('logged_in') and '_flashes' not in session
+
+
+def _personal(response):
+    response.cache_control.private = True
+    response.cache_control.no_store = True
+    return response
+
+
+def cached_page(view):
+    """Decorador: sirve la vista desde la caché a los anónimos y responde 304 si no cambió."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'GET':
+            return view(*args, **kwargs)
+        if not is_anonymous():
+            return _personal(make_response(view(*args, **kwargs)))
+        if not current_app.config.get('PAGE_CACHE_ENABLED', True):
+            return view(*args, **kwargs)
+
+        # Solo la ruta: estas páginas no usan parámetros y así nadie llena la caché con ?x=1,2,3...
+        key = (request.path, current_version())
+        entry = page_cache.get(key)
+        if entry is None:
+            response = make_response(view(*args, **kwargs))
+            if not is_anonymous(): # La vista dejó un flash
+                return _personal(response)
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            entry = {
+                'body': body,
+                'mimetype': response.mimetype,
+                'etag': hashlib.sha1(body).hexdigest(),
+                'last_modified': datetime.now(timezone.utc).replace(microsecond=0),
+            }
+            page_cache.set(key, entry)
+
+        response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+        response.set_etag(entry['etag'])
+        response.last_modified = entry['last_modified']
+        # El navegador puede guardarla, pero debe revalidar (y recibirá un 304 barato)
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+    return wrapper
+
+
+def clear():
+    page_cache.clear()
+    expire_version()
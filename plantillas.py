@@ -0,0 +1,106 @@
+# plantillas.py
+"""Plantillas precompiladas y fragmentos del layout en caché.
+
+- Bytecode: Jinja guarda el código compilado de cada plantilla en TEMPLATE_CACHE_DIR
+  (por defecto instance/jinja). `flask build-templates` lo genera en el build y al
+  arrancar se cargan todas (TEMPLATE_WARMUP): el primer request de un worker nuevo ya
+  no compila nada, y si el bytecode falta o quedó viejo Jinja recompila esa plantilla.
+- Fragmentos: `{% cache 'navbar', session.logged_in %}...{% endcache %}` guarda el HTML
+  de una parte del layout que no depende del usuario. La clave es el nombre, los
+  argumentos (lo único que puede variar dentro del bloque), la raíz de la app y la
+  versión de contenido de page_cache.py (current_version): un despliegue que cambie plantillas o assets
+  no sirve fragmentos viejos. Los flashes y datos del usuario van fuera del bloque.
+"""
+import os
+import time
+
+import click
+from flask import current_app, request
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from cache import LRUCache
+from page_cache import current_version, expire_version
+
+FRAGMENT_CACHE_SIZE = 256
+FRAGMENT_CACHE_TTL = 3600 # segundos
+TEMPLATE_EXTENSIONS = ('.html', '.js')
+TEMPLATE_CACHE_DIR = None # None = <instance>/jinja (se usa si la app no configura otro)
+
+# Icono de la cabecera de cada sección (base.html)
+PAGE_ICONS = {
+    'Mensajes': 'chatbubble-outline',
+    'Fotos': 'camera-outline',
+}
+DEFAULT_PAGE_ICON = 'settings-outline'
+
+fragment_cache = LRUCache(maxsize=FRAGMENT_CACHE_SIZE, ttl=FRAGMENT_CACHE_TTL)
+
+
+def page_icon(title):
+    """Nombre del ion-icon para la cabecera de la sección `title`."""
+    return PAGE_ICONS.get(title, DEFAULT_PAGE_ICON)
+
+
+class FragmentCacheExtension(Extension):
+    """Etiqueta `{% cache nombre[, arg, ...] %}...{% endcache %}`."""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', [nodes.List(args)]), [], [], body).set_lineno(lineno)
+
+    def _render(self, args, caller):
+        if not current_app.config.get('FRAGMENT_CACHE_ENABLED', True):
+            return caller()
+        key = (*args, request.script_root, current_version())
+        html = fragment_cache.get(key)
+        if html is None:
+            html = caller()
+            fragment_cache.set(key, html)
+        return html
+
+
+def template_names(app):
+    return [name for name in app.jinja_env.list_templates() if name.endswith(TEMPLATE_EXTENSIONS)]
+
+
+def warm(app):
+    """Carga todas las plantillas (del bytecode, o compilándolas y guardándolo). Retorna cuántas."""
+    names = template_names(app)
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def clear():
+    fragment_cache.clear()
+    expire_version()
+
+
+def init_app(app):
+    """Instala el bytecode en disco, la etiqueta {% cache %}, `page_icon` y `flask build-templates`."""
+    directory = app.config.get('TEMPLATE_CACHE_DIR') or TEMPLATE_CACHE_DIR or os.path.join(app.instance_path, 'jinja')
+    os.makedirs(directory, exist_ok=True)
+    bytecode_cache = FileSystemBytecodeCache(directory)
+    app.jinja_env.bytecode_cache = bytecode_cache
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.globals['page_icon'] = page_icon
+
+    @app.cli.command('build-templates')
+    def build_templates_command():
+        """Compila todas las plantillas y guarda su bytecode (TEMPLATE_CACHE_DIR)."""
+        bytecode_cache.clear()
+        if app.jinja_env.cache is not None:
+            app.jinja_env.cache.clear()
+        start = time.perf_counter()
+        count = warm(app)
+        click.echo(f'{count} plantillas compiladas en {(time.perf_counter() - start) * 1000:.0f} ms -> {directory}')
+
+    if app.config.get('TEMPLATE_WARMUP', True):
+        warm(app)
@@ -0,0 +1,269 @@
+# profiler.py
+"""Perfilado por muestreo de peticiones individuales, activable en producción.
+
+Una petición de auth_bp o main_bp se perfila si:
+- la envía un administrador con la cabecera `X-Profile: 1` (o `?_profile=1`), o
+- cae en la fracción PROFILE_SAMPLE_RATE del tráfico (0 = nunca).
+
+Mientras dura, un único hilo muestreador lee cada PROFILE_INTERVAL segundos la pila del
+hilo que la atiende (sys._current_frames) y cuenta pilas iguales: no instrumenta cada
+llamada como cProfile, así que el costo es de unas pocas decenas de microsegundos por
+muestra y la vista corre a su velocidad normal. Al terminar se escriben en PROFILE_DIR:
+
+- `<id>.folded`: pilas colapsadas ("a;b;c N"), para flamegraph.pl o speedscope.
+- `<id>.prof`: las mismas muestras en formato pstats (`python -m pstats`, snakeviz);
+  las "llamadas" son muestras y los tiempos, muestras por intervalo.
+- `<id>.json`: ruta, método, status, latencia y número de muestras.
+
+El id lleva la fecha, el endpoint y la latencia; la respuesta lo indica en la cabecera
+X-Profile-Id y /admin/perfiles lista las capturas recientes. Se guardan PROFILE_KEEP.
+"""
+import json
+import marshal
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import request, session
+
+import config
+
+PROFILE_INTERVAL = 0.005 # segundos entre muestras
+PROFILE_SAMPLE_RATE = 0.0 # fracción de peticiones perfiladas al azar
+PROFILE_MAX_ACTIVE = 4 # peticiones perfilándose a la vez (el resto sigue sin perfilar)
+PROFILE_KEEP = 200 # capturas que se conservan en disco
+PROFILE_HEADER = 'X-Profile'
+PROFILED_BLUEPRINTS = ('auth', 'main')
+MAX_STACK_DEPTH = 128
+
+# La pila se recorta desde aquí: lo de afuera (servidor WSGI, hilos) es igual en todas
+_DISPATCH_FUNCTION = 'full_dispatch_request'
+
+_current = threading.local()
+_dir = None
+
+
+class Capture:
+    """Muestras de una petición: pila (tupla de code objects, de afuera hacia adentro) -> veces."""
+
+    __slots__ = ('thread_id', 'stacks', 'samples')
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.stacks = Counter()
+        self.samples = 0
+
+    def add(self, frame):
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            stack.append(code)
+            if code.co_name == _DISPATCH_FUNCTION:
+                break
+            frame = frame.f_back
+        stack.reverse()
+        self.stacks[tuple(stack)] += 1
+        self.samples += 1
+
+
+class Sampler:
+    """Un hilo por proceso que muestrea los hilos con una captura activa."""
+
+    def __init__(self, interval=PROFILE_INTERVAL, max_active=PROFILE_MAX_ACTIVE):
+        self.interval = interval
+        self.max_active = max_active
+        self.lock = threading.Lock()
+        self.active = {} # id de hilo -> Capture
+        self.wakeup = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Empieza a muestrear el hilo actual. Retorna la captura, o None si ya hay demasiadas."""
+        capture = Capture(threading.get_ident())
+        with self.lock:
+            if len(self.active) >= self.max_active:
+                return None
+            self.active[capture.thread_id] = capture
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+                self._thread.start()
+        self.wakeup.set()
+        return capture
+
+    def stop(self, capture):
+        with self.lock:
+            self.active.pop(capture.thread_id, None)
+
+    def _run(self):
+        while True:
+            if not self.active:
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            time.sleep(self.interval)
+            with self.lock:
+                captures = list(self.active.values())
+            if not captures:
+                continue
+            frames = sys._current_frames()
+            for capture in captures:
+                frame = frames.get(capture.thread_id)
+                if frame is not None:
+                    capture.add(frame)
+
+
+sampler = Sampler()
+
+
+# =======================================================
+# FORMATOS DE SALIDA
+# =======================================================
+
+def _label(code):
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def collapsed(stacks):
+    """Líneas "marco;marco;marco N" (formato de flamegraph.pl), de más a menos muestras."""
+    return [f"{';'.join(_label(code) for code in stack)} {count}" for stack, count in stacks.most_common()]
+
+
+def pstats_dict(stacks, interval):
+    """Las muestras en el formato que lee pstats.Stats: {función: (cc, nc, tt, ct, callers)}."""
+    def key(code):
+        return (code.co_filename, code.co_firstlineno, code.co_name)
+
+    own, total, edges = Counter(), Counter(), {}
+    for stack, count in stacks.items():
+        if not stack:
+            continue
+        own[key(stack[-1])] += count
+        for function in {key(code) for code in stack}: # Recursión: una vez por muestra
+            total[function] += count
+        for caller, callee in {(key(a), key(b)) for a, b in zip(stack, stack[1:])}:
+            callers = edges.setdefault(callee, Counter())
+            callers[caller] += count
+    stats = {}
+    for function, count in total.items():
+        callers = {caller: (n, n, 0.0, n * interval) for caller, n in edges.get(function, {}).items()}
+        stats[function] = (count, count, own[function] * interval, count * interval, callers)
+    return stats
+
+
+def capture_id(endpoint, elapsed):
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+    return f'{stamp}_{endpoint or "unmatched"}_{elapsed * 1000:.0f}ms'
+
+
+def save(capture, meta, interval=PROFILE_INTERVAL):
+    """Escribe .folded, .prof y .json de la captura y borra las más viejas."""
+    base = os.path.join(_dir, meta['id'])
+    with open(base + '.folded', 'w', encoding='utf-8') as f:
+        f.write('\n'.join(collapsed(capture.stacks)) + '\n')
+    with open(base + '.prof', 'wb') as f:
+        marshal.dump(pstats_dict(capture.stacks, interval), f)
+    with open(base + '.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    _prune()
+
+
+def _prune(keep=None):
+    keep = PROFILE_KEEP if keep is None else keep
+    ids = sorted(name[:-5] for name in os.listdir(_dir) if name.endswith('.json'))
+    for old in ids[:-keep] if keep else ids:
+        for suffix in ('.json', '.folded', '.prof'):
+            try:
+                os.remove(os.path.join(_dir, old + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def recent(limit=50):
+    """Metadatos de las capturas más recientes (de cualquier proceso), la más nueva primero."""
+    items = []
+    for name in sorted((n for n in os.listdir(_dir) if n.endswith('.json')), reverse=True)[:limit]:
+        try:
+            with open(os.path.join(_dir, name), encoding='utf-8') as f:
+                items.append(json.load(f))
+        except (OSError, ValueError):
+            continue # Borrada o a medio escribir por otro proceso
+    return items
+
+
+def profile_dir():
+    return _dir
+
+
+# =======================================================
+# HOOKS DE LA PETICIÓN
+# =======================================================
+
+def _requested_by_admin():
+    if request.headers.get(PROFILE_HEADER) != '1' and request.args.get('_profile') != '1':
+        return False
+    return config.user_is_admin(session.get('user_id'))
+
+
+def _start_request():
+    _current.capture = None
+    if request.blueprint not in PROFILED_BLUEPRINTS:
+        return
+    if _requested_by_admin():
+        trigger = 'admin'
+    elif PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        trigger = 'muestreo'
+    else:
+        return
+    capture = sampler.start()
+    if capture is not None:
+        _current.capture, _current.trigger, _current.start = capture, trigger, time.perf_counter()
+
+
+def _finish_request(response):
+    capture = getattr(_current, 'capture', None)
+    if capture is None:
+        return response
+    _current.capture = None
+    elapsed = time.perf_counter() - _current.start
+    sampler.stop(capture)
+    meta = {
+        'id': capture_id(request.endpoint, elapsed),
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'ms': round(elapsed * 1000, 1),
+        'samples': capture.samples,
+        'interval_ms': sampler.interval * 1000,
+        'trigger': _current.trigger,
+        'creado': datetime.now().isoformat(timespec='seconds'),
+    }
+    response.headers['X-Profile-Id'] = meta['id']
+    # Se escribe después de enviar la respuesta: no suma a la latencia del cliente
+    response.call_on_close(lambda: save(capture, meta, sampler.interval))
+    return response
+
+
+def _teardown_request(exception=None):
+    capture = getattr(_current, 'capture', None)
+    if capture is not None: # La vista falló antes de after_request
+        sampler.stop(capture)
+        _current.capture = None
+
+
+def init_app(app):
+    """Registra los hooks de perfilado. Configuración: PROFILE_DIR, PROFILE_SAMPLE_RATE,
+    PROFILE_INTERVAL y PROFILE_KEEP."""
+    global _dir, PROFILE_SAMPLE_RATE, PROFILE_KEEP
+    _dir = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'perfiles')
+    os.makedirs(_dir, exist_ok=True)
+    PROFILE_SAMPLE_RATE = app.config.get('PROFILE_SAMPLE_RATE', PROFILE_SAMPLE_RATE)
+    PROFILE_KEEP = app.config.get('PROFILE_KEEP', PROFILE_KEEP)
+    sampler.interval = app.config.get('PROFILE_INTERVAL', sampler.interval)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,119 @@
+# pwa.py
+"""Service worker generado por Flask con un precache calculado de los archivos reales.
+
+La lista de precache sale del manifest de assets (URLs con hash), de los estáticos que
+sí existen (con el hash de su contenido como revisión) y de las páginas públicas (con
+el hash de las plantillas). La versión de la caché es el hash de esa lista: cambia sola
+en cada despliegue que modifique algo y nunca hay que subirla a mano.
+"""
+import hashlib
+import json
+import os
+
+from flask import current_app, render_template, url_for
+
+import assets
+import imagenes
+
+# Estáticos sin bundle que la app usa en todas las páginas.
+PRECACHE_STATIC = ['manifest.json', 'img/icon-192.png', 'img/icon-512.png', 'img/logo.png']
+
+# Páginas públicas: se precachean como las ve un anónimo y el service worker las sirve
+# desde la red (network-first); la copia guardada es solo para cuando no hay conexión.
+PUBLIC_ENDPOINTS = ['main.index', 'main.settings']
+
+# Rutas que nunca se cachean (datos privados o autenticación).
+NETWORK_ONLY_PREFIXES = ['/auth/', '/profile', '/change_password', '/update_profile_info', '/metrics',
+                         '/solicitudes', '/admin/', '/photos', '/messages']
+
+# Librerías de CDN: se cachean la primera vez que se usan (cache-first, versión fija en la URL).
+CDN_ORIGINS = ['https://unpkg.com', 'https://ajax.googleapis.com']
+
+_cache = {'key': None, 'value': None}
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def _templates_hash(folder):
+    digest = hashlib.sha256()
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path):
+            digest.update(name.encode())
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+def _watched_files(app):
+    """Archivos cuyo cambio invalida el precache (para recalcular solo cuando hace falta)."""
+    template_folder = os.path.join(app.root_path, app.template_folder)
+    files = [assets.MANIFEST_PATH]
+    files += [os.path.join(assets.STATIC_DIR, src) for sources in assets.BUNDLES.values() for src in sources]
+    files += [os.path.join(assets.STATIC_DIR, name) for name in PRECACHE_STATIC]
+    files += [os.path.join(template_folder, name) for name in os.listdir(template_folder)]
+    return files
+
+
+def _mtimes(files):
+    return tuple(os.path.getmtime(path) if os.path.exists(path) else 0 for path in files)
+
+
+def precache_entries(app):
+    """Retorna (entradas [{url, revision}], versión) para el service worker."""
+    key = _mtimes(_watched_files(app))
+    if _cache['key'] == key:
+        return _cache['value']
+
+    entries = []
+    manifest = assets.load_manifest()
+    for name, sources in assets.BUNDLES.items():
+        if name in manifest:
+            # El hash ya está en la URL: no hace falta revisión
+            entries.append({'url': url_for('asset', filename=manifest[name]), 'revision': None})
+        else:
+            for src in sources:
+                entries.append({
+                    'url': url_for('static', filename=src),
+                    'revision': _file_hash(os.path.join(assets.STATIC_DIR, src)),
+                })
+    for name in PRECACHE_STATIC:
+        variants = imagenes.precache_urls(name)
+        if variants is not None:
+            # Con `flask build-images` las páginas usan las variantes con hash, no el original
+            entries.extend({'url': url, 'revision': None} for url in variants)
+            continue
+        path = os.path.join(assets.STATIC_DIR, name)
+        if os.path.exists(path):
+            entries.append({'url': url_for('static', filename=name), 'revision': _file_hash(path)})
+
+    pages_revision = _templates_hash(os.path.join(app.root_path, app.template_folder))
+    for endpoint in PUBLIC_ENDPOINTS:
+        entries.append({'url': url_for(endpoint), 'revision': pages_revision})
+
+    version = hashlib.sha256(json.dumps(entries, sort_keys=True).encode()).hexdigest()[:12]
+    _cache['key'], _cache['value'] = key, (entries, version)
+    return entries, version
+
+
+def service_worker():
+    """Sirve el service worker desde la raíz para que controle todo el sitio."""
+    entries, version = precache_entries(current_app)
+    body = render_template(
+        'service-worker.js',
+        version=version,
+        precache=entries,
+        public_pages=[url_for(endpoint) for endpoint in PUBLIC_ENDPOINTS],
+        network_only=NETWORK_ONLY_PREFIXES,
+        cdn_origins=CDN_ORIGINS,
+        offline_page=url_for('main.index'),
+    )
+    # El navegador debe revisar siempre si hay una versión nueva del worker
+    return body, 200, {'Content-Type': 'text/javascript; charset=utf-8', 'Cache-Control': 'no-cache'}
+
+
+def init_app(app):
+    app.add_url_rule('/service-worker.js', 'service_worker', service_worker)
@@ -0,0 +1,282 @@
+# sessions.py
+"""Sesiones guardadas en el servidor: la cookie solo lleva un id opaco.
+
+Con la sesión de Flask por defecto todo el contenido (usuario, nombre, mensajes flash)
+viaja firmado en la cookie, se verifica y deserializa en cada petición y no hay forma de
+invalidarlo desde el servidor. Aquí la cookie es un id aleatorio de 43 caracteres y los
+datos viven en un almacén intercambiable:
+
+- MemorySessionStore: solo en memoria (un único proceso, p. ej. desarrollo)
+- SQLiteSessionStore: tabla `sesiones` (migración 5) con una capa LRU en memoria delante;
+  varios procesos comparten las sesiones
+
+Las sesiones vencidas se borran en bloque desde un hilo de limpieza, y
+`revoke_user_sessions(user_id)` cierra todas las sesiones de un usuario (p. ej. al
+cambiar la contraseña). Una sesión existente solo se actualiza, nunca se vuelve a
+insertar: si otro proceso la borró, el que tenía una copia en memoria no la revive.
+"""
+import re
+import secrets
+import threading
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SessionInterface
+
+import config
+from cache import LRUCache
+
+SESSION_IDLE_LIFETIME = 24 * 60 * 60 # segundos que dura en el servidor una sesión no permanente
+SESSION_MEMORY_SIZE = 10_000
+# Cuánto puede servir un proceso una sesión desde su memoria sin volver a la BD. Acota lo
+# que tarda una revocación hecha en OTRO proceso en hacerse efectiva en este.
+SESSION_MEMORY_TTL = 30
+SESSION_SWEEP_INTERVAL = 300
+
+_SID_RE = re.compile(r'^[A-Za-z0-9_-]{43}$') # secrets.token_urlsafe(32)
+
+serializer = TaggedJSONSerializer() # Mismo formato que la cookie de Flask (tuplas, bytes, fechas...)
+
+
+class ServerSession(SecureCookieSession):
+    """Sesión con id propio. Hereda el registro de `accessed` y `modified` de Flask."""
+
+    def __init__(self, initial=None, sid=None, expires=None):
+        super().__init__(initial)
+        self.new = sid is None
+        self.sid = sid or secrets.token_urlsafe(32)
+        self.expires = expires # Vencimiento guardado en el servidor (None si es nueva)
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Cambia el id conservando los datos (al iniciar sesión: evita la fijación de sesión)."""
+        if not self.new:
+            self.previous_sid = self.previous_sid or self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.new = True
+        self.modified = True
+
+
+# =======================================================
+# ALMACENES
+# =======================================================
+
+class MemorySessionStore:
+    """Sesiones en un LRU del proceso (se pierden al reiniciar; no se comparten)."""
+
+    def __init__(self, maxsize=SESSION_MEMORY_SIZE):
+        self.cache = LRUCache(maxsize=maxsize, ttl=SESSION_IDLE_LIFETIME)
+
+    def load(self, sid):
+        """Retorna (datos serializados, vencimiento) o None."""
+        entry = self.cache.get(sid)
+        if entry is None or entry[2] < time.time():
+            return None
+        return entry[0], entry[2]
+
+    def save(self, sid, payload, user_id, expires, new=False):
+        """Guarda la sesión. Retorna False si no es nueva y ya no existe (revocada o vencida)."""
+        if not new and self.load(sid) is None:
+            return False
+        self.cache.set(sid, (payload, user_id, expires), ttl=max(1, expires - time.time()))
+        return True
+
+    def delete(self, sid):
+        self.cache.pop(sid)
+
+    def delete_user(self, user_id):
+        return self.cache.discard_where(lambda sid, entry: entry[1] == user_id)
+
+    def purge_expired(self):
+        now = time.time()
+        return self.cache.discard_where(lambda sid, entry: entry[2] < now)
+
+
+class SQLiteSessionStore(MemorySessionStore):
+    """Tabla `sesiones` con el LRU de MemorySessionStore como capa de lectura."""
+
+    def __init__(self, maxsize=SESSION_MEMORY_SIZE, memory_ttl=SESSION_MEMORY_TTL):
+        super().__init__(maxsize)
+        self.cache.ttl = memory_ttl
+
+    def load(self, sid):
+        cached = super().load(sid)
+        if cached is not None:
+            return cached
+        generation = self.cache.generation
+        row = config.get_db_connection().execute(
+            'SELECT datos, user_id, expira FROM sesiones WHERE id = ? AND expira > ?', (sid, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        self.cache.set(sid, tuple(row), ttl=min(self.cache.ttl, max(1, row['expira'] - time.time())), generation=generation)
+        return row['datos'], row['expira']
+
+    def save(self, sid, payload, user_id, expires, new=False):
+        conn = config.get_db_connection()
+        if new:
+            conn.execute(
+                'INSERT INTO sesiones (id, user_id, datos, expira) VALUES (?, ?, ?, ?)',
+                (sid, user_id, payload, expires)
+            )
+        else:
+            # La copia en memoria puede ser de una sesión que otro proceso ya borró
+            updated = conn.execute(
+                'UPDATE sesiones SET user_id = ?, datos = ?, expira = ? WHERE id = ? AND expira > ?',
+                (user_id, payload, expires, sid, time.time())
+            ).rowcount
+            if not updated:
+                conn.rollback()
+                MemorySessionStore.delete(self, sid)
+                return False
+        conn.commit()
+        self.cache.set(sid, (payload, user_id, expires), ttl=min(self.cache.ttl, max(1, expires - time.time())))
+        return True
+
+    def delete(self, sid):
+        conn = config.get_db_connection()
+        conn.execute('DELETE FROM sesiones WHERE id = ?', (sid,))
+        conn.commit()
+        super().delete(sid)
+
+    def delete_user(self, user_id):
+        conn = config.get_db_connection()
+        count = conn.execute('DELETE FROM sesiones WHERE user_id = ?', (user_id,)).rowcount
+        conn.commit()
+        super().delete_user(user_id)
+        return count
+
+    def purge_expired(self):
+        # Conexión propia: corre en el hilo de limpieza, fuera de cualquier petición
+        conn = config.open_db_connection()
+        try:
+            count = conn.execute('DELETE FROM sesiones WHERE expira < ?', (time.time(),)).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        super().purge_expired()
+        return count
+
+
+# =======================================================
+# INTERFAZ PARA FLASK
+# =======================================================
+
+class ServerSessionInterface(SessionInterface):
+    session_class = ServerSession
+
+    def __init__(self, store):
+        self.store = store
+
+    def _lifetime(self, app, session):
+        if session.permanent:
+            return app.permanent_session_lifetime.total_seconds()
+        return app.config.get('SESSION_IDLE_LIFETIME', SESSION_IDLE_LIFETIME)
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid or not _SID_RE.match(sid):
+            return self.session_class()
+        stored = self.store.load(sid)
+        if stored is None:
+            return self.session_class() # Vencida o revocada: se empieza una nueva
+        payload, expires = stored
+        return self.session_class(serializer.loads(payload), sid=sid, expires=expires)
+
+    def _delete_cookie(self, app, response):
+        response.delete_cookie(self.get_cookie_name(app), domain=self.get_cookie_domain(app),
+                               path=self.get_cookie_path(app), secure=self.get_cookie_secure(app),
+                               samesite=self.get_cookie_samesite(app), httponly=self.get_cookie_httponly(app))
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain, path = self.get_cookie_domain(app), self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+
+        if not session:
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+            if session.modified:
+                self._delete_cookie(app, response)
+            return
+
+        lifetime = self._lifetime(app, session)
+        now = time.time()
+        # Sin cambios solo se escribe para extender una sesión a la que le queda menos de la mitad
+        refresh = session.expires is not None and session.expires - now < lifetime / 2
+        if not (session.modified or session.new or refresh):
+            return
+
+        expires = now + lifetime
+        if not self.store.save(session.sid, serializer.dumps(dict(session)), session.get('user_id'), expires, session.new):
+            # Revocada en otro proceso (logout, cambio de contraseña): no se recrea
+            self._delete_cookie(app, response)
+            return
+        if session.new or session.permanent:
+            response.set_cookie(
+                name, session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app),
+            )
+            response.vary.add('Cookie')
+
+
+# =======================================================
+# API
+# =======================================================
+
+_interface = None
+
+
+def regenerate(session):
+    """Nuevo id para la sesión actual (no hace nada con la sesión por cookie de Flask)."""
+    if isinstance(session, ServerSession):
+        session.regenerate()
+
+
+def end(session):
+    """Cierra la sesión actual: la vacía y le da un id nuevo, así el viejo se borra del
+    almacén y la copia que otro proceso tenga en memoria queda bajo un id que ya no se usa
+    (ni el login ni los flashes vuelven). Lo que se agregue después va en la sesión nueva."""
+    session.clear()
+    regenerate(session)
+
+
+def revoke_user_sessions(user_id):
+    """Cierra todas las sesiones del usuario en todos los dispositivos. Retorna cuántas."""
+    if _interface is None:
+        return 0
+    return _interface.store.delete_user(user_id)
+
+
+def _sweeper(store, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            store.purge_expired()
+        except Exception as e:
+            print(f"Error al limpiar sesiones vencidas: {e}")
+
+
+def init_app(app):
+    """Instala la sesión en servidor según SESSION_BACKEND ('sqlite', 'memory' o 'cookie')."""
+    global _interface
+    backend = app.config.get('SESSION_BACKEND', 'sqlite')
+    if backend == 'cookie':
+        return # Sesión firmada en la cookie, la de Flask por defecto
+    if backend == 'memory':
+        store = MemorySessionStore(app.config.get('SESSION_MEMORY_SIZE', SESSION_MEMORY_SIZE))
+    else:
+        store = SQLiteSessionStore(
+            app.config.get('SESSION_MEMORY_SIZE', SESSION_MEMORY_SIZE),
+            app.config.get('SESSION_MEMORY_TTL', SESSION_MEMORY_TTL),
+        )
+    _interface = ServerSessionInterface(store)
+    app.session_interface = _interface
+    interval = app.config.get('SESSION_SWEEP_INTERVAL', SESSION_SWEEP_INTERVAL)
+    threading.Thread(target=_sweeper, args=(store, interval), name='session-sweeper', daemon=True).start()
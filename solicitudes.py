@@ -0,0 +1,163 @@
+# solicitudes.py
+"""Solicitudes de servicio (viajes) y su historial paginado por cursor.
+
+El historial se pagina con "keyset": en vez de OFFSET (que lee y descarta todas las
+filas anteriores) el cursor guarda la (fecha_inicio, id) de la última fila mostrada y
+la siguiente página arranca justo ahí dentro del índice. Cuesta lo mismo la página 1
+que la 500, y el índice cubre todas las columnas del listado, así que ni siquiera se
+toca la tabla.
+"""
+import base64
+import sqlite3
+from datetime import datetime
+
+from config import get_db_connection
+
+TIPOS_SERVICIO = ['Empresa', 'Equipo Deportivo', 'Comparsa', 'Turismo', 'Senderismo', 'Otro']
+PROVINCIAS = ['San José', 'Alajuela', 'Cartago', 'Heredia', 'Guanacaste', 'Puntarenas', 'Limón']
+ESTADOS = ['pendiente', 'asignada', 'completada', 'cancelada']
+
+HISTORIAL_PAGE_SIZE = 20
+HISTORIAL_MAX_PAGE_SIZE = 100
+
+# Columnas del listado: todas están en idx_solicitudes_usuario_fecha (índice cubriente)
+_HISTORIAL_COLUMNS = 'id, fecha_inicio, estado, tipo_servicio, provincia_origen, provincia_destino'
+
+
+# =======================================================
+# CURSOR DE PAGINACIÓN
+# =======================================================
+
+def encode_cursor(fecha_inicio, solicitud_id):
+    """Cursor opaco (base64 URL-safe) con la posición de la última fila entregada."""
+    raw = f'{fecha_inicio}|{solicitud_id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Retorna (fecha_inicio, id). Lanza ValueError si el cursor no es válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        fecha_inicio, solicitud_id = raw.rsplit('|', 1)
+        return fecha_inicio, int(solicitud_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Cursor inválido') from e
+
+
+# =======================================================
+# VALIDACIÓN DEL FORMULARIO
+# =======================================================
+
+def parse_form(form):
+    """Valida el formulario de solicitud. Retorna (datos, None) o (None, mensaje de error)."""
+    tipo = form.get('tipo_servicio', '')
+    tipo_otro = form.get('tipo_otro', '').strip()
+    if tipo not in TIPOS_SERVICIO:
+        return None, 'Selecciona un tipo de servicio válido.'
+    if tipo == 'Otro' and not tipo_otro:
+        return None, 'Indica qué tipo de servicio requieres.'
+
+    origen = form.get('provincia_origen', '')
+    destino = form.get('provincia_destino', '')
+    if origen not in PROVINCIAS or destino not in PROVINCIAS:
+        return None, 'Selecciona las provincias de origen y destino.'
+
+    try:
+        inicio = datetime.strptime(f"{form.get('fecha_ida', '')} {form.get('hora_ida', '')}", '%Y-%m-%d %H:%M')
+    except ValueError:
+        return None, 'La fecha y la hora de la ida son obligatorias.'
+
+    fecha_fin = None
+    if form.get('solo_un_dia', 'si') == 'no':
+        try:
+            fin = datetime.strptime(form.get('fecha_regreso', ''), '%Y-%m-%d')
+        except ValueError:
+            return None, 'Indica la fecha del regreso.'
+        if fin.date() < inicio.date():
+            return None, 'La fecha del regreso no puede ser anterior a la de la ida.'
+        fecha_fin = fin.strftime('%Y-%m-%d')
+
+    try:
+        pasajeros = int(form.get('pasajeros') or 1)
+    except ValueError:
+        return None, 'La cantidad de pasajeros debe ser un número.'
+    if not 1 <= pasajeros <= 200:
+        return None, 'La cantidad de pasajeros debe estar entre 1 y 200.'
+
+    return {
+        'tipo_servicio': tipo,
+        'tipo_otro': tipo_otro if tipo == 'Otro' else None,
+        'provincia_origen': origen,
+        'detalle_origen': form.get('detalle_origen', '').strip(),
+        'punto_encuentro': form.get('punto_encuentro', '').strip(),
+        'provincia_destino': destino,
+        'detalle_destino': form.get('detalle_destino', '').strip(),
+        'fecha_inicio': inicio.strftime('%Y-%m-%d %H:%M'),
+        'fecha_fin': fecha_fin,
+        'pasajeros': pasajeros,
+    }, None
+
+
+# =======================================================
+# ACCESO A DATOS
+# =======================================================
+
+def create_solicitud(user_id, datos):
+    """Guarda una solicitud nueva (estado 'pendiente'). Retorna su id o None si falla."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute(
+            '''INSERT INTO solicitudes (user_id, tipo_servicio, tipo_otro, provincia_origen, detalle_origen,
+                                        punto_encuentro, provincia_destino, detalle_destino, fecha_inicio,
+                                        fecha_fin, pasajeros)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (user_id, datos['tipo_servicio'], datos['tipo_otro'], datos['provincia_origen'], datos['detalle_origen'],
+             datos['punto_encuentro'], datos['provincia_destino'], datos['detalle_destino'], datos['fecha_inicio'],
+             datos['fecha_fin'], datos['pasajeros'])
+        )
+        conn.commit()
+        return cursor.lastrowid
+    except sqlite3.Error as e:
+        print(f"Error al guardar la solicitud: {e}")
+        conn.rollback()
+        return None
+
+
+def get_solicitud(user_id, solicitud_id):
+    """Detalle de una solicitud del usuario (None si no existe o es de otro usuario)."""
+    row = get_db_connection().execute(
+        'SELECT * FROM solicitudes WHERE id = ? AND user_id = ?', (solicitud_id, user_id)
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def historial(user_id, cursor=None, limit=HISTORIAL_PAGE_SIZE):
+    """Una página del historial del usuario, de la fecha más reciente a la más antigua.
+
+    Retorna (filas, siguiente_cursor); siguiente_cursor es None en la última página.
+    Lanza ValueError si `cursor` no es válido.
+    """
+    limit = max(1, min(limit, HISTORIAL_MAX_PAGE_SIZE))
+    # Se pide una fila de más solo para saber si hay otra página
+    if cursor:
+        fecha_inicio, solicitud_id = decode_cursor(cursor)
+        rows = get_db_connection().execute(
+            f'''SELECT {_HISTORIAL_COLUMNS} FROM solicitudes
+                WHERE user_id = ? AND (fecha_inicio, id) < (?, ?)
+                ORDER BY fecha_inicio DESC, id DESC LIMIT ?''',
+            (user_id, fecha_inicio, solicitud_id, limit + 1)
+        ).fetchall()
+    else:
+        rows = get_db_connection().execute(
+            f'''SELECT {_HISTORIAL_COLUMNS} FROM solicitudes
+                WHERE user_id = ?
+                ORDER BY fecha_inicio DESC, id DESC LIMIT ?''',
+            (user_id, limit + 1)
+        ).fetchall()
+
+    page = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor(last['fecha_inicio'], last['id'])
+    return page, next_cursor
@@ -0,0 +1,83 @@
+// admin.js
+// Buscador de usuarios de administración: consulta /admin/usuarios/buscar mientras se
+// escribe (con debounce) y descarta las respuestas que ya no corresponden al texto actual.
+
+const BUSQUEDA_DELAY_MS = 200;
+
+function adminItem(user) {
+    const li = document.createElement("li");
+    li.className = "admin-item";
+    const campos = [
+        ["admin-nombre", `${user.nombre} ${user.primer_apellido} ${user.segundo_apellido || ""}`],
+        ["admin-usuario", `@${user.usuario}${user.es_admin ? " (admin)" : ""}`],
+        ["admin-contacto", `${user.email} · ${user.telefono}`],
+    ];
+    for (const [className, text] of campos) {
+        const span = document.createElement("span");
+        span.className = className;
+        span.textContent = text;
+        li.appendChild(span);
+    }
+    return li;
+}
+
+document.addEventListener("DOMContentLoaded", function() {
+    const form = document.getElementById("admin-busqueda");
+    if (!form) {
+        return;
+    }
+    const input = document.getElementById("q");
+    const lista = document.getElementById("admin-resultados");
+    const resumen = document.getElementById("admin-resumen");
+    const verMas = document.getElementById("admin-ver-mas");
+    let timer = null;
+    let controller = null;
+    let page = 1;
+
+    function buscar(nextPage) {
+        if (controller) {
+            controller.abort(); // Solo importa la respuesta a lo último que se escribió
+        }
+        const q = input.value.trim();
+        if (q.length < 2) {
+            lista.replaceChildren();
+            resumen.textContent = "";
+            verMas.style.display = "none";
+            return;
+        }
+        controller = new AbortController();
+        const params = new URLSearchParams({q: q, page: nextPage});
+        fetch(`${form.dataset.url}?${params}`, {credentials: "same-origin", signal: controller.signal})
+            .then((response) => {
+                if (!response.ok) {
+                    throw new Error(`La búsqueda respondió ${response.status}`);
+                }
+                return response.json();
+            })
+            .then((data) => {
+                page = data.page;
+                if (page === 1) {
+                    lista.replaceChildren();
+                }
+                data.items.forEach((user) => lista.appendChild(adminItem(user)));
+                resumen.textContent = `${data.total}${data.truncated ? "+" : ""} coincidencias`;
+                verMas.style.display = data.page * data.per_page < data.total ? "block" : "none";
+            })
+            .catch((err) => {
+                if (err.name !== "AbortError") {
+                    console.error(err);
+                }
+            });
+    }
+
+    input.addEventListener("input", () => {
+        clearTimeout(timer);
+        timer = setTimeout(() => buscar(1), BUSQUEDA_DELAY_MS);
+    });
+    form.addEventListener("submit", (event) => {
+        event.preventDefault();
+        clearTimeout(timer);
+        buscar(1);
+    });
+    verMas.addEventListener("click", () => buscar(page + 1));
+});
@@ -0,0 +1,98 @@
+// availability.js
+// Avisa mientras se escribe si el email, el usuario o el teléfono ya están registrados.
+// Espera a que se deje de escribir (debounce) y consulta todos los campos pendientes en
+// una sola petición a /auth/disponibilidad; las respuestas se recuerdan por valor.
+
+const AVAILABILITY_DELAY_MS = 350;
+
+const AVAILABILITY_FORMATS = {
+    email: /^[^\s@]+@[^\s@]+\.[^\s@]+$/,
+    usuario: /^[a-zA-Z0-9]{5,15}$/,
+    telefono: /^[0-9]{8}$/
+};
+
+const AVAILABILITY_MESSAGES = {
+    email: 'Este email ya está registrado.',
+    usuario: 'Este nombre de usuario ya está en uso.',
+    telefono: 'Este teléfono ya está registrado.'
+};
+
+// inputs: {email: <input>, usuario: <input>, telefono: <input>} (los que existan)
+// onChange(field, available) se llama cada vez que cambia el estado de un campo
+function createAvailabilityChecker(url, inputs, onChange) {
+    const known = new Map(); // "campo:valor" -> true/false
+    const pending = new Set();
+    const feedback = {};
+    let timer = null;
+    let controller = null;
+
+    function show(field, available) {
+        feedback[field].style.display = available ? 'none' : 'block';
+        onChange(field, available);
+    }
+
+    function flush() {
+        if (controller) {
+            controller.abort(); // Solo importa la respuesta a lo último que se escribió
+        }
+        controller = new AbortController();
+        const params = new URLSearchParams();
+        const requested = {};
+        pending.forEach((field) => {
+            requested[field] = inputs[field].value.trim();
+            params.append(field, requested[field]);
+        });
+        pending.clear();
+
+        fetch(`${url}?${params}`, {credentials: 'same-origin', signal: controller.signal})
+            .then((response) => response.ok ? response.json() : {}) // 429 u otro error: el servidor valida al enviar
+            .then((data) => {
+                Object.entries(requested).forEach(([field, value]) => {
+                    if (typeof data[field] !== 'boolean') {
+                        return;
+                    }
+                    known.set(`${field}:${value.toLowerCase()}`, data[field]);
+                    // El usuario pudo seguir escribiendo mientras llegaba la respuesta
+                    if (inputs[field].value.trim() === value) {
+                        show(field, data[field]);
+                    }
+                });
+            })
+            .catch((err) => {
+                if (err.name !== 'AbortError') {
+                    console.error(err);
+                }
+            });
+    }
+
+    function check(field) {
+        const value = inputs[field].value.trim();
+        show(field, true);
+        if (!AVAILABILITY_FORMATS[field].test(value)) {
+            return; // El formato lo valida cada formulario; no se consulta nada inválido
+        }
+        const cached = known.get(`${field}:${value.toLowerCase()}`);
+        if (cached !== undefined) {
+            show(field, cached);
+            return;
+        }
+        pending.add(field);
+        clearTimeout(timer);
+        timer = setTimeout(flush, AVAILABILITY_DELAY_MS);
+    }
+
+    Object.entries(inputs).forEach(([field, input]) => {
+        if (!input) {
+            return;
+        }
+        const message = document.createElement('small');
+        message.className = 'availability-feedback';
+        message.style.cssText = 'display: none; margin-top: 5px; font-size: 0.9em; color: #f44336;';
+        message.textContent = AVAILABILITY_MESSAGES[field];
+        input.insertAdjacentElement('afterend', message);
+        feedback[field] = message;
+        input.addEventListener('input', () => check(field));
+    });
+
+    return {check: check};
+}
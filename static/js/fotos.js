@@ -0,0 +1,78 @@
+// fotos.js
+// Subida de fotos con barra de progreso (XMLHttpRequest: fetch no informa el avance de
+// la subida) y las fotos nuevas al inicio de la galería sin recargar la página.
+
+function fotoItem(foto) {
+    const li = document.createElement("li");
+    li.className = "fotos-item";
+    const link = document.createElement("a");
+    link.href = foto.urls.media;
+    link.target = "_blank";
+    link.rel = "noopener";
+    const img = document.createElement("img");
+    img.src = foto.urls.mini; // Mientras se genera la miniatura el servidor redirige al original
+    img.alt = "Foto";
+    img.decoding = "async";
+    link.appendChild(img);
+    li.appendChild(link);
+    return li;
+}
+
+document.addEventListener("DOMContentLoaded", function() {
+    const form = document.getElementById("fotos-form");
+    if (!form) {
+        return;
+    }
+    const input = document.getElementById("fotos-input");
+    const progreso = document.getElementById("fotos-progreso");
+    const galeria = document.getElementById("fotos-galeria");
+    const boton = form.querySelector("button[type=submit]");
+
+    form.addEventListener("submit", (event) => {
+        event.preventDefault();
+        const xhr = new XMLHttpRequest();
+        xhr.open("POST", form.action);
+        xhr.setRequestHeader("Accept", "application/json");
+        xhr.upload.addEventListener("progress", (e) => {
+            if (e.lengthComputable) {
+                progreso.value = Math.round(e.loaded / e.total * 100);
+            }
+        });
+        xhr.addEventListener("loadend", () => {
+            boton.disabled = false;
+            progreso.style.display = "none";
+            let data = {fotos: [], errores: []};
+            try {
+                data = JSON.parse(xhr.responseText);
+            } catch (err) {
+                alert(xhr.status === 413 ? "La subida supera el tamaño máximo." : "No se pudieron subir las fotos.");
+                return;
+            }
+            if (data.error) {
+                // Subida rechazada entera (foto muy grande, demasiadas fotos, servidor ocupado)
+                alert(data.error);
+                return;
+            }
+            const vacio = galeria.querySelector(".fotos-vacio");
+            if (vacio && data.fotos.length) {
+                vacio.remove();
+            }
+            data.fotos.forEach((foto) => galeria.prepend(fotoItem(foto)));
+            if (data.errores.length) {
+                alert(data.errores.map((e) => `${e.nombre}: ${e.error}`).join("\n"));
+            }
+            form.reset();
+        });
+        boton.disabled = true;
+        progreso.value = 0;
+        progreso.style.display = "block";
+        xhr.send(new FormData(form));
+    });
+
+    input.addEventListener("change", () => {
+        const maximo = Number(input.dataset.maxBytes || 0);
+        if (maximo && Array.from(input.files).some((file) => file.size > maximo)) {
+            alert("Alguna foto supera el tamaño máximo.");
+        }
+    });
+});
@@ -0,0 +1,38 @@
+// mensajes.js
+// Recibe los mensajes nuevos por Server-Sent Events. Si la conexión se corta, EventSource
+// se reconecta solo y envía Last-Event-ID: el servidor reenvía lo que se perdió.
+
+function mensajeItem(mensaje) {
+    const li = document.createElement("li");
+    li.className = mensaje.canal === "todos" ? "mensaje-item mensaje-general" : "mensaje-item";
+    const campos = [
+        ["span", "mensaje-autor", mensaje.autor],
+        ["span", "mensaje-fecha", mensaje.creado],
+        ["p", "mensaje-cuerpo", mensaje.cuerpo],
+    ];
+    for (const [tag, className, text] of campos) {
+        const element = document.createElement(tag);
+        element.className = className;
+        element.textContent = text;
+        li.appendChild(element);
+    }
+    return li;
+}
+
+document.addEventListener("DOMContentLoaded", function() {
+    const lista = document.getElementById("mensajes-lista");
+    if (!lista || !window.EventSource) {
+        return; // Sin SSE la página igual muestra los mensajes al recargar
+    }
+    const source = new EventSource(lista.dataset.streamUrl);
+    source.addEventListener("mensaje", (event) => {
+        const vacio = lista.querySelector(".mensajes-vacio");
+        if (vacio) {
+            vacio.remove();
+        }
+        lista.appendChild(mensajeItem(JSON.parse(event.data)));
+        lista.lastElementChild.scrollIntoView({behavior: "smooth", block: "end"});
+    });
+    // Al salir de la página se cierra para liberar la conexión en el servidor
+    window.addEventListener("pagehide", () => source.close());
+});
@@ -0,0 +1,23 @@
+// perfil.js
+// Formulario "Editar Perfil": avisa si el nuevo email/usuario/teléfono ya es de otra cuenta.
+
+document.addEventListener('DOMContentLoaded', () => {
+    const form = document.getElementById('contactEditForm');
+    if (!form) {
+        return;
+    }
+    const submit = document.getElementById('contactEditSubmit');
+    const taken = new Set();
+    createAvailabilityChecker(form.dataset.availabilityUrl, {
+        email: document.getElementById('edit_email'),
+        usuario: document.getElementById('edit_usuario'),
+        telefono: document.getElementById('edit_telefono')
+    }, (field, available) => {
+        if (available) {
+            taken.delete(field);
+        } else {
+            taken.add(field);
+        }
+        submit.disabled = taken.size > 0;
+    });
+});
@@ -53,9 +53,10 @@ if ('serviceWorker' in navigator) {
     // Usamos window.addEventListener('load', ...) para asegurar que todos los recursos
     // de la página principal hayan cargado antes de intentar registrar el SW.
     window.addEventListener('load', () => {
-        // CORRECCIÓN CRÍTICA: Indicamos que el Service Worker debe controlar la raíz (scope: '/')
-        // Esto le da control sobre todas las páginas de la aplicación, como /index, /auth/login, etc.
-        navigator.serviceWorker.register('/static/service-worker.js', {scope: '/'}) 
+        // El Service Worker lo genera Flask en la raíz (/service-worker.js), así su scope '/'
+        // cubre todas las páginas de la aplicación, como /index, /auth/login, etc.
+        // Al registrarlo con el mismo scope reemplaza al antiguo /static/service-worker.js.
+        navigator.serviceWorker.register('/service-worker.js', {scope: '/'}) 
             .then(registration => {
                 console.log('Service Worker registrado con éxito. Scope:', registration.scope);
                 // Si la instalación funciona, el scope debe ser "http://localhost:5000/" (la raíz)
@@ -8,6 +8,13 @@ let validationState = {
     passwords: false
 };
 
+// Disponibilidad en el servidor (availability.js): false si ya lo usa otra cuenta
+let availabilityState = {
+    telefono: true,
+    email: true,
+    usuario: true
+};
+
 // El email es un caso especial por la asincronicidad, inicializarlo aparte.
 const emailInput = document.getElementById('email');
 const passwordFeedback = document.getElementById('password-feedback');
@@ -15,7 +22,7 @@ const passwordFeedback = document.getElementById('password-feedback');
 // Función para actualizar el estado del botón
 function updateButtonState() {
     const button = document.getElementById('register-button');
-    const isValid = Object.values(validationState).every(Boolean);
+    const isValid = Object.values(validationState).every(Boolean) && Object.values(availabilityState).every(Boolean);
     button.disabled = !isValid;
 }
 
@@ -136,6 +143,17 @@ function checkPasswords() {
 
 // Inicializar estado de validación al cargar la página
 document.addEventListener('DOMContentLoaded', () => {
+    // Verificar email/usuario/teléfono contra el servidor mientras se escriben
+    const form = document.querySelector('form[data-availability-url]');
+    const availability = createAvailabilityChecker(form.dataset.availabilityUrl, {
+        email: emailInput,
+        usuario: document.getElementById('usuario'),
+        telefono: document.getElementById('telefono')
+    }, (field, available) => {
+        availabilityState[field] = available;
+        updateButtonState();
+    });
+
     // Ejecutar validaciones iniciales si hay datos precargados (después de un error de Flask)
     validateName(document.getElementById('nombre'));
     validateName(document.getElementById('apellido1'));
@@ -146,5 +164,8 @@ document.addEventListener('DOMContentLoaded', () => {
     // Inicializa validación de email si tiene valor
     emailInput.dispatchEvent(new Event('input'));
     
+    // Datos precargados tras un error: se verifican de una vez (una sola petición)
+    ['email', 'usuario', 'telefono'].forEach((field) => availability.check(field));
+
     updateButtonState();
 });
\ No newline at end of file
@@ -0,0 +1,71 @@
+// solicitudes.js
+// Formulario de solicitud (campos condicionales) e historial con "ver más" paginado por cursor.
+
+// Muestra u oculta un grupo del formulario según una condición
+function toggleGroup(groupId, visible) {
+    const group = document.getElementById(groupId);
+    if (group) {
+        group.style.display = visible ? "block" : "none";
+    }
+}
+
+function historialItem(item) {
+    const li = document.createElement("li");
+    li.className = "historial-item";
+    const campos = [
+        ["historial-fecha", item.fecha_inicio],
+        ["historial-ruta", `${item.provincia_origen} → ${item.provincia_destino}`],
+        ["historial-tipo", item.tipo_servicio],
+        [`historial-estado estado-${item.estado}`, item.estado],
+    ];
+    for (const [className, text] of campos) {
+        const span = document.createElement("span");
+        span.className = className;
+        span.textContent = text;
+        li.appendChild(span);
+    }
+    return li;
+}
+
+// Pide la siguiente página al servidor con el cursor que entregó la anterior
+function cargarMasHistorial(button) {
+    const lista = document.getElementById("historial-solicitudes");
+    const url = `${lista.dataset.url}?cursor=${encodeURIComponent(button.dataset.cursor)}`;
+    button.disabled = true;
+    fetch(url, {credentials: "same-origin"})
+        .then((response) => {
+            if (!response.ok) {
+                throw new Error(`El historial respondió ${response.status}`);
+            }
+            return response.json();
+        })
+        .then((data) => {
+            data.items.forEach((item) => lista.appendChild(historialItem(item)));
+            button.dataset.cursor = data.next_cursor || "";
+            if (!data.next_cursor) {
+                button.style.display = "none";
+            }
+        })
+        .catch((err) => console.error(err))
+        .finally(() => { button.disabled = false; });
+}
+
+document.addEventListener("DOMContentLoaded", function() {
+    const tipo = document.getElementById("tipo_servicio");
+    const soloUnDia = document.getElementById("solo_un_dia");
+    const verMas = document.getElementById("historial-ver-mas");
+
+    if (tipo) {
+        const actualizarTipo = () => toggleGroup("grupo-tipo-otro", tipo.value === "Otro");
+        tipo.addEventListener("change", actualizarTipo);
+        actualizarTipo();
+    }
+    if (soloUnDia) {
+        const actualizarRegreso = () => toggleGroup("grupo-fecha-regreso", soloUnDia.value === "no");
+        soloUnDia.addEventListener("change", actualizarRegreso);
+        actualizarRegreso();
+    }
+    if (verMas) {
+        verMas.addEventListener("click", () => cargarMasHistorial(verMas));
+    }
+});
@@ -0,0 +1,136 @@
+// service-worker.js
+// GENERADO por Flask (pwa.py): la lista de precache y la versión se calculan a partir de
+// los archivos reales, así que no hay nada que editar ni versionar a mano aquí.
+
+const CACHE_VERSION = '{{ version }}';
+// Una sola caché por versión: lo precacheado y lo que se va actualizando en tiempo de ejecución
+const CACHE_NAME = `transavi-app-cache-${CACHE_VERSION}`;
+
+// [{url, revision}] - revision es null cuando el hash ya va en la URL (/assets/...)
+const PRECACHE_ENTRIES = {{ precache | tojson }};
+const PUBLIC_PAGES = {{ public_pages | tojson }};
+const NETWORK_ONLY = {{ network_only | tojson }};
+const CDN_ORIGINS = {{ cdn_origins | tojson }};
+const OFFLINE_PAGE = {{ offline_page | tojson }};
+
+// 1. Instalar: precachear el shell de la app (estáticos + páginas públicas). Sin cookies:
+// las páginas se guardan tal como las ve un visitante anónimo, nunca con la barra de un
+// usuario ni sus mensajes flash (que además quedarían consumidos).
+self.addEventListener('install', (event) => {
+    console.log('[Service Worker] Instalando versión', CACHE_VERSION);
+    event.waitUntil(
+        caches.open(CACHE_NAME)
+            .then((cache) => Promise.all(PRECACHE_ENTRIES.map((entry) =>
+                // cache: 'reload' evita que la caché HTTP del navegador nos dé una copia vieja
+                fetch(new Request(entry.url, {cache: 'reload', credentials: 'omit'}))
+                    .then((response) => {
+                        if (!response.ok) {
+                            throw new Error(`${entry.url} respondió ${response.status}`);
+                        }
+                        return cache.put(entry.url, response);
+                    })
+            )))
+            .then(() => self.skipWaiting())
+            .catch((err) => console.error('[Service Worker] Error al precachear:', err))
+    );
+});
+
+// 2. Activar: borrar las cachés de versiones anteriores y tomar control de las páginas
+self.addEventListener('activate', (event) => {
+    event.waitUntil(
+        caches.keys()
+            .then((names) => Promise.all(
+                names.filter((name) => name !== CACHE_NAME)
+                    .map((name) => {
+                        console.log('[Service Worker] Eliminando caché vieja:', name);
+                        return caches.delete(name);
+                    })
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+// Cache-first: para archivos que nunca cambian (URL con hash o versión fija de CDN)
+function cacheFirst(request) {
+    return caches.match(request).then((cached) => cached || fetch(request).then((response) => {
+        if (response.ok || response.type === 'opaque') {
+            const copy = response.clone();
+            caches.open(CACHE_NAME).then((cache) => cache.put(request, copy));
+        }
+        return response;
+    }));
+}
+
+// Respuestas que el servidor marcó como personales (con sesión o flashes, ver page_cache.py)
+function isPersonal(response) {
+    return (response.headers.get('Cache-Control') || '').includes('no-store');
+}
+
+// Stale-while-revalidate: responde al instante desde la caché y actualiza en segundo plano
+function staleWhileRevalidate(event, fallbackUrl) {
+    const request = event.request;
+    const network = fetch(request).then((response) => {
+        if (response.ok && response.type === 'basic' && !response.redirected && !isPersonal(response)) {
+            const copy = response.clone();
+            caches.open(CACHE_NAME).then((cache) => cache.put(request, copy));
+        }
+        return response;
+    });
+    event.waitUntil(network.then(() => undefined, () => undefined));
+
+    return caches.match(request, {ignoreSearch: true}).then((cached) => {
+        if (cached) {
+            return cached;
+        }
+        return network.catch(() => fallbackUrl ? caches.match(fallbackUrl) : Response.error());
+    });
+}
+
+// Network-first: para las páginas públicas, cuyo HTML cambia con la sesión (barra de
+// navegación, mensajes flash). Se muestra siempre lo que responde el servidor; la copia
+// anónima guardada solo aparece sin conexión.
+function networkFirst(request, fallbackUrl) {
+    return fetch(request).then((response) => {
+        if (response.ok && response.type === 'basic' && !response.redirected && !isPersonal(response)) {
+            const copy = response.clone();
+            caches.open(CACHE_NAME).then((cache) => cache.put(request, copy));
+        }
+        return response;
+    }).catch(() => caches.match(request, {ignoreSearch: true})
+        .then((cached) => cached || caches.match(fallbackUrl)));
+}
+
+// 3. Interceptar peticiones según el tipo de recurso
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return; // Formularios (login, registro, perfil...) siempre van a la red
+    }
+    const url = new URL(request.url);
+
+    if (url.origin !== self.location.origin) {
+        if (CDN_ORIGINS.includes(url.origin)) {
+            event.respondWith(cacheFirst(request));
+        }
+        return;
+    }
+    if (NETWORK_ONLY.some((prefix) => url.pathname.startsWith(prefix))) {
+        return; // Network-only: datos privados y autenticación
+    }
+    if (url.pathname.startsWith('/assets/')) {
+        event.respondWith(cacheFirst(request));
+        return;
+    }
+    if (url.pathname.startsWith('/static/')) {
+        event.respondWith(staleWhileRevalidate(event, null));
+        return;
+    }
+    if (request.mode === 'navigate') {
+        if (PUBLIC_PAGES.includes(url.pathname)) {
+            event.respondWith(networkFirst(request, OFFLINE_PAGE));
+        } else {
+            // Otras páginas: red, y sin conexión la página de inicio precacheada
+            event.respondWith(fetch(request).catch(() => caches.match(OFFLINE_PAGE)));
+        }
+    }
+});
@@ -0,0 +1,174 @@
+# throttle.py
+import threading
+import time
+
+from config import get_db_connection
+
+# Contador de ventana deslizante: por cada clave solo se guardan dos enteros (la ventana
+# actual y la anterior) y la estimación pondera la anterior según lo que resta de ella.
+# Al girar la ventana se descarta todo lo anterior de un golpe, así la memoria queda
+# acotada aunque lleguen millones de claves distintas.
+
+
+class SlidingWindowLimiter:
+    """Limita a `limit` eventos por `window` segundos y por clave, en memoria."""
+
+    def __init__(self, limit, window, max_keys=100_000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._index = 0
+        self._current = {}
+        self._previous = {}
+        self._lock = threading.Lock()
+
+    def _rotate(self, now):
+        index = int(now // self.window)
+        if index != self._index:
+            self._previous = self._current if index == self._index + 1 else {}
+            self._current = {}
+            self._index = index
+        return (now % self.window) / self.window
+
+    def _estimate(self, key, elapsed):
+        return self._previous.get(key, 0) * (1 - elapsed) + self._current.get(key, 0)
+
+    def allow(self, key):
+        """Indica si la clave aún tiene cupo, sin consumirlo."""
+        with self._lock:
+            elapsed = self._rotate(time.time())
+            return self._estimate(key, elapsed) < self.limit
+
+    def hit(self, key):
+        """Registra un evento y retorna True si estaba dentro del límite."""
+        with self._lock:
+            elapsed = self._rotate(time.time())
+            allowed = self._estimate(key, elapsed) < self.limit
+            count = self._current.get(key)
+            if count is None:
+                # Tope duro de claves por ventana: se desaloja la más antigua
+                if len(self._current) >= self.max_keys:
+                    self._current.pop(next(iter(self._current)))
+                count = 0
+            self._current[key] = count + 1
+            return allowed
+
+    def reset(self, key):
+        with self._lock:
+            self._current.pop(key, None)
+            self._previous.pop(key, None)
+
+    def retry_after(self):
+        """Segundos (aprox.) hasta que la ventana actual gire."""
+        return max(1, int(self.window - time.time() % self.window))
+
+
+class SQLiteLimiter(SlidingWindowLimiter):
+    """Mismo algoritmo, pero los contadores viven en la tabla `login_throttle`.
+
+    Permite que varios procesos trabajadores apliquen los mismos límites.
+    """
+
+    def __init__(self, limit, window, prefix):
+        super().__init__(limit, window)
+        self.prefix = prefix
+
+    def _weighted_count(self, conn, key, index, elapsed):
+        rows = conn.execute(
+            'SELECT ventana, hits FROM login_throttle WHERE clave = ? AND ventana >= ?',
+            (key, index - 1)
+        ).fetchall()
+        counts = {row['ventana']: row['hits'] for row in rows}
+        return counts.get(index - 1, 0) * (1 - elapsed) + counts.get(index, 0)
+
+    def allow(self, key):
+        now = time.time()
+        key = self.prefix + key
+        index, elapsed = int(now // self.window), (now % self.window) / self.window
+        return self._weighted_count(get_db_connection(), key, index, elapsed) < self.limit
+
+    def hit(self, key):
+        now = time.time()
+        key = self.prefix + key
+        index, elapsed = int(now // self.window), (now % self.window) / self.window
+        conn = get_db_connection()
+        # Primero se suma y después se cuenta, en la misma transacción: el INSERT toma el
+        # lock de escritura, así dos procesos no pueden leer el mismo conteo a la vez
+        conn.execute(
+            '''
+            INSERT INTO login_throttle (clave, ventana, hits) VALUES (?, ?, 1)
+            ON CONFLICT (clave, ventana) DO UPDATE SET hits = hits + 1
+            ''',
+            (key, index)
+        )
+        allowed = self._weighted_count(conn, key, index, elapsed) - 1 < self.limit
+        # Al girar la ventana (primer hit de la nueva) se purgan las viejas de todas las claves
+        if index != self._index:
+            self._index = index
+            conn.execute(
+                'DELETE FROM login_throttle WHERE ventana < ? AND clave LIKE ?',
+                (index - 1, self.prefix + '%')
+            )
+        conn.commit()
+        return allowed
+
+    def reset(self, key):
+        conn = get_db_connection()
+        conn.execute('DELETE FROM login_throttle WHERE clave = ?', (self.prefix + key,))
+        conn.commit()
+
+
+# Limitadores del login: por IP cuenta todos los intentos, por identificador los que hubo
+# desde el último login correcto (record_success lo pone en cero).
+ip_limiter = SlidingWindowLimiter(limit=30, window=60)
+identifier_limiter = SlidingWindowLimiter(limit=5, window=300)
+# Consultas de disponibilidad (registro/perfil) por IP: evita enumerar emails o teléfonos.
+availability_limiter = SlidingWindowLimiter(limit=60, window=60)
+
+
+def _identifier_key(identifier):
+    # Normalizado y recortado para acotar la memoria por clave
+    return identifier.strip().lower()[:254]
+
+
+def check_login(ip, identifier):
+    """Registra el intento y retorna 0 si se permite, o los segundos a esperar si no.
+
+    El intento se cuenta para el identificador antes de verificar la contraseña, en el
+    mismo paso que el chequeo (hit): una ráfaga de intentos simultáneos no pasa del
+    límite. No toca la BD ni el hashing (salvo con el backend SQLite), así que rechazar
+    es barato.
+    """
+    if not ip_limiter.hit(ip):
+        return ip_limiter.retry_after()
+    if not identifier_limiter.hit(_identifier_key(identifier)):
+        return identifier_limiter.retry_after()
+    return 0
+
+
+def check_availability(ip):
+    """Registra la consulta y retorna 0 si se permite, o los segundos a esperar si no."""
+    if not availability_limiter.hit(ip):
+        return availability_limiter.retry_after()
+    return 0
+
+
+def record_success(identifier):
+    identifier_limiter.reset(_identifier_key(identifier))
+
+
+def init_app(app):
+    """Crea los limitadores según app.config (backend 'memory' o 'sqlite')."""
+    global ip_limiter, identifier_limiter, availability_limiter
+    ip_limit, ip_window = app.config.get('LOGIN_IP_LIMIT', 30), app.config.get('LOGIN_IP_WINDOW', 60)
+    id_limit, id_window = app.config.get('LOGIN_ID_LIMIT', 5), app.config.get('LOGIN_ID_WINDOW', 300)
+    av_limit, av_window = app.config.get('AVAILABILITY_LIMIT', 60), app.config.get('AVAILABILITY_WINDOW', 60)
+    if app.config.get('LOGIN_THROTTLE_BACKEND') == 'sqlite':
+        ip_limiter = SQLiteLimiter(ip_limit, ip_window, prefix='ip:')
+        identifier_limiter = SQLiteLimiter(id_limit, id_window, prefix='id:')
+        availability_limiter = SQLiteLimiter(av_limit, av_window, prefix='disp:')
+    else:
+        max_keys = app.config.get('LOGIN_THROTTLE_MAX_KEYS', 100_000)
+        ip_limiter = SlidingWindowLimiter(ip_limit, ip_window, max_keys)
+        identifier_limiter = SlidingWindowLimiter(id_limit, id_window, max_keys)
+        availability_limiter = SlidingWindowLimiter(av_limit, av_window, max_keys)